@@ -1,4 +1,5 @@
 from app import create_app
+from app.server import add_server_arguments, run_server
 import argparse
 import threading
 import time
@@ -10,6 +11,7 @@ if __name__ == '__main__':
     parser.add_argument('--port', type=int, default=5001)
     parser.add_argument('--debug', action='store_true')
     parser.add_argument('--no-browser', action='store_true')
+    add_server_arguments(parser)
     args = parser.parse_args()
 
     app = create_app()
@@ -20,9 +22,4 @@ if __name__ == '__main__':
             webbrowser.open(f'http://{args.host}:{args.port}')
         threading.Thread(target=open_browser, daemon=True).start()
 
-    app.run(
-        debug=args.debug,
-        host=args.host,
-        port=args.port,
-        use_reloader=False
-    )
+    run_server(app, args)
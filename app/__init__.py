@@ -1,6 +1,12 @@
+import time
+
 from flask import Flask
 from .db import db
 
+# Reference point for the startup timing: the first import of the package,
+# which the entry points (app.py, launcher --server) do right after start.
+_PROCESS_START = time.perf_counter()
+
 
 def create_app(config_object: str = "config.Config") -> Flask:
     """Application factory creating the Flask app and initializing extensions.
@@ -10,6 +16,7 @@ def create_app(config_object: str = "config.Config") -> Flask:
     Returns:
         Flask app instance
     """
+    started = time.perf_counter()
     app = Flask(__name__, instance_relative_config=False, template_folder='../templates')
     app.config.from_object(config_object)
 
@@ -22,15 +29,78 @@ def create_app(config_object: str = "config.Config") -> Flask:
     app.register_blueprint(main_bp)
     app.register_blueprint(config_bp)
 
-    # Ensure database and minimal data exist on first start
+    # Negotiated gzip/brotli for HTML and JSON responses (see app/compression.py)
+    from .compression import init_compression
+    init_compression(app)
+
+    # Caches are per process; start clean for the database this app is bound to
+    from .cache import clear_caches
+    clear_caches()
+    from .routes import cache_relatorios, eventos_resumo
+    eventos_resumo.configure(
+        max_subscribers=app.config.get('SSE_MAX_SUBSCRIBERS', 4),
+        heartbeat=app.config.get('SSE_HEARTBEAT', 15),
+    )
+    app.extensions['caixa_events'] = eventos_resumo
+    cache_relatorios.configure(
+        max_entries=app.config.get('REPORT_CACHE_ENTRIES', 256),
+        max_bytes=app.config.get('REPORT_CACHE_MAX_MB', 32) * 1024 * 1024,
+        ttl=app.config.get('REPORT_CACHE_TTL', 300),
+    )
+
+    # Ensure database and minimal data exist on first start; a warm start
+    # (schema already at the current version) skips DDL and seeding
     with app.app_context():
         from .db import init_db
-        init_db(app)
-        _ensure_minimal_data()
+        warm = init_db(app)
+        if not warm:
+            _ensure_minimal_data()
+            _ensure_derived_tables()
 
+    # Optional group-commit writer for sales/withdrawals (see app/writer.py)
+    if app.config.get('WRITE_BEHIND'):
+        import atexit
+        from .writer import GroupCommitWriter
+        writer = GroupCommitWriter(
+            app,
+            interval_ms=app.config.get('WRITE_BEHIND_INTERVAL_MS', 2),
+            max_batch=app.config.get('WRITE_BEHIND_MAX_BATCH', 200),
+        )
+        app.extensions['caixa_writer'] = writer
+        atexit.register(writer.stop)
+
+    # Periodic online backups (see app/db_backup.py)
+    if app.config.get('BACKUP_INTERVAL_HOURS'):
+        from .db_backup import BackupScheduler
+        app.extensions['caixa_backup'] = BackupScheduler(app, app.config['BACKUP_INTERVAL_HOURS']).start()
+
+    _register_startup_timing(app, started, warm)
     return app
 
 
+def _register_startup_timing(app, started, warm):
+    """Record create_app duration and the time until the first request.
+
+    Kept in ``app.extensions['caixa_startup']``; the first request also logs
+    it (``app.logger``, info level).
+    """
+    now = time.perf_counter()
+    timing = {
+        'warm_start': warm,
+        'create_app_ms': round((now - started) * 1000, 1),
+        'first_request_ms': None,
+    }
+    app.extensions['caixa_startup'] = timing
+
+    @app.before_request
+    def _first_request_timing():
+        if timing['first_request_ms'] is not None:
+            return
+        timing['first_request_ms'] = round((time.perf_counter() - _PROCESS_START) * 1000, 1)
+        app.logger.info("Startup (%s): create_app %.1f ms, first request %.1f ms after start",
+                        'warm' if warm else 'cold', timing['create_app_ms'], timing['first_request_ms'])
+
+
 def _ensure_minimal_data():
     """Create minimal seed data if tables are empty (idempotent)."""
     from .models import Product, PaymentMethod, SystemConfig
@@ -38,9 +108,9 @@ def _ensure_minimal_data():
     # Produtos padrão (se não existirem)
     if not Product.query.first():
         default_products = [
-            Product(name='Consulta', price=50.00),
-            Product(name='Serviço Básico', price=100.00),
-            Product(name='Serviço Premium', price=200.00),
+            Product(name='Consulta', price_cents=5000),
+            Product(name='Serviço Básico', price_cents=10000),
+            Product(name='Serviço Premium', price_cents=20000),
         ]
         for p in default_products:
             db.session.add(p)
@@ -82,3 +152,14 @@ def _ensure_minimal_data():
     # PIN padrão (se não existir)
     if not SystemConfig.get_value('admin_pin'):
         SystemConfig.set_value('admin_pin', '1234', 'PIN de acesso ao painel administrativo')
+
+
+def _ensure_derived_tables():
+    """Populate materialized tables on databases created before they existed."""
+    from .models import Payment, PaymentMethodBalance, Transaction, DailyRollup
+
+    if Payment.query.first() and not PaymentMethodBalance.query.first():
+        PaymentMethodBalance.rebuild()
+
+    if Transaction.query.first() and not DailyRollup.query.first():
+        DailyRollup.rebuild()
@@ -0,0 +1,282 @@
+"""Monthly archive databases for closed periods.
+
+`archive_month` moves the transactions of one calendar month (with their
+items and payments) from ``caixa.db`` into ``arquivo/caixa-YYYY-MM.db``,
+next to the database, so the hot tables only hold recent history. Archived
+months are listed in ``system_config`` (``arquivo_meses``), read without
+the lookup cache so a server sees months archived by another process;
+balances and daily rollups stay in the main database and keep covering
+every period.
+
+Readers attach an archive (``ATTACH ... AS arquivo_YYYY_MM``) only when the
+requested date range overlaps it: `months_in_range` tells which months a
+range needs, `attach` attaches them to a connection (at most
+``MAX_ATTACHED`` at a time, detaching the least recently used ones) and
+`archived_entities` maps the models onto the archive tables, so the same
+ORM queries run against either database.
+
+Moving a month takes two commits, because SQLite does not make a
+transaction spanning attached databases atomic in WAL mode: the rows are
+first copied (``INSERT OR IGNORE``, the archive keeps the original ids),
+then deleted from the main database together with the registry update. A
+crash in between leaves the rows in both files with the month still
+unregistered, so readers never see them twice, and running the job again
+finishes the move.
+
+The row holding the largest id of each table is never archived: SQLite
+hands out ``max(id) + 1`` to new rows, and ids must stay unique across the
+main database and the archives.
+"""
+import json
+import os
+import re
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, inspect, text
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .cache import mark_changed
+from .db import db
+from .models import CashSession, Payment, SystemConfig, Transaction, TransactionItem
+
+
+REGISTRY_KEY = 'arquivo_meses'
+ARCHIVE_SUBDIR = 'arquivo'
+ARCHIVE_NAME_RE = re.compile(r'^caixa-\d{4}-\d{2}\.db$')
+# SQLite aceita 10 bancos anexados por conexão; sobra margem para outros usos
+MAX_ATTACHED = 8
+_NO_LIMIT = 2 ** 63 - 1
+
+ArchiveEntities = namedtuple('ArchiveEntities', 'transaction item payment')
+
+_MODELS = (Transaction, TransactionItem, Payment)
+_entities = {}
+
+
+def month_key(value) -> str:
+    """'YYYY-MM' of a date/datetime."""
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def month_bounds(month):
+    """[start, end) datetimes of a 'YYYY-MM' month."""
+    year, number = (int(part) for part in month.split('-'))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def schema_name(month) -> str:
+    return f"arquivo_{month.replace('-', '_')}"
+
+
+def archive_dir_for(db_path, configured=None) -> str:
+    """Directory of the archive files of the database at `db_path`."""
+    if configured:
+        return configured
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_SUBDIR)
+
+
+def archive_dir() -> str:
+    """Directory of the archive files (ARCHIVE_DIR or next to the database)."""
+    return archive_dir_for(db.engine.url.database, current_app.config.get('ARCHIVE_DIR'))
+
+
+def archive_files(directory) -> list:
+    """Paths of the archive databases in `directory` (registered or not)."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if ARCHIVE_NAME_RE.match(name))
+
+
+def archive_path(month) -> str:
+    return os.path.join(archive_dir(), f"caixa-{month}.db")
+
+
+def archived_months() -> list:
+    """Archived months, most recent first.
+
+    Read from the database on every call, not through the `SystemConfig`
+    cache: the archive job runs in its own process, and a running server
+    must see a month move as soon as it is committed.
+    """
+    value = db.session.query(SystemConfig.value).filter_by(key=REGISTRY_KEY).scalar()
+    return sorted(json.loads(value), reverse=True) if value else []
+
+
+def months_in_range(start=None, end=None) -> list:
+    """Archived months overlapping [start, end) (datetimes, None = open)."""
+    needed = []
+    for month in archived_months():
+        month_start, month_end = month_bounds(month)
+        if (end is None or month_start < end) and (start is None or month_end > start):
+            needed.append(month)
+    return needed
+
+
+def archived_entities(month) -> ArchiveEntities:
+    """`Transaction`, `TransactionItem` and `Payment` mapped onto the archive of `month`."""
+    if month not in _entities:
+        metadata = MetaData()
+        _entities[month] = ArchiveEntities(*(
+            aliased(model, _archive_table(model.__table__, metadata, schema_name(month)), adapt_on_names=True)
+            for model in _MODELS
+        ))
+    return _entities[month]
+
+
+def _archive_table(table, metadata, schema):
+    """Copy of `table` (same columns and indexes, no foreign keys) in `schema`.
+
+    The parents (clients, products, payment methods) live in the main
+    database, where SQLite cannot check them from an attached file.
+    """
+    archived = Table(
+        table.name, metadata,
+        *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in table.columns),
+        schema=schema
+    )
+    for index in table.indexes:
+        Index(index.name, *(archived.c[c.name] for c in index.columns))
+    return archived
+
+
+def attach(connection, months):
+    """Attach the archives of `months` to `connection` (an ORM/Core Connection).
+
+    Archives stay attached to the pooled DBAPI connection; past
+    ``MAX_ATTACHED`` the least recently used ones not in `months` are
+    detached first (skipping any still in use by an open transaction).
+    """
+    if len(months) > MAX_ATTACHED:
+        raise ValueError(f"no máximo {MAX_ATTACHED} arquivos por consulta")
+    attached = connection.info.setdefault('caixa_arquivos', OrderedDict())
+
+    for month in months:
+        if month in attached:
+            attached.move_to_end(month)
+    for month in [m for m in attached if m not in months]:
+        if len(attached) + len([m for m in months if m not in attached]) <= MAX_ATTACHED:
+            break
+        try:
+            connection.exec_driver_sql(f"DETACH DATABASE {schema_name(month)}")
+        except Exception:
+            continue
+        del attached[month]
+
+    for month in months:
+        if month not in attached:
+            path = archive_path(month)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Arquivo do mês {month} não encontrado: {path}")
+            connection.exec_driver_sql(f"ATTACH DATABASE ? AS {schema_name(month)}", (path,))
+            attached[month] = schema_name(month)
+
+
+def archived_rows(build_query) -> list:
+    """Rows of ``build_query(entities)`` run against every archived month.
+
+    Used by the rebuilds of the materialized totals; months are attached
+    one at a time, so any number of them fits the attach limit.
+    """
+    rows = []
+    for month in archived_months():
+        attach(db.session.connection(), [month])
+        rows += build_query(archived_entities(month)).all()
+    return rows
+
+
+def _create_archive_tables(connection, month):
+    for entity in archived_entities(month):
+        table = inspect(entity).selectable
+        connection.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    from .migrations import SCHEMA_VERSION
+    connection.exec_driver_sql(f"PRAGMA {schema_name(month)}.user_version = {SCHEMA_VERSION}")
+
+
+# Ids do mês (:start, :end) que podem sair do banco principal (ver docstring
+# do módulo); transações do turno de caixa aberto (:shift_start em diante)
+# ficam, pois o turno lê suas movimentações por intervalo de ids
+_CANDIDATES = (
+    "SELECT id FROM main.transactions WHERE date >= :start AND date < :end AND id <= :shift_start "
+    "AND id < (SELECT max(id) FROM main.transactions) "
+    "AND id NOT IN (SELECT transaction_id FROM main.transaction_items "
+    "WHERE id = (SELECT max(id) FROM main.transaction_items)) "
+    "AND id NOT IN (SELECT transaction_id FROM main.payments "
+    "WHERE id = (SELECT max(id) FROM main.payments))"
+)
+
+
+def archive_month(month) -> int:
+    """Move the transactions of `month` ('YYYY-MM') to its archive file.
+
+    Returns the number of transactions moved. Runs in the current app
+    context and commits.
+    """
+    start, end = month_bounds(month)
+    schema = schema_name(month)
+    os.makedirs(archive_dir(), exist_ok=True)
+    if not os.path.exists(archive_path(month)):
+        open(archive_path(month), 'ab').close()
+
+    # 1) Copiar para o arquivo, com os mesmos ids (repetir é inofensivo)
+    connection = db.session.connection()
+    attach(connection, [month])
+    _create_archive_tables(connection, month)
+    shift = CashSession.current()
+    params = {'start': str(start), 'end': str(end),
+              'shift_start': shift.start_transaction_id if shift else _NO_LIMIT}
+    moved = db.session.execute(text(f"SELECT count(*) FROM ({_CANDIDATES})"), params).scalar()
+    for model, key in ((Transaction, 'id'), (TransactionItem, 'transaction_id'), (Payment, 'transaction_id')):
+        table = model.__tablename__
+        columns = ', '.join(c.name for c in model.__table__.columns)
+        db.session.execute(text(
+            f"INSERT OR IGNORE INTO {schema}.{table} ({columns}) "
+            f"SELECT {columns} FROM main.{table} WHERE {key} IN ({_CANDIDATES})"
+        ), params)
+    db.session.commit()
+
+    # 2) Remover do banco principal o que já está no arquivo e registrar o mês
+    attach(db.session.connection(), [month])
+    # Mesma transação nos dois bancos (id, data e valor), nunca só o mesmo id
+    copied = (f"SELECT a.id FROM {schema}.transactions AS a JOIN main.transactions AS m "
+              f"ON m.id = a.id AND m.date = a.date AND m.total_cents = a.total_cents")
+    for table, key in (('payments', 'transaction_id'), ('transaction_items', 'transaction_id'),
+                       ('transactions', 'id')):
+        db.session.execute(text(f"DELETE FROM main.{table} WHERE {key} IN ({copied})"))
+    registry = SystemConfig.query.filter_by(key=REGISTRY_KEY).first()
+    if registry is None:
+        registry = SystemConfig(key=REGISTRY_KEY, description='Meses movidos para os bancos de arquivo')
+        db.session.add(registry)
+    registry.value = json.dumps(sorted(set(archived_months()) | {month}))
+    mark_changed(db.session, 'transactions', 'transaction_items', 'payments')
+    db.session.commit()
+    return moved
+
+
+def archive_closed_months(keep_months=3, today=None) -> list:
+    """Archive every month older than the last `keep_months` (current one included).
+
+    Returns [(month, transactions moved)] for the months that had rows.
+    """
+    today = today or date.today()
+    index = today.year * 12 + today.month - max(1, keep_months)
+    cutoff = datetime(index // 12, index % 12 + 1, 1)
+
+    oldest = db.session.query(db.func.min(Transaction.date)).filter(Transaction.date < cutoff).scalar()
+    if oldest is None:
+        return []
+
+    results = []
+    month = month_key(oldest)
+    while month_bounds(month)[0] < cutoff:
+        moved = archive_month(month)
+        if moved:
+            results.append((month, moved))
+        month = month_key(month_bounds(month)[1])
+    return results
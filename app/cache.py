@@ -0,0 +1,292 @@
+"""In-process caches and commit-time change tracking.
+
+`LookupCache` memoizes small, rarely changing lookups (configuration,
+payment methods) and counts hits/misses for monitoring. Every table also
+has a version counter, bumped on each commit that writes it, used to build
+ETags for conditional GETs.
+
+`ResultCache` keeps serialized query results (reports) valid for a date
+range: an LRU bounded by entry count and bytes, with a TTL, dropping only
+the entries whose range contains a written transaction date.
+
+Session events record which tables each session wrote (ORM flushes and
+Core DML executed through the session) and, for tables registered with
+`track_dates`, the dates of the rows written; after a successful commit
+the callbacks registered with `on_commit` for those tables run, so caches
+are invalidated only once the change is durable. The caches live in the
+server process: writes made by other processes (maintenance scripts) are
+only seen after a restart or the ``invalidate`` control command (see
+`app.instance`).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+_caches = {}
+_commit_listeners = []
+_dated_tables = {}
+
+# Versions start over on every process start; the epoch keeps them unique.
+_epoch = uuid.uuid4().hex[:8]
+_table_versions = {}
+_versions_lock = threading.Lock()
+
+
+class LookupCache:
+    """Thread-safe key/value cache with hit/miss counters.
+
+    A value loaded while `clear` runs (another request committing a change)
+    is returned but not stored, so it cannot outlive the invalidation.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._data = {}
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss."""
+        with self._lock:
+            value = self._data.get(key, self._MISSING)
+            if value is not self._MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self.generation
+        value = loader()
+        with self._lock:
+            if generation == self.generation:
+                self._data[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'invalidations': self.invalidations,
+            }
+
+
+class ResultCache:
+    """LRU/TTL cache of serialized results, each valid for a date range.
+
+    Values are bytes (their size is what `stats` reports as memory use).
+    `put` takes the `version` read before the result was computed and
+    drops the result if any invalidation happened meanwhile, so a result
+    computed concurrently with a write is never kept.
+    """
+
+    def __init__(self, name: str, max_entries=256, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.version = 0
+        self._bytes = 0
+        self._data = OrderedDict()  # key -> (value, start, end, expires)
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def configure(self, max_entries=None, max_bytes=None, ttl=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict()
+
+    def get(self, key):
+        """Cached value for `key`, or None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[3] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value: bytes, start, end, version):
+        """Store `value`, valid while no transaction dated in [start, end) is written (None = open)."""
+        if not self.max_entries or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, start, end, time.monotonic() + self.ttl)
+            self._bytes += len(value)
+            self._evict()
+
+    def invalidate_dates(self, dates):
+        """Drop the entries whose range contains any of `dates`."""
+        with self._lock:
+            self.version += 1
+            stale = [key for key, (_, start, end, _) in self._data.items()
+                     if any((start is None or d >= start) and (end is None or d < end) for d in dates)]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        self._bytes -= len(self._data.pop(key)[0])
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def cache_stats() -> dict:
+    """Counters of every registered cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def clear_caches():
+    """Drop every cached entry (e.g. when an app is bound to another database)."""
+    for cache in _caches.values():
+        cache.clear()
+
+
+def on_commit(tables, callback, dates=False):
+    """Call `callback(changed_tables)` after commits that wrote any of `tables`.
+
+    With `dates`, the callback gets ``(changed_tables, changed_dates)``:
+    the dates recorded for the commit (`track_dates`, `mark_dates`), or
+    None when the commit wrote without recording any. A None inside the
+    set stands for a row whose date could not be read.
+    """
+    _commit_listeners.append((frozenset(tables), callback, dates))
+
+
+def track_dates(table, attribute):
+    """Record `attribute` of ORM objects of `table` flushed (added, changed or deleted)."""
+    _dated_tables[table] = attribute
+
+
+def table_versions(tables) -> str:
+    """Token identifying the committed state of `tables` in this process."""
+    with _versions_lock:
+        versions = '.'.join(str(_table_versions.get(table, 0)) for table in sorted(tables))
+    return f"{_epoch}-{versions}"
+
+
+def bump_versions(tables):
+    with _versions_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def mark_changed(session, *tables):
+    """Record writes the session events cannot see (e.g. raw DBAPI usage)."""
+    session.info.setdefault('changed_tables', set()).update(tables)
+
+
+def mark_dates(session, *dates):
+    """Record the dates of rows written with Core statements (see `track_dates`)."""
+    session.info.setdefault('changed_dates', set()).update(dates)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is None:
+            continue
+        changed.add(table.name)
+        attribute = _dated_tables.get(table.name)
+        if attribute:
+            history = inspect(obj).attrs[attribute].history
+            # None stands for an unknown date (attribute not loaded)
+            dates = [d for d in (*history.added, *history.unchanged, *history.deleted) if d is not None]
+            mark_dates(session, *(dates or [None]))
+    if changed:
+        mark_changed(session, *changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            mark_changed(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_commit(session):
+    changed = session.info.pop('changed_tables', None)
+    dates = session.info.pop('changed_dates', None)
+    if not changed:
+        return
+    bump_versions(changed)
+    for tables, callback, with_dates in _commit_listeners:
+        if tables & changed:
+            if with_dates:
+                callback(changed, dates)
+            else:
+                callback(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('changed_tables', None)
+    session.info.pop('changed_dates', None)
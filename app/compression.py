@@ -0,0 +1,151 @@
+"""Negotiated response compression (gzip, brotli when installed).
+
+`init_compression` registers an ``after_request`` hook that compresses
+HTML and JSON bodies of at least ``COMPRESS_MIN_SIZE`` bytes with the best
+encoding listed in the request's ``Accept-Encoding`` (``br`` if the
+optional ``brotli`` package is importable, otherwise ``gzip``). Streamed
+responses (SSE, report streaming, exports) are left untouched: they are
+written as they are produced and the NDJSON export already has its own
+gzip option.
+
+Pages go through `render_page`, which keeps the rendered template and its
+compressed variants in `page_cache`, keyed by the versions of the tables
+the page depends on; each variant is compressed once, at the highest
+level, and served from memory afterwards. Code that caches its own
+serialized responses (the report cache) can store compressed variants
+with `accepted_encoding` / `compress` and mark the response with
+`set_encoding`.
+
+A compressed response gets a weak ETag (same value): the representation
+differs byte by byte but is semantically the same, and conditional GETs
+compare ETags weakly (see `app.conditional`).
+"""
+import gzip
+import hashlib
+
+from flask import current_app, render_template, request
+
+from .cache import LookupCache, table_versions
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json'}
+
+# Rendered pages and their compressed variants; cleared like the other caches
+page_cache = LookupCache('pages')
+
+
+def available_encodings() -> tuple:
+    """Encodings this process can produce, in order of preference."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encoding(size=None):
+    """Best encoding accepted by the current request for a body of `size` bytes, or None."""
+    config = current_app.config
+    if not config.get('COMPRESS_RESPONSES', True):
+        return None
+    if size is not None and size < config.get('COMPRESS_MIN_SIZE', 1024):
+        return None
+    for encoding in available_encodings():
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding, best=False) -> bytes:
+    """Compress `data`; `best` uses the highest level (for bodies compressed only once)."""
+    config = current_app.config
+    if encoding == 'br':
+        quality = 11 if best else config.get('COMPRESS_BROTLI_QUALITY', 5)
+        return brotli.compress(data, quality=quality)
+    if encoding == 'gzip':
+        level = 9 if best else config.get('COMPRESS_LEVEL', 6)
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def set_encoding(response, encoding):
+    """Mark `response` (body already encoded, or identity if None) as negotiated."""
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _compressible(response) -> bool:
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and 'Accept-Encoding' not in response.vary
+    )
+
+
+def compress_response(response):
+    """``after_request`` hook: compress eligible bodies for clients that accept it."""
+    if request.method == 'HEAD' or not _compressible(response):
+        return response
+    data = response.get_data()
+    encoding = accepted_encoding(len(data))
+    if encoding is not None:
+        response.set_data(compress(data, encoding))
+    return set_encoding(response, encoding)
+
+
+def init_compression(app):
+    """Register the compression hook on `app`."""
+    app.after_request(compress_response)
+
+
+class _Page:
+    """A rendered page: identity body, ETag and lazily built compressed variants."""
+
+    def __init__(self, html: str):
+        self.body = html.encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.variants = {None: self.body}
+
+    def variant(self, encoding) -> bytes:
+        body = self.variants.get(encoding)
+        if body is None:
+            # Concurrent first requests may both compress; the result is the same
+            body = self.variants.setdefault(encoding, compress(self.body, encoding, best=True))
+        return body
+
+
+def render_page(template, tables=(), context=None):
+    """Response for `template`, rendered and compressed once per version of `tables`.
+
+    `context` is a callable returning the template variables; it only runs
+    when the page is rendered. With template auto-reload (debug) the page
+    is rendered on every request.
+    """
+    app = current_app
+    if app.debug or app.jinja_env.auto_reload:
+        return render_template(template, **(context() if context else {}))
+
+    # Versions read before rendering: a concurrent write leaves a stale entry
+    # under the old key, which is never served again
+    key = (template, table_versions(tables))
+    page = page_cache.get(key, lambda: _Page(render_template(template, **(context() if context else {}))))
+
+    if request.if_none_match.contains_weak(page.etag):
+        response = app.response_class(status=304)
+        encoding = None
+    else:
+        encoding = accepted_encoding(len(page.body))
+        response = app.response_class(page.variant(encoding), mimetype='text/html')
+    response.set_etag(page.etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return set_encoding(response, encoding)
@@ -0,0 +1,41 @@
+"""Conditional GET support (ETag / If-None-Match).
+
+Endpoints whose output depends only on a few tables are decorated with
+`etag_for(...)`. The ETag is derived from the committed version of those
+tables (see `app.cache`) and the request URL, so it is known before the
+view runs: a matching `If-None-Match` is answered with 304 without any
+query or serialization.
+"""
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+
+from .cache import table_versions
+
+
+def etag_for(*tables):
+    """Decorate a GET view whose response depends only on `tables`."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Computed before the view runs: a write committed meanwhile can
+            # only make the response newer than its ETag, never older.
+            token = f"{request.full_path}|{table_versions(tables)}"
+            etag = hashlib.sha1(token.encode('utf-8')).hexdigest()
+
+            # Weak comparison: compressed responses carry the same ETag as W/"..."
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
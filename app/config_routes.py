@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template, request, jsonify, make_response
-from app.models import db, Client, Product, Transaction, TransactionItem, SystemConfig, PaymentMethod, Payment
+from app.models import db, Client, Product, Transaction, TransactionItem, SystemConfig, PaymentMethod, Payment, PaymentMethodBalance, CashSession
 from datetime import datetime
+from app.cache import cache_stats
+from app.conditional import etag_for
+from app.money import from_cents
+from app.shifts import shift_summary
 
 # Criar um blueprint adicional para APIs de configuração
 config_bp = Blueprint('config', __name__)
@@ -53,6 +57,7 @@ def api_verify_pin():
         return jsonify({'error': str(e)}), 500
 
 @config_bp.route('/api/payment-methods', methods=['GET'])
+@etag_for('payment_methods')
 def api_payment_methods():
     """API para obter métodos de pagamento ativos"""
     try:
@@ -96,6 +101,7 @@ def api_create_payment_method():
         
         db.session.add(method)
         db.session.commit()
+        PaymentMethod.invalidate_cache()
         
         return jsonify({
             'success': True,
@@ -113,44 +119,57 @@ def api_create_payment_method():
         return jsonify({'error': str(e)}), 500
 
 @config_bp.route('/api/balances', methods=['GET'])
+@etag_for('payment_methods', 'payment_method_balances', 'cash_sessions')
 def api_balances():
-    """API para consultar saldos por tipo de pagamento"""
+    """API para consultar saldos por tipo de pagamento.
+
+    Com um turno aberto, cada método traz também o saldo de abertura e as
+    vendas/sangrias do turno (`shift_*`).
+    """
     try:
-        # Obter saldos por método de pagamento
-        balances = Payment.get_balance_by_method()
-        
-        # Calcular sangrias por método
-        sangrias = db.session.query(
+        # Saldos materializados por método de pagamento (sem agregar `payments`)
+        balances = db.session.query(
+            PaymentMethod.id,
             PaymentMethod.name,
             PaymentMethod.code,
             PaymentMethod.color,
-            db.func.sum(Payment.amount).label('total')
-        ).join(Payment).filter(Payment.amount < 0).group_by(
-            PaymentMethod.id, PaymentMethod.name, PaymentMethod.code, PaymentMethod.color
-        ).all()
-        
-        # Criar dicionário de sangrias
-        sangria_dict = {s.code: float(s.total) for s in sangrias}
+            PaymentMethodBalance.total_sales_cents,
+            PaymentMethodBalance.total_sangrias_cents,
+            PaymentMethodBalance.balance_cents
+        ).join(PaymentMethodBalance).filter(
+            PaymentMethodBalance.total_sales_cents > 0
+        ).order_by(PaymentMethod.id).all()
+        
+        turno = CashSession.current()
+        metodos_turno = {}
+        if turno:
+            metodos_turno = {m['payment_method_id']: m for m in shift_summary(turno)['methods']}
         
         # Formatar resposta
         result = []
         for balance in balances:
-            code = balance.code
-            total_sales = float(balance.total) if balance.total else 0
-            total_sangrias = abs(sangria_dict.get(code, 0))
-            # Saldo disponível no método (vendas - sangrias)
-            net_balance = total_sales - total_sangrias
-            
-            result.append({
+            linha = {
                 'name': balance.name,
-                'code': code,
+                'code': balance.code,
                 'color': balance.color,
-                'total_sales': total_sales,
-                'total_sangrias': total_sangrias,
-                'balance': net_balance
-            })
+                'total_sales': from_cents(balance.total_sales_cents),
+                'total_sangrias': from_cents(balance.total_sangrias_cents),
+                # Saldo disponível no método (vendas - sangrias)
+                'balance': from_cents(balance.balance_cents)
+            }
+            if turno:
+                metodo = metodos_turno.get(balance.id, {})
+                linha['shift_opening'] = from_cents(metodo.get('opening_cents', 0))
+                linha['shift_sales'] = from_cents(metodo.get('sales_cents', 0))
+                linha['shift_sangrias'] = from_cents(metodo.get('sangrias_cents', 0))
+            result.append(linha)
         
-        return jsonify({'balances': result})
+        return jsonify({'balances': result, 'shift_id': turno.id if turno else None})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@config_bp.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """API para monitorar os caches em memória (acertos, falhas e invalidações)"""
+    return jsonify({'caches': cache_stats()})
@@ -2,33 +2,134 @@
 
 This module exposes the SQLAlchemy `db` object and helper to initialize
 SQLite database with recommended pragmas (WAL) to improve concurrency.
+
+Performance-related pragmas come from a named profile selected by
+`Config.SQLITE_PROFILE`:
+
+- ``safe``: full fsync on every commit (SQLite default durability);
+- ``balanced``: WAL with ``synchronous=NORMAL`` - a commit survives an app
+  crash, but the last commits may be lost on power failure;
+- ``fast``: no fsync at all, for bulk imports and benchmarks only.
 """
+import os
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import event
+from sqlalchemy import event, inspect
 
 
 db = SQLAlchemy()
 
 
-def init_sqlite_pragmas(engine):
-    """Attach pragmas (like WAL) on SQLite connect."""
+SQLITE_PROFILES = {
+    'safe': {
+        'synchronous': 'FULL',
+        'cache_size': -8000,          # KiB (8 MB)
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,         # ms
+        'wal_autocheckpoint': 1000,   # páginas
+        'optimize_on_close': True,
+    },
+    'balanced': {
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 128 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'optimize_on_close': True,
+    },
+    'fast': {
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+        'wal_autocheckpoint': 4000,
+        'optimize_on_close': True,
+    },
+}
+
+_REPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                     'temp_store', 'busy_timeout', 'wal_autocheckpoint', 'foreign_keys')
+
+
+def init_sqlite_pragmas(engine, profile: str = 'safe'):
+    """Attach pragmas (WAL plus the chosen profile) on SQLite connect.
+
+    Also runs ``PRAGMA optimize`` when a pooled connection is closed, so the
+    query planner statistics stay current. Idempotent per engine.
+    """
+    if engine.dialect.name != 'sqlite' or getattr(engine, '_sqlite_profile', None):
+        return
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r} (use one of {', '.join(SQLITE_PROFILES)})")
+    settings = SQLITE_PROFILES[profile]
+    engine._sqlite_profile = profile
 
     @event.listens_for(engine, "connect")
     def _set_sqlite_pragma(dbapi_connection, connection_record):
-        try:
-            cursor = dbapi_connection.cursor()
-            # Enable WAL journal mode
-            cursor.execute("PRAGMA journal_mode=WAL;")
-            cursor.execute("PRAGMA foreign_keys=ON;")
-            cursor.close()
-        except Exception:
-            # If engine is not SQLite, ignore
-            pass
-
-
-def init_db(app):
-    """Initialize DB and apply pragmas."""
+        cursor = dbapi_connection.cursor()
+        # Enable WAL journal mode
+        cursor.execute("PRAGMA journal_mode=WAL;")
+        cursor.execute("PRAGMA foreign_keys=ON;")
+        for name in ('synchronous', 'cache_size', 'mmap_size', 'temp_store',
+                     'busy_timeout', 'wal_autocheckpoint'):
+            cursor.execute(f"PRAGMA {name}={settings[name]};")
+        cursor.close()
+
+    if settings['optimize_on_close']:
+        @event.listens_for(engine, "close")
+        def _optimize_on_close(dbapi_connection, connection_record):
+            try:
+                dbapi_connection.execute("PRAGMA optimize;")
+            except Exception:
+                # Closing must never fail because of housekeeping
+                pass
+
+
+def sqlite_pragmas(engine) -> dict:
+    """Effective values of the tuned pragmas on a fresh pooled connection."""
+    if engine.dialect.name != 'sqlite':
+        return {}
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f"PRAGMA {name};").scalar() for name in _REPORTED_PRAGMAS}
+
+
+def _ensure_database_dir(engine):
+    """Create the directory of a file-based SQLite database if missing."""
+    path = engine.url.database
+    if engine.dialect.name == 'sqlite' and path and path != ':memory:':
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+
+def init_db(app) -> bool:
+    """Initialize DB and apply pragmas; returns True on a warm start.
+
+    A database already stamped with the current schema version skips
+    `create_all`, migrations and the FTS setup, so a warm start costs a
+    single query; the caller skips seeding as well.
+    """
     with app.app_context():
         # attach pragmas to the underlying engine
-        init_sqlite_pragmas(db.engine)
-        db.create_all()
+        profile = app.config.get('SQLITE_PROFILE', 'safe')
+        init_sqlite_pragmas(db.engine, profile)
+        _ensure_database_dir(db.engine)
+
+        from .migrations import is_up_to_date, upgrade
+        warm = is_up_to_date(db.engine)
+        if not warm:
+            fresh = not inspect(db.engine).has_table('transactions')
+            db.create_all()
+
+            applied = upgrade(db.engine, fresh=fresh)
+            if applied:
+                app.logger.info("Schema migrations applied: %s", applied)
+
+            from .search import init_client_search
+            init_client_search(db.engine)
+
+        effective = ', '.join(f"{k}={v}" for k, v in sqlite_pragmas(db.engine).items())
+        app.logger.info("SQLite profile '%s': %s", profile, effective)
+        return warm
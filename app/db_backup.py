@@ -0,0 +1,333 @@
+"""Online backups of the SQLite database, with rotation and restore.
+
+`create_backup` copies the live database with SQLite's online backup API
+in batches of `pages` pages, sleeping `pause` seconds between batches so
+the request threads get the CPU and the disk. The copy reads one snapshot
+(a read transaction held for the whole backup): in WAL mode that never
+blocks the POS writers, and their commits do not restart the copy. The
+copy is checked with ``PRAGMA integrity_check`` before it is kept,
+optionally gzip-compressed, and the directory is then rotated.
+
+Backups are named ``caixa-YYYYmmdd-HHMMSS.db[.gz]`` (local time). The
+monthly archive databases (see `app.archive`) hold sales that no longer
+exist in the main file, so every archive file is copied the same way into
+``caixa-YYYYmmdd-HHMMSS-arquivo/`` next to it. The main database is copied
+first: a month archived while the backup runs is then either still
+unregistered in the copy (its rows were not deleted yet) or already present
+in its archive file, which does not change after the move.
+
+Rotation keeps the `keep_last` most recent backups plus the newest of each
+of the last `keep_daily` days, removing a backup together with its archive
+copies. `restore_backup` verifies a backup (and its archive copies) and
+puts it in place of the database and the archive files, keeping the
+replaced files (and the WAL) next to them; it must only run with the
+server stopped.
+
+`BackupScheduler` runs `create_backup` periodically in a daemon thread
+(``Config.BACKUP_INTERVAL_HOURS``); ``backup_database.py`` is the command
+line for manual or scheduled (Task Scheduler / cron) use.
+"""
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.engine import make_url
+
+from .archive import ARCHIVE_NAME_RE, archive_dir_for, archive_files
+
+
+BACKUP_PREFIX = 'caixa-'
+_NAME_RE = re.compile(r'^caixa-(\d{8}-\d{6})\.db(\.gz)?$')
+_STAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+# Cópias simultâneas no mesmo processo disputariam disco sem ganho
+_backup_lock = threading.Lock()
+
+BackupResult = namedtuple('BackupResult', 'path size db_size seconds removed archives')
+
+
+class BackupError(Exception):
+    """Backup or restore failed; the message is shown to the user."""
+
+
+def database_path(uri) -> str:
+    """File path of an ``sqlite:///`` SQLAlchemy URI."""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise BackupError(f'Backup disponível apenas para bancos SQLite em arquivo: {uri}')
+    return url.database
+
+
+def archive_set_dir(backup_path) -> str:
+    """Directory holding the archive copies of the backup at `backup_path`."""
+    base = os.path.basename(backup_path)
+    return os.path.join(os.path.dirname(backup_path), base[:base.index('.db')] + '-arquivo')
+
+
+def _archive_copies(backup_path) -> list:
+    directory = archive_set_dir(backup_path)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if ARCHIVE_NAME_RE.match(name[:-3] if name.endswith('.gz') else name))
+
+
+def list_backups(dest_dir) -> list:
+    """(timestamp, path) of the backups in `dest_dir`, newest first."""
+    if not os.path.isdir(dest_dir):
+        return []
+    found = []
+    for name in os.listdir(dest_dir):
+        match = _NAME_RE.match(name)
+        if match:
+            found.append((datetime.strptime(match.group(1), _STAMP_FORMAT), os.path.join(dest_dir, name)))
+    return sorted(found, reverse=True)
+
+
+def rotate_backups(dest_dir, keep_last=10, keep_daily=30) -> list:
+    """Delete backups outside the retention policy; returns removed paths."""
+    backups = list_backups(dest_dir)
+    keep = {path for _, path in backups[:keep_last]}
+    days = []
+    for stamp, path in backups:
+        day = stamp.date()
+        if day not in days:
+            days.append(day)
+            if len(days) <= keep_daily:
+                keep.add(path)
+
+    removed = []
+    for _, path in backups:
+        if path not in keep:
+            os.remove(path)
+            shutil.rmtree(archive_set_dir(path), ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def _integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    finally:
+        conn.close()
+    if result != ['ok']:
+        raise BackupError(f'Falha na verificação de integridade de {path}: {"; ".join(result[:5])}')
+
+
+def _decompressed(path, dest_dir):
+    """Plain copy of backup `path` in `dest_dir` (caller removes it)."""
+    fd, plain = tempfile.mkstemp(suffix='.db', dir=dest_dir)
+    with os.fdopen(fd, 'wb') as out:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as src:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+    return plain
+
+
+def _verify_file(path):
+    plain = None
+    try:
+        plain = _decompressed(path, os.path.dirname(os.path.abspath(path)))
+        _integrity_check(plain)
+    except (OSError, EOFError, sqlite3.DatabaseError) as e:
+        raise BackupError(f'Backup ilegível {path}: {e}') from None
+    finally:
+        if plain:
+            os.remove(plain)
+
+
+def verify_backup(path):
+    """Raise `BackupError` unless `path` and its archive copies hold intact databases."""
+    for file_path in [path] + _archive_copies(path):
+        _verify_file(file_path)
+
+
+def _copy_database(source_path, dest_dir, name, pages, pause, compress, progress=None) -> str:
+    """Online copy of `source_path` to `dest_dir/name[.gz]`, checked before it is kept."""
+    final = os.path.join(dest_dir, name + ('.gz' if compress else ''))
+    partial = os.path.join(dest_dir, name + '.partial')
+
+    def _step_done(status, remaining, total):
+        if progress:
+            progress(remaining, total)
+        if pause:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        # Snapshot: sem uma transação de leitura aberta, cada gravação de
+        # outra conexão reinicia a cópia - com vendas chegando o tempo
+        # todo ela nunca terminaria. No modo WAL o leitor não bloqueia os
+        # escritores (o checkpoint apenas espera o fim da cópia).
+        source.execute('BEGIN')
+        source.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        source.backup(target, pages=pages, progress=_step_done)
+        source.execute('COMMIT')
+        # A cópia é um arquivo isolado: sem WAL para acompanhá-la
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        _integrity_check(partial)
+        if compress:
+            with open(partial, 'rb') as src, gzip.open(final + '.partial', 'wb', compresslevel=6) as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            os.replace(final + '.partial', final)
+            os.remove(partial)
+        else:
+            os.replace(partial, final)
+    except Exception:
+        for leftover in (partial, final + '.partial'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return final
+
+
+def create_backup(db_path, dest_dir, pages=256, pause=0.005, compress=True,
+                  keep_last=10, keep_daily=30, progress=None, archive_dir=None) -> BackupResult:
+    """Copy `db_path` and its archive databases into `dest_dir` without stopping the application.
+
+    `archive_dir` defaults to the ``arquivo`` folder next to the database.
+    `progress(remaining, total)` is called after each batch of pages of the
+    main database.
+    """
+    if not os.path.exists(db_path):
+        raise BackupError(f'Banco de dados não encontrado: {db_path}')
+    os.makedirs(dest_dir, exist_ok=True)
+    archives = archive_files(archive_dir_for(db_path, archive_dir))
+
+    with _backup_lock:
+        started = time.perf_counter()
+        name = BACKUP_PREFIX + datetime.now().strftime(_STAMP_FORMAT) + '.db'
+        final = _copy_database(db_path, dest_dir, name, pages, pause, compress, progress)
+
+        copies = []
+        if archives:
+            set_dir = archive_set_dir(final)
+            os.makedirs(set_dir, exist_ok=True)
+            try:
+                for archive in archives:
+                    copies.append(_copy_database(archive, set_dir, os.path.basename(archive),
+                                                 pages, pause, compress))
+            except Exception:
+                # Backup incompleto não pode ser restaurado como se estivesse inteiro
+                os.remove(final)
+                shutil.rmtree(set_dir, ignore_errors=True)
+                raise
+
+        removed = rotate_backups(dest_dir, keep_last, keep_daily)
+        return BackupResult(
+            path=final,
+            size=os.path.getsize(final) + sum(os.path.getsize(copy) for copy in copies),
+            db_size=os.path.getsize(db_path) + sum(os.path.getsize(archive) for archive in archives),
+            seconds=time.perf_counter() - started,
+            removed=removed,
+            archives=copies,
+        )
+
+
+def _replace_with(plain, path, stamp) -> str:
+    """Put `plain` in place of `path`, keeping the current file (and WAL) aside."""
+    previous = f"{path}.pre-restore-{stamp}"
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.replace(path + suffix, previous + suffix)
+    os.replace(plain, path)
+    return previous
+
+
+def restore_backup(backup_path, db_path, archive_dir=None) -> str:
+    """Replace `db_path` and the archive files by the verified backup; returns where the old database went.
+
+    The current database and its ``-wal``/``-shm`` files are renamed to
+    ``<db>.pre-restore-<timestamp>`` (a stale WAL must never be replayed on
+    top of the restored file), and so is each archive file being replaced.
+    Every file of the backup is verified before anything is replaced.
+    """
+    dest_dir = os.path.dirname(os.path.abspath(db_path))
+    target_archive_dir = archive_dir_for(db_path, archive_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    restored = []  # (arquivo descompactado, destino)
+    try:
+        for source, target_dir in [(backup_path, dest_dir)] + [(copy, target_archive_dir)
+                                                             for copy in _archive_copies(backup_path)]:
+            os.makedirs(target_dir, exist_ok=True)
+            try:
+                plain = _decompressed(source, target_dir)
+            except (OSError, EOFError) as e:
+                raise BackupError(f'Backup ilegível {source}: {e}') from None
+            restored.append((plain, target_dir, source))
+            try:
+                _integrity_check(plain)
+            except (BackupError, sqlite3.DatabaseError) as e:
+                raise BackupError(str(e)) from None
+    except BackupError:
+        for plain, _, _ in restored:
+            os.remove(plain)
+        raise
+
+    stamp = datetime.now().strftime(_STAMP_FORMAT)
+    previous = _replace_with(restored[0][0], db_path, stamp)
+    for plain, target_dir, source in restored[1:]:
+        name = os.path.basename(source)
+        _replace_with(plain, os.path.join(target_dir, name[:-3] if name.endswith('.gz') else name), stamp)
+    return previous
+
+
+def backup_settings(config) -> dict:
+    """`create_backup` arguments from a Flask config or `Config` class."""
+    get = config.get if hasattr(config, 'get') else lambda key, default=None: getattr(config, key, default)
+    return {
+        'db_path': database_path(get('SQLALCHEMY_DATABASE_URI')),
+        'dest_dir': get('BACKUP_DIR'),
+        'pages': get('BACKUP_PAGES', 256),
+        'pause': get('BACKUP_PAUSE_MS', 5) / 1000,
+        'compress': get('BACKUP_COMPRESS', True),
+        'keep_last': get('BACKUP_KEEP_LAST', 10),
+        'keep_daily': get('BACKUP_KEEP_DAILY', 30),
+        'archive_dir': get('ARCHIVE_DIR'),
+    }
+
+
+class BackupScheduler:
+    """Daemon thread running `create_backup` every `interval_hours`."""
+
+    def __init__(self, app, interval_hours):
+        self.app = app
+        self.interval = interval_hours * 3600
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='caixa-backup', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = create_backup(**backup_settings(self.app.config))
+                self.last_error = None
+                self.app.logger.info("Backup %s (%.1f s)", self.last_result.path, self.last_result.seconds)
+            except Exception as e:
+                self.last_error = str(e)
+                self.app.logger.error("Backup failed: %s", e)
@@ -0,0 +1,141 @@
+"""Server-Sent Events broker for live dashboard updates.
+
+Request handlers `publish` small events after their commit (a sale, a
+sangria, "totals changed"); every page subscribed to ``/api/resumo/stream``
+receives them through its own bounded queue and updates itself without
+querying the server again. An idle dashboard therefore costs no queries,
+only a comment line (heartbeat) every `heartbeat` seconds, which also
+keeps proxies and the waitress channel timeout from closing the stream and
+lets a dead connection be noticed.
+
+Each open stream holds one server worker thread for as long as it is
+open, so `max_subscribers` must stay well below ``SERVER_THREADS``;
+`subscribe` raises `TooManySubscribers` past the limit. A subscriber whose
+queue is full (a stalled client) misses events and is told to reload the
+whole summary instead (``resync``).
+"""
+import itertools
+import json
+import queue
+import threading
+
+
+class TooManySubscribers(Exception):
+    """The subscriber limit was reached."""
+
+
+_CLOSE = object()
+
+
+class Subscription:
+    """One open event stream; iterate `stream()` and `close()` when done."""
+
+    def __init__(self, broker, max_queue):
+        self._broker = broker
+        self._queue = queue.Queue(max_queue)
+        self.missed = False
+        self.closed = False
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.missed = True
+
+    def stream(self):
+        """SSE text chunks: events as they come, a heartbeat comment when idle."""
+        yield f"retry: {self._broker.retry_ms}\n\n"
+        while True:
+            try:
+                message = self._queue.get(timeout=self._broker.heartbeat)
+            except queue.Empty:
+                if self.closed:
+                    return
+                yield ": ping\n\n"
+                continue
+            if message is _CLOSE or self.closed:
+                return
+            if self.missed:
+                # Events were dropped: discard the backlog, the page reloads everything
+                self.missed = False
+                while not self._queue.empty():
+                    if self._queue.get_nowait() is _CLOSE:
+                        return
+                yield self._broker.format('resync', {})
+                continue
+            yield message
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class EventBroker:
+    """Fan-out of published events to the current subscriptions."""
+
+    def __init__(self, max_subscribers=4, heartbeat=15, max_queue=100, retry_ms=5000):
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.max_queue = max_queue
+        self.retry_ms = retry_ms
+        self.published = 0
+        self.rejected = 0
+        self._ids = itertools.count(1)
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def configure(self, max_subscribers=None, heartbeat=None):
+        if max_subscribers is not None:
+            self.max_subscribers = max_subscribers
+        if heartbeat is not None:
+            self.heartbeat = heartbeat
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(f'Máximo de {self.max_subscribers} painéis conectados')
+            subscription = Subscription(self, self.max_queue)
+            self._subscriptions.add(subscription)
+            return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def format(self, event, data) -> str:
+        return f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def publish(self, event, data):
+        """Send `event` with JSON `data` to every subscriber (never blocks)."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+        message = self.format(event, data)
+        self.published += 1
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def close(self):
+        """End every open stream (server shutdown)."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.closed = True
+            try:
+                subscription._queue.put_nowait(_CLOSE)
+            except queue.Full:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            'subscribers': self.subscribers,
+            'max_subscribers': self.max_subscribers,
+            'published': self.published,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,192 @@
+"""Single-instance control channel of the server process.
+
+The running server listens on an ephemeral 127.0.0.1 port and records it,
+with its pid, HTTP port and a random token, in ``instance.json`` next to the
+database (`instance_path`). Another process asks it questions with
+`query_instance`: one JSON line per connection, ``{"cmd": ..., "token": ...}``
+in, one JSON line out.
+
+- ``status``: ``{"app": "caixa", "pid", "port", "uptime_s", "database"}``;
+- ``shutdown``: answers ``{"ok": true}`` and stops the HTTP server;
+- ``invalidate``: drops the in-process caches and bumps every table
+  version (ETags), after another process wrote to the database (archive
+  job); answers ``{"ok": true}``.
+
+The client side (`query_instance`, `instance_path`) lives in the top-level
+``instance_client`` module, which does not import this package, so the
+launcher GUI can use it without loading Flask; it is re-exported here.
+
+Only one server per data directory: `InstanceLock` takes an exclusive,
+non-blocking lock on ``instance.json.lock`` before the app is created and
+holds it for the server's lifetime. The operating system releases it when
+the process exits, even after a crash. A second server that cannot take
+the lock waits for the holder's instance file (`wait_for_instance`)
+instead of starting its own, so two launchers starting at once never
+end up with two servers on one database.
+
+A stale file (crashed server, reused pid) costs one refused connection on
+localhost instead of a wrong answer, and a program that happens to reuse
+the control port does not know the token. `query_instance` never takes
+longer than ``CONNECT_TIMEOUT + REPLY_TIMEOUT`` (1.5 s); a live server
+answers in a few milliseconds.
+"""
+import json
+import os
+import secrets
+import socket
+import threading
+import time
+
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    import fcntl
+    msvcrt = None
+
+from sqlalchemy import text
+
+from instance_client import APP_ID, REPLY_TIMEOUT, instance_path, query_instance, read_instance  # noqa: F401
+
+from .cache import bump_versions, clear_caches
+from .db import db
+
+
+LOCK_SUFFIX = '.lock'
+
+
+class InstanceLock:
+    """Exclusive lock that marks the server of one data directory."""
+
+    def __init__(self, path):
+        self.path = path + LOCK_SUFFIX
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Take the lock without blocking; False if another process holds it."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, 'a+b')
+        try:
+            if msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            # Fechar o arquivo libera o lock nas duas plataformas
+            self._file.close()
+            self._file = None
+
+
+def wait_for_instance(path, timeout, interval=0.2):
+    """`query_instance` status of the server at `path`, polled for up to `timeout` s."""
+    deadline = time.monotonic() + timeout
+    while True:
+        info = query_instance(path)
+        if info or time.monotonic() >= deadline:
+            return info
+        time.sleep(interval)
+
+
+class ControlServer:
+    """Answers `query_instance` requests for a running `ServerHandle`."""
+
+    def __init__(self, app, server, path):
+        self.app = app
+        self.server = server
+        self.path = path
+        self.token = secrets.token_hex(16)
+        self.started = time.monotonic()
+        self._socket = None
+
+    def start(self):
+        """Listen, publish the instance file and serve in a daemon thread."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(8)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({
+                'pid': os.getpid(),
+                'port': self.server.port,
+                'control_port': self._socket.getsockname()[1],
+                'token': self.token,
+            }, f)
+        os.replace(temporary, self.path)
+
+        threading.Thread(target=self._serve, name='caixa-control', daemon=True).start()
+        return self
+
+    def close(self):
+        """Stop listening and remove the instance file if it is still ours."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        info = read_instance(self.path)
+        if info and info.get('token') == self.token:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self._socket is not None:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    conn.settimeout(REPLY_TIMEOUT)
+                    request = json.loads(conn.makefile('rb').readline())
+                    reply, then = self._handle(request)
+                    conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+                except (OSError, ValueError):
+                    continue
+            if then:
+                then()
+
+    def _handle(self, request):
+        if not isinstance(request, dict) or request.get('token') != self.token:
+            return {'error': 'token inválido'}, None
+
+        if request.get('cmd') == 'status':
+            return dict(self._status(), app=APP_ID), None
+        if request.get('cmd') == 'shutdown':
+            return {'app': APP_ID, 'ok': True}, self._shutdown
+        if request.get('cmd') == 'invalidate':
+            clear_caches()
+            bump_versions(db.metadata.tables)
+            return {'app': APP_ID, 'ok': True}, None
+        return {'app': APP_ID, 'error': f"comando desconhecido: {request.get('cmd')}"}, None
+
+    def _status(self):
+        try:
+            with self.app.app_context():
+                db.session.execute(text('SELECT 1'))
+                db.session.remove()
+            database = 'ok'
+        except Exception as e:
+            database = str(e)
+        return {
+            'pid': os.getpid(),
+            'port': self.server.port,
+            'uptime_s': round(time.monotonic() - self.started, 1),
+            'database': database,
+        }
+
+    def _shutdown(self):
+        self.close()
+        # Open event streams would hold server threads until their next heartbeat
+        events = self.app.extensions.get('caixa_events')
+        if events:
+            events.close()
+        self.server.close()
@@ -0,0 +1,201 @@
+"""Incremental schema upgrades for existing databases.
+
+`db.create_all()` only creates missing tables; it never touches tables that
+already exist in a user's ``caixa.db``. Changes to existing tables (new
+indexes, columns, data backfills) are registered here as numbered steps.
+
+The number of the last applied step is stored in ``system_config`` under
+``schema_version``. `upgrade` runs every pending step in its own
+transaction and stamps the version right after it, so an interrupted upgrade
+resumes from the failed step. Each step is written against the schema of its
+own version (plain SQL, not the current models); a database just created by
+`create_all` already has the latest schema and is stamped without running
+any step.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+SCHEMA_VERSION_KEY = 'schema_version'
+
+
+def _has_column(conn, table, column):
+    return any(row[1] == column for row in conn.exec_driver_sql(f"PRAGMA table_info({table})"))
+
+
+def _create_index(conn, name, table, *columns):
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+def _m001_foreign_key_indexes(conn):
+    """Índices em chaves estrangeiras e colunas de filtro frequentes."""
+    _create_index(conn, 'ix_transactions_client_id', 'transactions', 'client_id')
+    _create_index(conn, 'ix_transaction_items_transaction_id', 'transaction_items', 'transaction_id')
+    _create_index(conn, 'ix_transaction_items_product_description', 'transaction_items',
+                  'product_id', 'description')
+    _create_index(conn, 'ix_payments_transaction_id', 'payments', 'transaction_id')
+    _create_index(conn, 'ix_payments_method_amount', 'payments', 'payment_method_id', 'amount')
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _m002_transaction_kind(conn):
+    """Coluna `transactions.kind`, preenchida a partir do prefixo das observações."""
+    if not _has_column(conn, 'transactions', 'kind'):
+        conn.exec_driver_sql(
+            "ALTER TABLE transactions ADD COLUMN kind VARCHAR(20) NOT NULL DEFAULT 'venda'"
+        )
+    # Sangrias antigas só eram reconhecíveis pelo valor negativo ou pelas observações
+    conn.execute(text(
+        "UPDATE transactions SET kind = :sangria "
+        "WHERE kind = :venda AND (total < 0 OR notes LIKE 'SANGRIA:%' OR notes LIKE 'RETIRADA:%')"
+    ), {'sangria': 'sangria', 'venda': 'venda'})
+    _create_index(conn, 'ix_transactions_kind_date', 'transactions', 'kind', 'date')
+
+
+_MONEY_COLUMNS = (
+    ('products', 'price'),
+    ('transactions', 'total'),
+    ('transaction_items', 'unit_price'),
+    ('transaction_items', 'subtotal'),
+    ('payments', 'amount'),
+)
+
+# Tabelas derivadas na versão 3, recriadas vazias pela migração
+_DERIVED_TABLES_V3 = {
+    'payment_method_balances': """CREATE TABLE payment_method_balances (
+        payment_method_id INTEGER NOT NULL,
+        total_sales_cents INTEGER NOT NULL,
+        total_sangrias_cents INTEGER NOT NULL,
+        balance_cents INTEGER NOT NULL,
+        updated_at DATETIME,
+        PRIMARY KEY (payment_method_id),
+        FOREIGN KEY(payment_method_id) REFERENCES payment_methods (id)
+    )""",
+    'daily_rollups': """CREATE TABLE daily_rollups (
+        day DATE NOT NULL,
+        payment_method_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        sales_count INTEGER NOT NULL,
+        sales_total_cents INTEGER NOT NULL,
+        sangrias_count INTEGER NOT NULL,
+        sangrias_total_cents INTEGER NOT NULL,
+        items_qty INTEGER NOT NULL,
+        PRIMARY KEY (day, payment_method_id, product_id)
+    )""",
+}
+
+
+def _m003_money_in_cents(conn):
+    """Valores monetários em centavos inteiros (colunas `*_cents`)."""
+    for table, column in _MONEY_COLUMNS:
+        if not _has_column(conn, table, column):
+            continue
+        # RENAME COLUMN também atualiza os índices que usam a coluna
+        conn.exec_driver_sql(f"ALTER TABLE {table} RENAME COLUMN {column} TO {column}_cents")
+        conn.exec_driver_sql(
+            f"UPDATE {table} SET {column}_cents = CAST(ROUND({column}_cents * 100) AS INTEGER)"
+        )
+
+    # Tabelas derivadas: recriadas vazias e recalculadas no startup
+    # (`_ensure_derived_tables`) a partir das tabelas já convertidas
+    for table, ddl in _DERIVED_TABLES_V3.items():
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+        conn.exec_driver_sql(ddl)
+
+
+_CASH_SESSION_TABLES_V4 = (
+    """CREATE TABLE IF NOT EXISTS cash_sessions (
+        id INTEGER NOT NULL,
+        opened_at DATETIME NOT NULL,
+        closed_at DATETIME,
+        start_transaction_id INTEGER NOT NULL,
+        start_payment_id INTEGER NOT NULL,
+        end_transaction_id INTEGER,
+        end_payment_id INTEGER,
+        notes TEXT,
+        report TEXT,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_cash_sessions_closed_at ON cash_sessions (closed_at)",
+    """CREATE TABLE IF NOT EXISTS cash_session_balances (
+        session_id INTEGER NOT NULL,
+        payment_method_id INTEGER NOT NULL,
+        opening_balance_cents INTEGER NOT NULL,
+        sales_cents INTEGER NOT NULL,
+        sangrias_cents INTEGER NOT NULL,
+        closing_balance_cents INTEGER,
+        PRIMARY KEY (session_id, payment_method_id),
+        FOREIGN KEY(session_id) REFERENCES cash_sessions (id),
+        FOREIGN KEY(payment_method_id) REFERENCES payment_methods (id)
+    )""",
+)
+
+
+def _m004_cash_sessions(conn):
+    """Turnos do caixa (`cash_sessions`) e seus saldos por método."""
+    for ddl in _CASH_SESSION_TABLES_V4:
+        conn.exec_driver_sql(ddl)
+
+
+MIGRATIONS = [
+    (1, _m001_foreign_key_indexes),
+    (2, _m002_transaction_kind),
+    (3, _m003_money_in_cents),
+    (4, _m004_cash_sessions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    value = conn.execute(
+        text("SELECT value FROM system_config WHERE key = :key"), {'key': SCHEMA_VERSION_KEY}
+    ).scalar()
+    return int(value) if value else 0
+
+
+def is_up_to_date(engine) -> bool:
+    """True when the database is already stamped with `SCHEMA_VERSION`.
+
+    This is the whole warm-start check: one query, no reflection. A new
+    file (no ``system_config`` table yet) is not up to date.
+    """
+    try:
+        with engine.connect() as conn:
+            return get_schema_version(conn) >= SCHEMA_VERSION
+    except OperationalError:
+        return False
+
+
+def _stamp(conn, version):
+    conn.execute(text(
+        "INSERT INTO system_config (key, value, description, created_at, updated_at) "
+        "VALUES (:key, :value, 'Versao do esquema do banco (app/migrations.py)', "
+        "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP"
+    ), {'key': SCHEMA_VERSION_KEY, 'value': str(version)})
+
+
+def upgrade(engine, fresh=False) -> list:
+    """Apply pending migrations; returns the versions applied.
+
+    `fresh` marks a database whose tables were all just created by
+    `create_all`: it is stamped with `SCHEMA_VERSION` directly.
+    """
+    if fresh:
+        with engine.begin() as conn:
+            _stamp(conn, SCHEMA_VERSION)
+        return []
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    applied = []
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            _stamp(conn, version)
+        applied.append(version)
+    return applied
@@ -2,9 +2,12 @@
 
 Simple models are defined for the MVP: Client, Product, Transaction, TransactionItem.
 """
+from collections import namedtuple
 from datetime import datetime
-from decimal import Decimal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .cache import LookupCache, mark_dates, on_commit, track_dates
 from .db import db
+from .money import from_cents
 
 
 class Client(db.Model):
@@ -26,40 +29,55 @@ class Product(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False, index=True)
-    price = db.Column(db.Numeric(10, 2), nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
     type = db.Column(db.String(50), default="service")
     active = db.Column(db.Boolean, default=True)
 
     def __repr__(self):
-        return f"<Product {self.id} {self.name} {self.price}>"
+        return f"<Product {self.id} {self.name} {self.price_cents}>"
 
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Relatórios filtrados por tipo e totais de sangrias por período
+        db.Index('ix_transactions_kind_date', 'kind', 'date'),
+    )
+
+    # Tipos de transação (mesmos valores do campo `tipo` da API)
+    KIND_SALE = 'venda'
+    KIND_WITHDRAWAL = 'sangria'
+    KIND_ADJUSTMENT = 'ajuste'
+    KINDS = (KIND_SALE, KIND_WITHDRAWAL, KIND_ADJUSTMENT)
 
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    client_id = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=True)
-    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    client_id = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=True, index=True)
+    kind = db.Column(db.String(20), nullable=False, default=KIND_SALE, server_default=KIND_SALE)
+    total_cents = db.Column(db.Integer, nullable=False, default=0)
     notes = db.Column(db.Text, nullable=True)
 
     client = db.relationship("Client", backref=db.backref("transactions", lazy=True))
     items = db.relationship("TransactionItem", backref="transaction", cascade="all, delete-orphan", lazy=True)
 
     def __repr__(self):
-        return f"<Transaction {self.id} {self.total}>"
+        return f"<Transaction {self.id} {self.total_cents}>"
 
 
 class TransactionItem(db.Model):
     __tablename__ = "transaction_items"
+    __table_args__ = (
+        # Uso do produto (remoção, contagem em produtos-unicos) e descrições personalizadas
+        db.Index('ix_transaction_items_product_description', 'product_id', 'description'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=True)
     description = db.Column(db.String(255), nullable=True)
     qty = db.Column(db.Integer, nullable=False, default=1)
-    unit_price = db.Column(db.Numeric(10, 2), nullable=False, default=Decimal('0.00'))
-    subtotal = db.Column(db.Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+    unit_price_cents = db.Column(db.Integer, nullable=False, default=0)
+    subtotal_cents = db.Column(db.Integer, nullable=False, default=0)
 
     product = db.relationship("Product")
 
@@ -80,11 +98,17 @@ class SystemConfig(db.Model):
     def __repr__(self):
         return f"<Config {self.key}={self.value}>"
 
+    _cache = LookupCache('system_config')
+
     @classmethod
     def get_value(cls, key, default=None):
-        """Get configuration value by key"""
-        config = cls.query.filter_by(key=key).first()
-        return config.value if config else default
+        """Get configuration value by key (cached until the table is written)"""
+        def _load():
+            config = cls.query.filter_by(key=key).first()
+            return config.value if config else None
+
+        value = cls._cache.get(key, _load)
+        return value if value is not None else default
 
     @classmethod
     def set_value(cls, key, value, description=None):
@@ -99,9 +123,14 @@ class SystemConfig(db.Model):
             config = cls(key=key, value=value, description=description)
             db.session.add(config)
         db.session.commit()
+        cls._cache.clear()
         return config
 
 
+# Cópia desacoplada da sessão de um PaymentMethod, segura para reutilizar entre requisições
+PaymentMethodInfo = namedtuple('PaymentMethodInfo', 'id name code description active color')
+
+
 class PaymentMethod(db.Model):
     """Métodos de pagamento disponíveis"""
     __tablename__ = "payment_methods"
@@ -117,25 +146,59 @@ class PaymentMethod(db.Model):
     def __repr__(self):
         return f"<PaymentMethod {self.name}>"
 
+    _cache = LookupCache('payment_methods')
+
+    @classmethod
+    def _all_cached(cls):
+        """Todos os métodos, por id, carregados em uma única consulta e mantidos em cache"""
+        def _load():
+            return {
+                m.id: PaymentMethodInfo(m.id, m.name, m.code, m.description, m.active, m.color)
+                for m in cls.query.order_by(cls.id).all()
+            }
+
+        return cls._cache.get('all', _load)
+
+    @classmethod
+    def get_all_by_id(cls):
+        """Todos os métodos (ativos ou não) por id, sem consultar o banco"""
+        return cls._all_cached()
+
     @classmethod
     def get_active_methods(cls):
         """Obter métodos de pagamento ativos"""
-        return cls.query.filter_by(active=True).all()
+        return [m for m in cls._all_cached().values() if m.active]
 
     @classmethod
     def get_by_code(cls, code):
         """Obter método por código"""
-        return cls.query.filter_by(code=code, active=True).first()
+        return next((m for m in cls._all_cached().values() if m.code == code and m.active), None)
+
+    @classmethod
+    def get_cached(cls, method_id):
+        """Obter método por id (ativo ou não) sem consultar o banco"""
+        try:
+            return cls._all_cached().get(int(method_id))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def invalidate_cache(cls):
+        cls._cache.clear()
 
 
 class Payment(db.Model):
     """Pagamentos individuais de cada transação"""
     __tablename__ = "payments"
+    __table_args__ = (
+        # Agregados de saldo por método leem só o índice
+        db.Index('ix_payments_method_amount', 'payment_method_id', 'amount_cents'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False, index=True)
     payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'), nullable=False)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relacionamentos
@@ -143,19 +206,393 @@ class Payment(db.Model):
     payment_method = db.relationship('PaymentMethod', backref='payments')
 
     def __repr__(self):
-        return f"<Payment {self.payment_method.name}: R${self.amount}>"
+        return f"<Payment {self.payment_method.name}: R${from_cents(self.amount_cents):.2f}>"
 
     @classmethod
     def get_balance_by_method(cls, method_id=None):
-        """Calcular saldo por método de pagamento"""
+        """Calcular saldo por método de pagamento (total em centavos)"""
         query = db.session.query(
             PaymentMethod.name,
             PaymentMethod.code,
             PaymentMethod.color,
-            db.func.sum(Payment.amount).label('total')
-        ).join(Payment).filter(Payment.amount > 0)
+            db.func.sum(Payment.amount_cents).label('total_cents')
+        ).join(Payment).filter(Payment.amount_cents > 0)
         
         if method_id:
             query = query.filter(Payment.payment_method_id == method_id)
         
-        return query.group_by(PaymentMethod.id, PaymentMethod.name, PaymentMethod.code, PaymentMethod.color).all()
\ No newline at end of file
+        return query.group_by(PaymentMethod.id, PaymentMethod.name, PaymentMethod.code, PaymentMethod.color).all()
+
+
+class PaymentMethodBalance(db.Model):
+    """Saldos materializados por método de pagamento.
+
+    Mantém totais acumulados (em centavos) de vendas, sangrias e saldo
+    líquido de cada método, atualizados na mesma transação que grava os
+    pagamentos. Assim a leitura de um saldo é uma busca pela chave primária,
+    sem somar `payments`.
+    """
+    __tablename__ = "payment_method_balances"
+
+    payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'), primary_key=True)
+    total_sales_cents = db.Column(db.Integer, nullable=False, default=0)
+    total_sangrias_cents = db.Column(db.Integer, nullable=False, default=0)  # valor positivo
+    balance_cents = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    payment_method = db.relationship('PaymentMethod', backref=db.backref('balance_entry', uselist=False))
+
+    def __repr__(self):
+        return f"<PaymentMethodBalance {self.payment_method_id}: R${from_cents(self.balance_cents):.2f}>"
+
+    @classmethod
+    def apply(cls, payment_method_id, amount_cents, kind=Transaction.KIND_SALE):
+        """Aplicar um pagamento (em centavos) ao saldo do método.
+
+        Pagamentos de sangria (`kind`) têm valor negativo e somam em
+        `total_sangrias_cents`; os demais somam em `total_sales_cents`. Não faz
+        commit: deve ser chamado na mesma sessão que grava o `Payment`, para
+        que saldo e pagamento sejam confirmados (ou desfeitos) juntos.
+        """
+        cls.apply_many([(payment_method_id, amount_cents, kind)])
+
+    @classmethod
+    def apply_many(cls, payments):
+        """Como `apply`, para vários (payment_method_id, amount_cents, kind).
+
+        Os valores são somados por método antes de gravar: um upsert por
+        método, em uma única chamada executemany.
+        """
+        deltas = {}
+        for payment_method_id, amount_cents, kind in payments:
+            row = deltas.setdefault(payment_method_id, [0, 0, 0])
+            if kind == Transaction.KIND_WITHDRAWAL:
+                row[1] -= amount_cents
+            else:
+                row[0] += amount_cents
+            row[2] += amount_cents
+        if not deltas:
+            return
+
+        now = datetime.utcnow()
+        db.session.execute(cls._upsert_statement(), [
+            {
+                'payment_method_id': payment_method_id,
+                'total_sales_cents': sales,
+                'total_sangrias_cents': sangrias,
+                'balance_cents': balance,
+                'updated_at': now,
+            }
+            for payment_method_id, (sales, sangrias, balance) in deltas.items()
+        ])
+
+    _upsert = None
+
+    @classmethod
+    def _upsert_statement(cls):
+        """INSERT ... ON CONFLICT que soma as variações ao saldo (construído uma vez)"""
+        if cls._upsert is None:
+            table = cls.__table__
+            stmt = sqlite_insert(table)
+            cls._upsert = stmt.on_conflict_do_update(
+                index_elements=[table.c.payment_method_id],
+                set_={
+                    'total_sales_cents': table.c.total_sales_cents + stmt.excluded.total_sales_cents,
+                    'total_sangrias_cents': table.c.total_sangrias_cents + stmt.excluded.total_sangrias_cents,
+                    'balance_cents': table.c.balance_cents + stmt.excluded.balance_cents,
+                    'updated_at': stmt.excluded.updated_at,
+                }
+            )
+        return cls._upsert
+
+    @classmethod
+    def get_balance_cents(cls, payment_method_id):
+        """Saldo líquido atual do método (vendas - sangrias), em centavos"""
+        # SELECT direto (e não session.get) para ver upserts feitos na mesma
+        # transação, ainda não refletidos no identity map
+        return db.session.execute(
+            db.select(cls.balance_cents).where(cls.payment_method_id == payment_method_id)
+        ).scalar() or 0
+
+    @classmethod
+    def _totals_query(cls, transaction=Transaction, payment=Payment):
+        """Totais por método (colunas da tabela, em centavos) de um banco de transações"""
+        amount = payment.amount_cents
+        is_sangria = transaction.kind == Transaction.KIND_WITHDRAWAL
+        return db.session.query(
+            payment.payment_method_id,
+            db.func.coalesce(db.func.sum(db.case((is_sangria, 0), else_=amount)), 0),
+            db.func.coalesce(db.func.sum(db.case((is_sangria, -amount), else_=0)), 0),
+            db.func.coalesce(db.func.sum(amount), 0),
+            db.func.current_timestamp()
+        ).join(transaction, payment.transaction_id == transaction.id)\
+         .group_by(payment.payment_method_id)
+
+    @classmethod
+    def rebuild(cls):
+        """Recalcular todos os saldos a partir da tabela `payments` (e dos meses arquivados)"""
+        from .archive import archived_rows
+        columns = ['payment_method_id', 'total_sales_cents', 'total_sangrias_cents', 'balance_cents', 'updated_at']
+        # Meses arquivados são lidos antes de abrir a transação de escrita
+        archived = archived_rows(lambda fonte: cls._totals_query(fonte.transaction, fonte.payment))
+
+        db.session.query(cls).delete()
+        db.session.execute(cls.__table__.insert().from_select(columns, cls._totals_query()))
+        if archived:
+            now = datetime.utcnow()
+            db.session.execute(cls._upsert_statement(), [
+                dict(zip(columns, (*row[:4], now))) for row in archived
+            ])
+        db.session.commit()
+
+
+class DailyRollup(db.Model):
+    """Agregados diários por método de pagamento e por produto.
+
+    Cada linha é identificada por (dia, método, produto). O valor `ALL` (0)
+    em uma das dimensões indica o total do dia naquela dimensão:
+
+    - (dia, ALL, ALL): totais das transações do dia (vendas e sangrias);
+    - (dia, método, ALL): pagamentos recebidos/retirados no método;
+    - (dia, ALL, produto): itens vendidos do produto (`CUSTOM` para itens
+      sem cadastro).
+
+    As linhas são atualizadas incrementalmente junto com cada transação, de
+    modo que totais de dashboard e de períodos somam poucas linhas por dia.
+    """
+    __tablename__ = "daily_rollups"
+
+    ALL = 0
+    CUSTOM = -1
+
+    day = db.Column(db.Date, primary_key=True)
+    payment_method_id = db.Column(db.Integer, primary_key=True, default=0)
+    product_id = db.Column(db.Integer, primary_key=True, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_total_cents = db.Column(db.Integer, nullable=False, default=0)
+    sangrias_count = db.Column(db.Integer, nullable=False, default=0)
+    sangrias_total_cents = db.Column(db.Integer, nullable=False, default=0)  # valor positivo
+    items_qty = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyRollup {self.day} method={self.payment_method_id} product={self.product_id}>"
+
+    @classmethod
+    def apply_transaction(cls, date, total_cents, items=(), payments=(), kind=Transaction.KIND_SALE):
+        """Somar uma transação aos agregados do seu dia.
+
+        Valores em centavos: `items` é uma sequência de (product_id, qty,
+        subtotal_cents) e `payments` de (payment_method_id, amount_cents). Sangrias
+        (`kind`) somam nas colunas de sangria com valor positivo; vendas e
+        ajustes, nas de venda. Não faz commit: deve ser chamado na mesma
+        sessão que grava a transação.
+        """
+        cls.apply_transactions([(date, total_cents, items, payments, kind)])
+
+    @classmethod
+    def apply_transactions(cls, transactions):
+        """Como `apply_transaction`, para vários (date, total_cents, items, payments, kind).
+
+        As variações são somadas por (dia, método, produto) antes de gravar,
+        em uma única chamada executemany.
+        """
+        deltas = {}
+
+        def _add(day, method_id, product_id, amount, is_sangria, qty=0):
+            row = deltas.setdefault((day, method_id, product_id), [0, 0, 0, 0, 0])
+            if is_sangria:
+                row[2] += 1
+                row[3] += -amount
+            else:
+                row[0] += 1
+                row[1] += amount
+            row[4] += qty
+
+        dates = set()
+        for date, total_cents, items, payments, kind in transactions:
+            dates.add(date)
+            day = date.date()
+            is_sangria = kind == Transaction.KIND_WITHDRAWAL
+            _add(day, cls.ALL, cls.ALL, total_cents, is_sangria)
+            for method_id, amount_cents in payments:
+                _add(day, method_id, cls.ALL, amount_cents, is_sangria)
+            for product_id, qty, subtotal_cents in items:
+                _add(day, cls.ALL, product_id or cls.CUSTOM, subtotal_cents or 0, is_sangria, qty or 0)
+        if not deltas:
+            return
+
+        # Datas gravadas, para invalidar só os relatórios que as incluem
+        mark_dates(db.session, *dates)
+        db.session.execute(cls._upsert_statement(), [
+            {
+                'day': day,
+                'payment_method_id': method_id,
+                'product_id': product_id,
+                'sales_count': row[0],
+                'sales_total_cents': row[1],
+                'sangrias_count': row[2],
+                'sangrias_total_cents': row[3],
+                'items_qty': row[4],
+            }
+            for (day, method_id, product_id), row in deltas.items()
+        ])
+
+    _upsert = None
+
+    @classmethod
+    def _upsert_statement(cls):
+        """INSERT ... ON CONFLICT que soma as variações ao dia (construído uma vez)"""
+        if cls._upsert is None:
+            table = cls.__table__
+            stmt = sqlite_insert(table)
+            cls._upsert = stmt.on_conflict_do_update(
+                index_elements=[table.c.day, table.c.payment_method_id, table.c.product_id],
+                set_={
+                    'sales_count': table.c.sales_count + stmt.excluded.sales_count,
+                    'sales_total_cents': table.c.sales_total_cents + stmt.excluded.sales_total_cents,
+                    'sangrias_count': table.c.sangrias_count + stmt.excluded.sangrias_count,
+                    'sangrias_total_cents': table.c.sangrias_total_cents + stmt.excluded.sangrias_total_cents,
+                    'items_qty': table.c.items_qty + stmt.excluded.items_qty,
+                }
+            )
+        return cls._upsert
+
+    @classmethod
+    def totals(cls, start=None, end=None):
+        """Totais de transações no intervalo de dias [start, end] (datas inclusivas).
+
+        Os valores são somados em centavos e retornados em reais (formato da API).
+        """
+        query = db.session.query(
+            db.func.coalesce(db.func.sum(cls.sales_count), 0),
+            db.func.coalesce(db.func.sum(cls.sales_total_cents), 0),
+            db.func.coalesce(db.func.sum(cls.sangrias_count), 0),
+            db.func.coalesce(db.func.sum(cls.sangrias_total_cents), 0)
+        ).filter(cls.payment_method_id == cls.ALL, cls.product_id == cls.ALL)
+
+        if start:
+            query = query.filter(cls.day >= start)
+        if end:
+            query = query.filter(cls.day <= end)
+
+        sales_count, sales_total, sangrias_count, sangrias_total = query.one()
+        return {
+            'total_transacoes': sales_count + sangrias_count,
+            'qtd_vendas': sales_count,
+            'total_vendas': from_cents(sales_total),
+            'qtd_sangrias': sangrias_count,
+            'total_sangrias': from_cents(sangrias_total),
+        }
+
+    @classmethod
+    def _rebuild_queries(cls, transaction=Transaction, item=TransactionItem, payment=Payment):
+        """Agregados por dia, por método e por produto (colunas da tabela) de um banco de transações"""
+        day = db.func.date(transaction.date)
+
+        is_sangria = transaction.kind == Transaction.KIND_WITHDRAWAL
+
+        def _split(amount, qty=0):
+            return (
+                db.func.sum(db.case((is_sangria, 0), else_=1)),
+                db.func.sum(db.case((is_sangria, 0), else_=amount)),
+                db.func.sum(db.case((is_sangria, 1), else_=0)),
+                db.func.sum(db.case((is_sangria, -amount), else_=0)),
+                db.func.coalesce(db.func.sum(qty), 0),
+            )
+
+        per_day = db.session.query(
+            day, db.literal(cls.ALL), db.literal(cls.ALL), *_split(transaction.total_cents)
+        ).group_by(day)
+
+        per_method = db.session.query(
+            day, payment.payment_method_id, db.literal(cls.ALL), *_split(payment.amount_cents)
+        ).join(transaction, payment.transaction_id == transaction.id)\
+         .group_by(day, payment.payment_method_id)
+
+        product = db.func.coalesce(item.product_id, cls.CUSTOM)
+        per_product = db.session.query(
+            day, db.literal(cls.ALL), product,
+            *_split(db.func.coalesce(item.subtotal_cents, 0), item.qty)
+        ).join(transaction, item.transaction_id == transaction.id)\
+         .group_by(day, product)
+
+        return per_day, per_method, per_product
+
+    @classmethod
+    def rebuild(cls):
+        """Recalcular todos os agregados a partir das transações (backfill), incluindo meses arquivados"""
+        from .archive import archived_rows
+        columns = ['day', 'payment_method_id', 'product_id', 'sales_count', 'sales_total_cents',
+                   'sangrias_count', 'sangrias_total_cents', 'items_qty']
+        # Meses arquivados são lidos antes de abrir a transação de escrita
+        archived = []
+        for index in range(3):
+            archived += archived_rows(lambda fonte: cls._rebuild_queries(*fonte)[index])
+
+        db.session.query(cls).delete()
+        for select in cls._rebuild_queries():
+            db.session.execute(cls.__table__.insert().from_select(columns, select))
+        if archived:
+            db.session.execute(cls._upsert_statement(), [
+                dict(zip(columns, (datetime.strptime(row[0], '%Y-%m-%d').date(), *row[1:]))) for row in archived
+            ])
+        db.session.commit()
+
+
+class CashSession(db.Model):
+    """Turnos do caixa, da abertura ao fechamento.
+
+    O turno guarda os maiores ids de `transactions` e `payments` na abertura
+    e no fechamento: suas movimentações são os pagamentos com id no intervalo
+    (start_payment_id, end_payment_id], lidos pela chave primária. Assim o
+    custo de consultar ou fechar um turno depende do tamanho do turno, não
+    do histórico. No fechamento o relatório do turno é gravado em `report`
+    (JSON) e não é mais recalculado.
+    """
+    __tablename__ = "cash_sessions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    opened_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime, nullable=True, index=True)
+    start_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    start_payment_id = db.Column(db.Integer, nullable=False, default=0)
+    end_transaction_id = db.Column(db.Integer, nullable=True)
+    end_payment_id = db.Column(db.Integer, nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+    report = db.Column(db.Text, nullable=True)
+
+    balances = db.relationship('CashSessionBalance', backref='session', cascade='all, delete-orphan', lazy=True)
+
+    def __repr__(self):
+        return f"<CashSession {self.id} {'aberto' if self.closed_at is None else 'fechado'}>"
+
+    @classmethod
+    def current(cls):
+        """Turno aberto (ou None)"""
+        return cls.query.filter(cls.closed_at.is_(None)).order_by(cls.id.desc()).first()
+
+
+class CashSessionBalance(db.Model):
+    """Saldos de um turno por método de pagamento (em centavos).
+
+    O saldo de abertura é o saldo do método no momento da abertura; vendas,
+    sangrias (valor positivo) e saldo de fechamento são gravados no
+    fechamento.
+    """
+    __tablename__ = "cash_session_balances"
+
+    session_id = db.Column(db.Integer, db.ForeignKey('cash_sessions.id'), primary_key=True)
+    payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'), primary_key=True)
+    opening_balance_cents = db.Column(db.Integer, nullable=False, default=0)
+    sales_cents = db.Column(db.Integer, nullable=False, default=0)
+    sangrias_cents = db.Column(db.Integer, nullable=False, default=0)
+    closing_balance_cents = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<CashSessionBalance {self.session_id} method={self.payment_method_id}>"
+
+
+# Invalidar caches de consulta quando as tabelas forem alteradas (após o commit)
+track_dates(Transaction.__tablename__, 'date')
+on_commit({SystemConfig.__tablename__}, lambda tables: SystemConfig._cache.clear())
+on_commit({PaymentMethod.__tablename__}, lambda tables: PaymentMethod.invalidate_cache())
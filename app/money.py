@@ -0,0 +1,41 @@
+"""Money handling: amounts are stored and summed as integer cents.
+
+Every monetary column is an ``INTEGER`` number of cents (``*_cents``), so SQL
+aggregates are exact integer sums and no Decimal/float arithmetic happens on
+the database side. Conversion happens only at the API boundary:
+
+- `to_cents` parses request values (numbers, or strings with ``,`` or ``.``
+  as decimal separator) with commercial rounding (half up);
+- `from_cents` turns cents back into reais for JSON responses.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+_CENT = Decimal('1')
+
+
+def to_cents(value) -> int:
+    """Convert a request amount in reais to integer cents (None/'' = 0).
+
+    Raises ValueError for values that are not numbers.
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"Valor monetário inválido: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, str):
+        value = value.replace(',', '.').strip()
+    try:
+        cents = (Decimal(str(value)) * 100).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        cents = None
+    if cents is None or not cents.is_finite():
+        raise ValueError(f"Valor monetário inválido: {value!r}")
+    return int(cents)
+
+
+def from_cents(cents) -> float:
+    """Convert integer cents to reais for JSON (None = 0.0)."""
+    return (cents or 0) / 100
@@ -1,17 +1,58 @@
-from flask import Blueprint, render_template, request, jsonify, make_response
-from app.models import db, Client, Product, Transaction, TransactionItem, SystemConfig, PaymentMethod, Payment
-from datetime import datetime
-from decimal import Decimal, ROUND_HALF_UP
+from flask import Blueprint, Response, current_app, request, jsonify, make_response, stream_with_context
+from app.models import db, Client, Product, Transaction, TransactionItem, PaymentMethod, DailyRollup, CashSession
+from app.search import search_clients
+from app.cache import ResultCache, on_commit
+from app.compression import accepted_encoding, compress, page_cache, render_page, set_encoding
+from app.conditional import etag_for
+from app.events import EventBroker, TooManySubscribers
+from app.archive import MAX_ATTACHED, archived_entities, archived_months, attach, month_bounds, months_in_range
+from app.money import from_cents, to_cents
+from app.shifts import ShiftError, close_shift, open_shift, shift_summary
+from app.transactions import InsufficientBalance, SaleError, insert_sales, insert_withdrawal, validate_sale
+from app.writer import WritePending
+from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
 
+def _gravar(operacao):
+    """Executa `operacao()` (que grava via db.session) e confirma o commit.
+
+    Com WRITE_BEHIND ativo a operação vai para a fila do GroupCommitWriter e
+    a requisição espera o commit do grupo; caso contrário grava e faz commit
+    aqui mesmo. Em ambos os casos o resultado só volta depois de durável.
+
+    Se o commit do grupo não sair em WRITE_BEHIND_TIMEOUT, levanta
+    `WritePending`: a operação continua na fila e ainda pode ser gravada,
+    então a rota responde com `_resposta_pendente` (202) em vez de um erro
+    que levaria o cliente a repetir a venda. /api/transactions/batch não
+    passa por aqui: grava seus próprios blocos com commit direto.
+    """
+    writer = current_app.extensions.get('caixa_writer')
+    if writer:
+        return writer.wait(writer.submit(operacao), current_app.config['WRITE_BEHIND_TIMEOUT'])
+    try:
+        resultado = operacao()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return resultado
+
+def _resposta_pendente():
+    """202: gravação enfileirada sem confirmação; o cliente não deve repetir"""
+    return jsonify({
+        'success': False,
+        'pending': True,
+        'error': 'A gravação ainda está na fila e pode ser concluída. '
+                 'Confira o relatório antes de registrar novamente.'
+    }), 202
+
 def _format_dt_local_br(dt: datetime) -> str:
     """Formata datetime (armazenado em UTC) para horário local Brasil (UTC-3).
     Retorna string no formato dd/mm/YYYY HH:MM.
     """
     if not dt:
         return ''
-    from datetime import timedelta
     dt_local = dt - timedelta(hours=3)
     return dt_local.strftime('%d/%m/%Y %H:%M')
 
@@ -27,10 +68,12 @@ def _format_dt_br(dt: datetime) -> str:
 @main_bp.route('/')
 def index():
     """Página principal com formulário de registro"""
-    # Obter produtos/serviços ativos
-    produtos = Product.query.filter_by(active=True).all()
-    
-    return render_template('index.html', produtos=produtos)
+    # Renderizada e compactada uma vez por versão da tabela de produtos
+    return render_page('index.html', tables=('products',),
+                       context=lambda: {'produtos': Product.query.filter_by(active=True).all()})
+
+# Páginas em cache dependem apenas dos produtos (ver render_page)
+on_commit({'products'}, lambda tabelas: page_cache.clear())
 
 @main_bp.route('/api/clients')
 def api_clients():
@@ -38,9 +81,8 @@ def api_clients():
     query = request.args.get('q', '')
     
     if query:
-        clients = Client.query.filter(
-            Client.name.contains(query)
-        ).limit(10).all()
+        # Índice FTS5: busca por prefixo, sem diferenciar maiúsculas/acentos, ordenada por relevância
+        clients = search_clients(query, limit=10)
     else:
         clients = Client.query.limit(10).all()
     
@@ -49,76 +91,60 @@ def api_clients():
 @main_bp.route('/configuracoes')
 def configuracoes():
     """Página de configuração dos campos"""
-    return render_template('configuracoes.html')
+    return render_page('configuracoes.html')
 
 @main_bp.route('/resumo')
 def resumo():
     """Página de resumo visual"""
-    return render_template('resumo.html')
+    return render_page('resumo.html')
 
 @main_bp.route('/relatorios')
 def relatorios():
     """Página de relatórios"""
-    return render_template('relatorios.html')
+    return render_page('relatorios.html')
 
 @main_bp.route('/api/resumo')
 def api_resumo():
     """API para dados do resumo - usando mesma lógica de cálculo do relatório"""
     try:
-        from sqlalchemy import func
-        
-        # Estatísticas básicas
-        total_transacoes = Transaction.query.count()
+        # Período opcional (YYYY-MM-DD); sem período, considera todo o histórico
+        data_inicio = request.args.get('data_inicio')
+        data_fim = request.args.get('data_fim')
+        totais = DailyRollup.totals(
+            datetime.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio else None,
+            datetime.strptime(data_fim, '%Y-%m-%d').date() if data_fim else None
+        )
         
-        # Saldo atual do caixa (apenas vendas, sem descontar sangrias)
-        saldo_atual = db.session.query(func.sum(Transaction.total)).filter(Transaction.total > 0).scalar() or 0
+        # Estatísticas básicas (somadas a partir dos agregados diários)
+        total_transacoes = totais['total_transacoes']
         
         # Total de vendas (apenas transações positivas)
-        total_vendas = db.session.query(func.sum(Transaction.total)).filter(Transaction.total > 0).scalar() or 0
+        total_vendas = totais['total_vendas']
+        
+        # Saldo atual do caixa (apenas vendas, sem descontar sangrias)
+        saldo_atual = total_vendas
         
-        # Total de sangrias (apenas transações negativas)
-        total_sangrias = db.session.query(func.sum(Transaction.total)).filter(Transaction.total < 0).scalar() or 0
+        # Total de sangrias (valor positivo)
+        total_sangrias = totais['total_sangrias']
         
         total_clientes = Client.query.count()
         total_produtos = Product.query.filter_by(active=True).count()
         
-        # Transações recentes (incluindo sangrias)
-        transacoes_recentes = Transaction.query.order_by(
-            Transaction.date.desc()
+        # Transações recentes (incluindo sangrias), em uma única consulta
+        transacoes_recentes = _transaction_rows_query().order_by(
+            Transaction.date.desc(), Transaction.id.desc()
         ).limit(5).all()
         
         recentes = []
         for t in transacoes_recentes:
-            # Verificar se é sangria
-            if t.notes and (t.notes.startswith('SANGRIA:') or t.notes.startswith('RETIRADA:')):
-                recentes.append({
-                    'cliente': 'SANGRIA',
-                    'produto': 'Retirada de Caixa',
-                    'valor': float(t.total),
-                    'data': _format_dt_br(t.date),  # Sangrias já em horário local
-                    'tipo': 'sangria'
-                })
-            else:
-                produto_nome = 'N/A'
-                if t.items and len(t.items) > 0:
-                    if t.items[0].product:
-                        produto_nome = t.items[0].product.name
-                    elif t.items[0].description:
-                        produto_nome = t.items[0].description
-                
-                recentes.append({
-                    'cliente': t.client.name if t.client else 'Não informado',
-                    'produto': produto_nome,
-                    'valor': float(t.total),
-                    'data': _format_dt_local_br(t.date),  # Vendas em UTC, converter para local
-                    'tipo': 'venda'
-                })
+            linha = _report_row(t)
+            recentes.append({campo: linha[campo] for campo in ('cliente', 'produto', 'valor', 'data', 'tipo')})
         
         return jsonify({
             'total_transacoes': total_transacoes,
-            'saldo_atual': float(saldo_atual),
-            'total_vendas': float(total_vendas),
-            'total_sangrias': abs(float(total_sangrias)),  # Valor positivo para exibição
+            'saldo_atual': saldo_atual,
+            'total_vendas': total_vendas,
+            'total_sangrias': total_sangrias,  # Valor positivo para exibição
             'total_clientes': total_clientes,
             'total_produtos': total_produtos,
             'transacoes_recentes': recentes
@@ -127,109 +153,163 @@ def api_resumo():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Painéis de resumo conectados a /api/resumo/stream (ver app/events.py)
+eventos_resumo = EventBroker()
+
+def _publicar_resumo(transaction_ids):
+    """Envia as transações gravadas aos painéis conectados (sem consultas se não houver nenhum)"""
+    if not eventos_resumo.subscribers:
+        return
+    for t in _transaction_rows_query().filter(Transaction.id.in_(transaction_ids)):
+        linha = _report_row(t)
+        eventos_resumo.publish(t.kind, {campo: linha[campo] for campo in ('cliente', 'produto', 'valor', 'data', 'tipo')})
+
+@main_bp.route('/api/resumo/stream')
+def api_resumo_stream():
+    """Eventos do resumo (Server-Sent Events): `venda`, `sangria` e `ajuste` trazem a
+    transação gravada; `resumo` e `resync` pedem para recarregar /api/resumo.
+    Um comentário é enviado a cada SSE_HEARTBEAT segundos sem eventos.
+    """
+    try:
+        assinatura = eventos_resumo.subscribe()
+    except TooManySubscribers as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    def _gerar():
+        try:
+            yield from assinatura.stream()
+        finally:
+            assinatura.close()
+
+    response = Response(_gerar(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @main_bp.route('/api/transaction', methods=['POST'])
 def api_salvar_transaction():
     """API para salvar nova transação com múltiplos pagamentos"""
     try:
-        data = request.get_json()
-        
-        # Validação básica
-        if not data.get('items') or not data.get('total'):
-            return jsonify({'error': 'Campos obrigatórios faltando'}), 400
-        
-        # Validar pagamentos
-        payments = data.get('payments', [])
-        if not payments:
-            return jsonify({'error': 'É necessário informar pelo menos um pagamento'}), 400
-        
-        # Verificar se o total dos pagamentos corresponde ao total da transação
-        def _to_cents(value) -> int:
-            # Normaliza string/float para centavos com arredondamento comercial
-            if value is None:
-                return 0
-            if isinstance(value, str):
-                value = value.replace(',', '.').strip()
-            dec = Decimal(str(value))
-            return int((dec * Decimal('100')).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
-
-        total_payments_cents = sum(_to_cents(p.get('amount')) for p in payments)
-        total_transaction_cents = _to_cents(data.get('total'))
-        if abs(total_payments_cents - total_transaction_cents) > 1:  # Tolerância de 1 centavo
-            return jsonify({'error': 'Total dos pagamentos não corresponde ao total da transação'}), 400
-        
-        # Criar nova transação
-        transaction = Transaction(
-            client_id=data.get('client_id') if data.get('client_id') else None,
-            total=float(Decimal(total_transaction_cents) / Decimal('100')),
-            notes=data.get('notes', ''),
-            date=datetime.utcnow()
-        )
-        
-        db.session.add(transaction)
-        db.session.flush()  # Obter ID da transação
-        
-        # Adicionar itens
-        for item_data in data['items']:
-            item = TransactionItem(
-                transaction_id=transaction.id,
-                product_id=item_data.get('product_id'),
-                description=item_data.get('description', ''),
-                qty=item_data.get('qty', 1),
-                unit_price=item_data.get('unit_price'),
-                subtotal=item_data.get('subtotal')
-            )
-            db.session.add(item)
-        
-        # Adicionar pagamentos
-        for payment_data in payments:
-            # Validar método de pagamento
-            payment_method = PaymentMethod.query.get(payment_data['payment_method_id'])
-            if not payment_method:
-                return jsonify({'error': f'Método de pagamento inválido: {payment_data["payment_method_id"]}'}), 400
-            
-            payment = Payment(
-                transaction_id=transaction.id,
-                payment_method_id=payment_data['payment_method_id'],
-                amount=float(Decimal(_to_cents(payment_data.get('amount'))) / Decimal('100'))
-            )
-            db.session.add(payment)
+        try:
+            venda = validate_sale(request.get_json())
+        except SaleError as e:
+            return jsonify({'error': str(e)}), 400
         
-        db.session.commit()
+        # Transação, itens, pagamentos e agregados em um único commit
+        [transaction_id] = _gravar(lambda: insert_sales([venda]))
+        _publicar_resumo([transaction_id])
         
         return jsonify({
             'success': True, 
-            'transaction_id': transaction.id,
+            'transaction_id': transaction_id,
             'message': 'Transação registrada com sucesso'
         })
         
+    except WritePending:
+        return _resposta_pendente()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+TRANSACOES_LOTE_MAXIMO = 10000  # Máximo de transações por requisição em /api/transactions/batch
+TRANSACOES_LOTE_COMMIT = 500    # Transações gravadas por commit
+
+@main_bp.route('/api/transactions/batch', methods=['POST'])
+def api_salvar_transactions_lote():
+    """API para registrar um lote de vendas (digitação em lote, importação de histórico).
+
+    Aceita uma lista de transações (ou {"transactions": [...]}) no formato de
+    /api/transaction, cada uma podendo trazer sua `date` (ISO; sem fuso é UTC, com fuso é
+    convertida para UTC). Todas são
+    validadas com as mesmas regras; as válidas são gravadas em blocos de
+    TRANSACOES_LOTE_COMMIT por commit, direto na sessão da requisição (sem
+    passar pelo modo write-behind, cujos grupos são de vendas avulsas). Registros com erro (de validação ou do
+    banco) são informados em `errors` sem abortar o restante do lote.
+    """
+    from sqlalchemy.exc import SQLAlchemyError
+
+    data = request.get_json(silent=True)
+    registros = data.get('transactions') if isinstance(data, dict) else data
+    if not isinstance(registros, list) or not registros:
+        return jsonify({'error': 'Informe uma lista de transações'}), 400
+    if len(registros) > TRANSACOES_LOTE_MAXIMO:
+        return jsonify({'error': f'Máximo de {TRANSACOES_LOTE_MAXIMO} transações por lote'}), 400
+
+    ids = [None] * len(registros)
+    erros = []
+
+    metodos = PaymentMethod.get_all_by_id()
+    validas = []
+    for indice, registro in enumerate(registros):
+        try:
+            validas.append((indice, validate_sale(registro, accept_date=True, methods=metodos)))
+        except SaleError as e:
+            erros.append({'index': indice, 'error': str(e)})
+
+    for inicio in range(0, len(validas), TRANSACOES_LOTE_COMMIT):
+        bloco = validas[inicio:inicio + TRANSACOES_LOTE_COMMIT]
+        try:
+            novos_ids = insert_sales([venda for _, venda in bloco])
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+        else:
+            for (indice, _), transaction_id in zip(bloco, novos_ids):
+                ids[indice] = transaction_id
+            continue
+
+        # Um registro rejeitado pelo banco (ex.: produto inexistente) derruba
+        # o bloco inteiro; regravar um a um para isolar os problemáticos. O id
+        # só é registrado depois do commit daquele registro.
+        for indice, venda in bloco:
+            try:
+                transaction_id = insert_sales([venda])[0]
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                erros.append({'index': indice, 'error': str(getattr(e, 'orig', None) or e)})
+            else:
+                ids[indice] = transaction_id
+
+    erros.sort(key=lambda erro: erro['index'])
+    if any(transaction_id is not None for transaction_id in ids):
+        # Lotes podem trazer datas antigas: os painéis recarregam o resumo
+        eventos_resumo.publish('resumo', {})
+    return jsonify({
+        'success': not erros,
+        'inserted': sum(1 for transaction_id in ids if transaction_id is not None),
+        'failed': len(erros),
+        'transaction_ids': ids,
+        'errors': erros
+    })
+
 @main_bp.route('/api/produtos-unicos')
+@etag_for('products', 'transaction_items')
 def api_produtos_unicos():
     """API para lista de produtos únicos de todas as transações (incluindo deletados)"""
     try:
-        # Buscar produtos únicos das transações
-        produtos_query = db.session.query(
-            Product.id,
-            Product.name,
-            Product.price,
-            db.func.count(TransactionItem.id).label('usage_count')
-        ).join(TransactionItem, Product.id == TransactionItem.product_id, isouter=True)\
-         .group_by(Product.id, Product.name, Product.price)\
-         .order_by(Product.name)
-        
-        produtos = produtos_query.all()
-        
-        # Adicionar produtos de transações sem ID (descrições personalizadas)
-        descricoes_unicas = db.session.query(
-            TransactionItem.description
-        ).filter(
-            TransactionItem.product_id.is_(None),
-            TransactionItem.description.isnot(None),
-            TransactionItem.description != ''
-        ).distinct().order_by(TransactionItem.description).all()
+        # Uso de cada produto e descrições personalizadas, incluindo os meses arquivados
+        def _uso(fonte):
+            _, item = _report_entities(fonte)
+            return db.session.query(item.product_id, db.func.count(item.id))\
+                .filter(item.product_id.isnot(None)).group_by(item.product_id)
+
+        def _descricoes(fonte):
+            _, item = _report_entities(fonte)
+            return db.session.query(item.description).filter(
+                item.product_id.is_(None),
+                item.description.isnot(None),
+                item.description != ''
+            ).distinct()
+
+        uso = {}
+        for product_id, quantidade in _linhas_em_todas_as_fontes(_uso):
+            uso[product_id] = uso.get(product_id, 0) + quantidade
+        descricoes_unicas = sorted({desc for desc, in _linhas_em_todas_as_fontes(_descricoes)})
+
+        produtos = Product.query.order_by(Product.name).all()
         
         resultado = []
         
@@ -238,8 +318,8 @@ def api_produtos_unicos():
             resultado.append({
                 'id': produto.id,
                 'name': produto.name,
-                'price': float(produto.price),
-                'usage_count': produto.usage_count,
+                'price': from_cents(produto.price_cents),
+                'usage_count': uso.get(produto.id, 0),
                 'type': 'cadastrado'
             })
         
@@ -247,7 +327,7 @@ def api_produtos_unicos():
         for desc in descricoes_unicas:
             resultado.append({
                 'id': None,
-                'name': desc.description,
+                'name': desc,
                 'price': None,
                 'usage_count': 1,
                 'type': 'personalizado'
@@ -262,10 +342,11 @@ def api_produtos_unicos():
         return jsonify({'error': str(e)}), 500
 
 @main_bp.route('/api/produtos')
+@etag_for('products')
 def api_produtos():
     """API para lista de produtos"""
     produtos = Product.query.filter_by(active=True).all()
-    return jsonify([{'id': p.id, 'name': p.name, 'price': float(p.price)} for p in produtos])
+    return jsonify([{'id': p.id, 'name': p.name, 'price': from_cents(p.price_cents)} for p in produtos])
 
 @main_bp.route('/api/produtos', methods=['POST'])
 def api_criar_produto():
@@ -276,9 +357,14 @@ def api_criar_produto():
         if not data.get('name') or not data.get('price'):
             return jsonify({'error': 'Nome e preço são obrigatórios'}), 400
         
+        try:
+            price_cents = to_cents(data['price'])
+        except ValueError:
+            return jsonify({'error': 'Preço inválido'}), 400
+        
         produto = Product(
             name=data['name'],
-            price=float(data['price']),
+            price_cents=price_cents,
             active=True
         )
         
@@ -290,7 +376,7 @@ def api_criar_produto():
             'produto': {
                 'id': produto.id,
                 'name': produto.name,
-                'price': float(produto.price)
+                'price': from_cents(produto.price_cents)
             }
         })
         
@@ -304,8 +390,10 @@ def api_remover_produto(produto_id):
     try:
         produto = Product.query.get_or_404(produto_id)
         
-        # Verificar se há transações usando este produto
-        tem_transacoes = TransactionItem.query.filter_by(product_id=produto_id).first()
+        # Verificar se há transações usando este produto (os agregados diários
+        # cobrem também os meses já movidos para os bancos de arquivo)
+        tem_transacoes = TransactionItem.query.filter_by(product_id=produto_id).first() or \
+            DailyRollup.query.filter_by(product_id=produto_id).first()
         
         if tem_transacoes:
             # Se foi utilizado, apenas desativar
@@ -329,17 +417,21 @@ def api_atualizar_preco(produto_id):
         produto = Product.query.get_or_404(produto_id)
         data = request.get_json()
         
-        if not data.get('preco') or float(data['preco']) < 0:
+        try:
+            preco_cents = to_cents(data.get('preco'))
+        except ValueError:
+            preco_cents = None
+        if not data.get('preco') or preco_cents is None or preco_cents < 0:
             return jsonify({'error': 'Preço inválido'}), 400
         
         # Atualizar preço do produto
-        produto.price = float(data['preco'])
+        produto.price_cents = preco_cents
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': 'Preço atualizado com sucesso',
-            'novo_preco': float(produto.price)
+            'novo_preco': from_cents(produto.price_cents)
         })
         
     except Exception as e:
@@ -359,71 +451,52 @@ def api_retirada():
             return jsonify({'error': 'Valor e motivo são obrigatórios'}), 400
 
         try:
-            valor = float(valor)
-        except (TypeError, ValueError):
+            valor_cents = to_cents(valor)
+        except ValueError:
             return jsonify({'error': 'Valor inválido'}), 400
 
-        if valor <= 0:
+        if valor_cents <= 0:
             return jsonify({'error': 'Valor deve ser maior que zero'}), 400
         
         if not payment_method_id:
             return jsonify({'error': 'Tipo de pagamento é obrigatório'}), 400
         
         # Validar método de pagamento
-        payment_method = PaymentMethod.query.get(payment_method_id)
+        payment_method = PaymentMethod.get_cached(payment_method_id)
         if not payment_method:
             return jsonify({'error': 'Método de pagamento inválido'}), 400
         
-        # Verificar saldo disponível para o método específico (considera sangrias anteriores)
-        from sqlalchemy import func
-        saldo_metodo = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.payment_method_id == payment_method_id
-        ).scalar() or 0
-
-        # Normalizar para float (evita comparação float vs Decimal)
-        saldo_metodo = float(saldo_metodo)
-        
-        if valor > saldo_metodo:
+        # Verificar saldo disponível (considera sangrias anteriores) e gravar a
+        # sangria (valor negativo) no mesmo commit
+        try:
+            sangria_id, saldo_metodo_cents = _gravar(
+                lambda: insert_withdrawal(payment_method, valor_cents, motivo)
+            )
+        except InsufficientBalance as e:
             return jsonify({
-                'error': f'Saldo insuficiente no método {payment_method.name}! Saldo disponível: R$ {float(saldo_metodo):.2f}',
-                'saldo_disponivel': float(saldo_metodo),
+                'error': str(e),
+                'saldo_disponivel': from_cents(e.balance_cents),
                 'metodo_nome': payment_method.name
             }), 400
         
-        # Calcular novo saldo
-        novo_saldo = saldo_metodo - valor
-        
-        # Criar transação de sangria (valor negativo)
-        sangria = Transaction(
-            total=-valor,  # Valor negativo para sangria
-            notes=f"SANGRIA: {motivo} [{payment_method.name}]",
-            date=datetime.utcnow()
-        )
-        
-        db.session.add(sangria)
-        db.session.flush()  # Obter ID da transação
+        _publicar_resumo([sangria_id])
         
-        # Criar pagamento negativo para o método específico
-        payment_sangria = Payment(
-            transaction_id=sangria.id,
-            payment_method_id=payment_method_id,
-            amount=-valor  # Valor negativo para sangria
-        )
-        
-        db.session.add(payment_sangria)
-        db.session.commit()
+        # Calcular novo saldo
+        novo_saldo_cents = saldo_metodo_cents - valor_cents
         
         return jsonify({
             'success': True, 
             'message': f'Sangria registrada com sucesso no caixa {payment_method.name}',
-            'sangria_id': sangria.id,
-            'saldo_anterior': float(saldo_metodo),
-            'saldo_novo': float(novo_saldo),
-            'valor_retirado': float(valor),
+            'sangria_id': sangria_id,
+            'saldo_anterior': from_cents(saldo_metodo_cents),
+            'saldo_novo': from_cents(novo_saldo_cents),
+            'valor_retirado': from_cents(valor_cents),
             'metodo_nome': payment_method.name,
             'metodo_cor': payment_method.color
         })
         
+    except WritePending:
+        return _resposta_pendente()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -433,150 +506,540 @@ def api_saldo_caixa():
     """API para obter saldo atual do caixa (apenas vendas, sem descontar sangrias)"""
     try:
         # Calcular saldo total das vendas (apenas transações positivas)
-        from sqlalchemy import func
+        saldo = DailyRollup.totals()['total_vendas']
         
-        saldo = db.session.query(func.sum(Transaction.total)).filter(Transaction.total > 0).scalar() or 0
+        # Vendas do turno aberto: lidas só dos pagamentos do turno
+        turno = CashSession.current()
+        saldo_turno = None
+        if turno:
+            saldo_turno = from_cents(sum(m['sales_cents'] for m in shift_summary(turno)['methods']))
         
         return jsonify({
-            'saldo': float(saldo)
+            'saldo': saldo,
+            'saldo_turno': saldo_turno
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _turno_json(resumo):
+    """Resumo/relatório de turno (valores em centavos) no formato da API (reais)"""
+    def _reais(dados):
+        return {chave.removesuffix('_cents'): from_cents(valor) if chave.endswith('_cents') else valor
+                for chave, valor in dados.items()}
+
+    resultado = _reais(resumo)
+    resultado['opened_at'] = _format_dt_local_br(datetime.fromisoformat(resumo['opened_at']))
+    if resumo.get('closed_at'):
+        resultado['closed_at'] = _format_dt_local_br(datetime.fromisoformat(resumo['closed_at']))
+    resultado['methods'] = [_reais(metodo) for metodo in resumo['methods']]
+    if 'products' in resumo:
+        resultado['products'] = [_reais(produto) for produto in resumo['products']]
+    return resultado
+
+@main_bp.route('/api/caixa/turno')
+def api_turno_atual():
+    """API para consultar o turno aberto: saldo de abertura + movimentações do turno"""
+    try:
+        turno = CashSession.current()
+        return jsonify({'aberto': turno is not None, 'turno': _turno_json(shift_summary(turno)) if turno else None})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/caixa/turno/abrir', methods=['POST'])
+def api_abrir_turno():
+    """API para abrir o caixa (registra os saldos de abertura por método)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        resumo = _gravar(lambda: open_shift(data.get('observacoes')))
+        return jsonify({'success': True, 'turno': _turno_json(resumo)})
+    except ShiftError as e:
+        return jsonify({'error': str(e)}), 400
+    except WritePending:
+        return _resposta_pendente()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/caixa/turno/fechar', methods=['POST'])
+def api_fechar_turno():
+    """API para fechar o caixa: grava os saldos de fechamento e o relatório do turno"""
+    try:
+        data = request.get_json(silent=True) or {}
+        relatorio = _gravar(lambda: close_shift(data.get('observacoes')))
+        return jsonify({'success': True, 'relatorio': _turno_json(relatorio)})
+    except ShiftError as e:
+        return jsonify({'error': str(e)}), 400
+    except WritePending:
+        return _resposta_pendente()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/caixa/turnos')
+def api_turnos():
+    """API para listar os turnos fechados (mais recentes primeiro)"""
+    try:
+        limite = max(1, min(int(request.args.get('limite', 30)), 365))
+        turnos = CashSession.query.filter(CashSession.closed_at.isnot(None))\
+            .order_by(CashSession.id.desc()).limit(limite).all()
+        resultado = []
+        for turno in turnos:
+            relatorio = _turno_json(shift_summary(turno))
+            relatorio.pop('products', None)
+            resultado.append(relatorio)
+        return jsonify({'turnos': resultado})
+    except ValueError:
+        return jsonify({'error': 'Limite inválido'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/caixa/turnos/<int:turno_id>')
+def api_relatorio_turno(turno_id):
+    """API para obter o relatório gravado no fechamento de um turno"""
+    try:
+        turno = db.session.get(CashSession, turno_id)
+        if turno is None:
+            return jsonify({'error': 'Turno não encontrado'}), 404
+        return jsonify(_turno_json(shift_summary(turno)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+RELATORIO_LIMITE_MAXIMO = 1000  # Máximo de linhas por página em /api/relatorios
+RELATORIO_LOTE_STREAM = 500     # Linhas buscadas por vez no modo streaming
+
+def _parse_report_filters():
+    """Lê e normaliza os filtros de relatório.
+
+    Suporta GET (query string) e POST (JSON). Retorna um dicionário com as
+    datas já convertidas (fim exclusivo), cliente, produtos cadastrados (IDs)
+    e produtos personalizados (descrições), tipo de transação (venda,
+    sangria, ajuste), além dos parâmetros de paginação.
+    """
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        data_inicio = data.get('data_inicio')
+        data_fim = data.get('data_fim')
+        cliente = data.get('cliente')
+        produtos_ids = data.get('produtos', [])  # Array de IDs
+        tipo = data.get('tipo')
+        limite = data.get('limite')
+        cursor = data.get('cursor')
+        stream = data.get('stream')
+    else:
+        data_inicio = request.args.get('data_inicio')
+        data_fim = request.args.get('data_fim')
+        cliente = request.args.get('cliente')
+        produtos_ids = request.args.getlist('produto')  # GET: múltiplos valores
+        tipo = request.args.get('tipo')
+        limite = request.args.get('limite')
+        cursor = request.args.get('cursor')
+        stream = request.args.get('stream')
+
+    # Separar produtos cadastrados de personalizados
+    produtos_cadastrados = []
+    produtos_personalizados = []
+    for pid in produtos_ids or []:
+        # Converter para string para verificar prefixo
+        pid_str = str(pid)
+        if pid_str.startswith('custom_'):
+            # Produto personalizado (descrição)
+            produtos_personalizados.append(pid_str.replace('custom_', ''))
+        else:
+            # Produto cadastrado (ID)
+            try:
+                produtos_cadastrados.append(int(pid))
+            except (ValueError, TypeError):
+                pass
+
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d') if data_inicio else None
+    # Adicionar 1 dia para incluir até o final do dia_fim
+    fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1) if data_fim else None
+
+    if limite is not None:
+        limite = max(1, min(int(limite), RELATORIO_LIMITE_MAXIMO))
+
+    return {
+        'data_inicio': inicio,
+        'data_fim': fim,
+        'cliente': cliente or None,
+        'filtra_produtos': bool(produtos_ids),
+        'produtos_cadastrados': produtos_cadastrados,
+        'produtos_personalizados': produtos_personalizados,
+        'tipo': tipo if tipo in Transaction.KINDS else None,
+        'limite': limite,
+        'cursor': _decode_report_cursor(cursor) if cursor else None,
+        'stream': str(stream).lower() in ('1', 'true', 'sim') if stream else False,
+    }
+
+def _encode_report_cursor(t) -> str:
+    """Cursor opaco apontando para a última linha entregue: '<data ISO>_<id>'"""
+    return f"{t.date.isoformat()}_{t.id}"
+
+def _decode_report_cursor(cursor: str):
+    data_str, _, id_str = str(cursor).rpartition('_')
+    return datetime.fromisoformat(data_str), int(id_str)
+
+# Resultados de /api/relatorios (JSON pronto) por filtros normalizados; um
+# commit descarta só os relatórios cujo período contém as datas gravadas
+cache_relatorios = ResultCache('relatorios')
+
+def _chave_relatorio(filtros):
+    """Chave do cache: filtros normalizados (ordem dos produtos não importa)"""
+    return (
+        filtros['data_inicio'], filtros['data_fim'], filtros['cliente'], filtros['tipo'],
+        filtros['filtra_produtos'],
+        tuple(sorted(set(filtros['produtos_cadastrados']))),
+        tuple(sorted(set(filtros['produtos_personalizados']))),
+        filtros['limite'], filtros['cursor'],
+    )
+
+def _invalidar_cache_relatorios(tabelas, datas):
+    """Descarta os relatórios afetados por um commit"""
+    # Nomes de clientes/produtos aparecem em qualquer período; gravações
+    # sem data conhecida (ex.: recálculo dos agregados) também limpam tudo
+    if tabelas & {'clients', 'products'} or not datas or None in datas:
+        cache_relatorios.clear()
+    else:
+        cache_relatorios.invalidate_dates(datas)
+
+on_commit({'transactions', 'transaction_items', 'daily_rollups', 'clients', 'products'},
+          _invalidar_cache_relatorios, dates=True)
+
+def _relatorio_em_cache(chave, codificacao):
+    """Corpo em cache e sua codificação: a versão compactada, se houver, senão o JSON"""
+    if codificacao:
+        corpo = cache_relatorios.get((chave, codificacao))
+        if corpo is not None:
+            return corpo, codificacao
+    return cache_relatorios.get((chave, None)), None
+
+def _compactar_relatorio(chave, filtros, corpo, codificacao, versao):
+    """Compacta o JSON do relatório (acima do limite) e guarda a versão compactada"""
+    if not codificacao or len(corpo) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return corpo, None
+    compactado = compress(corpo, codificacao)
+    cache_relatorios.put((chave, codificacao), compactado, filtros['data_inicio'], filtros['data_fim'], versao)
+    return compactado, codificacao
+
+def _build_report_query(filtros, fonte=None):
+    """Query de transações do relatório, ordenada por (data, id) decrescentes.
+
+    Cada transação aparece uma única vez: o filtro de produtos é um EXISTS
+    sobre os itens, em vez de um JOIN que duplicaria transações com vários
+    itens (e quebraria a paginação por cursor). `fonte` são as entidades de
+    um banco de arquivo (`archived_entities`); por padrão, o banco principal.
+    """
+    from sqlalchemy import or_, tuple_
+    from sqlalchemy.orm import aliased
+
+    Transaction, TransactionItem = _report_entities(fonte)
+    query = _transaction_rows_query(fonte)
+
+    if filtros['data_inicio']:
+        query = query.filter(Transaction.date >= filtros['data_inicio'])
+
+    if filtros['data_fim']:
+        query = query.filter(Transaction.date < filtros['data_fim'])
+
+    if filtros['cliente']:
+        query = query.filter(Client.name.contains(filtros['cliente']))
+
+    if filtros['tipo']:
+        query = query.filter(Transaction.kind == filtros['tipo'])
+
+    # Filtrar por múltiplos produtos
+    if filtros['filtra_produtos']:
+        # Alias próprio: a query principal já faz JOIN com o primeiro item
+        item = aliased(TransactionItem)
+        condicoes_produto = []
+
+        # Condição para produtos cadastrados por ID
+        if filtros['produtos_cadastrados']:
+            condicoes_produto.append(item.product_id.in_(filtros['produtos_cadastrados']))
+
+        # Condição para produtos personalizados por descrição
+        if filtros['produtos_personalizados']:
+            condicoes_produto.append(item.description.in_(filtros['produtos_personalizados']))
+
+        # Incluir sangrias/retiradas mesmo com filtro de produtos,
+        # pois sangrias não possuem TransactionItem/Product e seriam filtradas.
+        condicao_sangria = Transaction.kind == Transaction.KIND_WITHDRAWAL
+
+        # Aplicar filtro com OR (qualquer condição de produto OU sangria)
+        if condicoes_produto:
+            tem_produto = db.session.query(item.id).filter(
+                item.transaction_id == Transaction.id,
+                or_(*condicoes_produto)
+            ).exists()
+            query = query.filter(or_(condicao_sangria, tem_produto))
+        else:
+            query = query.filter(condicao_sangria)
+
+    # Paginação por cursor (keyset): continua após a última linha entregue
+    if filtros['cursor']:
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < filtros['cursor'])
+
+    # Ordenação estável: por data (mais recente primeiro) e, em caso de empate,
+    # por id (mais recente primeiro). Isso garante que sangrias apareçam na
+    # ordem em que foram executadas.
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+def _report_entities(fonte):
+    """(transação, item) da fonte de um relatório: banco principal ou um arquivo"""
+    if fonte is None:
+        return Transaction, TransactionItem
+    return fonte.transaction, fonte.item
+
+def _transaction_rows_query(fonte=None):
+    """Colunas necessárias para formatar linhas de relatório/resumo.
+
+    Cliente, primeiro item (menor id) e seu produto vêm por LEFT JOIN na
+    mesma consulta, então formatar N linhas não dispara carregamentos
+    preguiçosos de `items`, `product` ou `client`. Cada transação continua
+    aparecendo uma única vez.
+    """
+    Transaction, TransactionItem = _report_entities(fonte)
+    primeiro_item = db.session.query(db.func.min(TransactionItem.id)).filter(
+        TransactionItem.transaction_id == Transaction.id
+    ).correlate(Transaction).scalar_subquery()
+
+    return db.session.query(
+        Transaction.id,
+        Transaction.date,
+        Transaction.kind,
+        Transaction.total_cents,
+        Transaction.notes,
+        Client.name.label('cliente_nome'),
+        Product.name.label('produto_nome'),
+        TransactionItem.description.label('item_descricao')
+    ).outerjoin(Client, Transaction.client_id == Client.id)\
+     .outerjoin(TransactionItem, TransactionItem.id == primeiro_item)\
+     .outerjoin(Product, TransactionItem.product_id == Product.id)
+
+def _report_row(t):
+    """Formata uma linha de `_transaction_rows_query` (vendas e sangrias)"""
+    if t.kind == Transaction.KIND_WITHDRAWAL:
+        observacoes = t.notes or ''
+        # Sangrias antigas guardavam o tipo como prefixo das observações
+        for prefixo in ('SANGRIA: ', 'RETIRADA: '):
+            if observacoes.startswith(prefixo):
+                observacoes = observacoes[len(prefixo):]
+        return {
+            'id': t.id,
+            'cliente': 'SANGRIA',
+            'produto': 'Retirada de Caixa',
+            'valor': from_cents(t.total_cents),  # Valor negativo
+            'data': _format_dt_br(t.date),  # Sangrias já em horário local
+            'observacoes': observacoes,
+            'tipo': t.kind
+        }
+
+    # Vendas (e ajustes)
+    return {
+        'id': t.id,
+        'cliente': t.cliente_nome or 'Não informado',
+        'produto': t.produto_nome or t.item_descricao or 'N/A',
+        'valor': from_cents(t.total_cents),
+        'data': _format_dt_local_br(t.date),  # Vendas em UTC, converter para local
+        'observacoes': t.notes or '',
+        'tipo': t.kind
+    }
+
+def _report_summary(filtros):
+    """Resumo do período a partir dos agregados diários.
+
+    Só é possível sem filtros de cliente/produto/tipo (que os agregados não
+    distinguem) e na primeira página; caso contrário retorna None.
+    """
+    if filtros['cliente'] or filtros['filtra_produtos'] or filtros['tipo'] or filtros['cursor']:
+        return None
+    return DailyRollup.totals(
+        filtros['data_inicio'].date() if filtros['data_inicio'] else None,
+        (filtros['data_fim'] - timedelta(days=1)).date() if filtros['data_fim'] else None
+    )
+
+def _report_queries(filtros):
+    """Consultas do relatório, uma por faixa de datas, da mais recente à mais antiga.
+
+    Sem meses arquivados no período é só `_build_report_query`. Caso
+    contrário, os meses são agrupados de MAX_ATTACHED em MAX_ATTACHED (limite
+    de bancos anexados por conexão) e cada grupo vira uma faixa de datas
+    consultada com UNION ALL entre o banco principal e os arquivos do
+    grupo, anexados só então. As faixas não se sobrepõem, então concatenar
+    os resultados mantém a ordem por (data, id).
+    """
+    meses = months_in_range(filtros['data_inicio'], filtros['data_fim'])
+    if not meses:
+        yield _build_report_query(filtros)
+        return
+
+    fim = filtros['data_fim']
+    for inicio in range(0, len(meses), MAX_ATTACHED):
+        grupo = meses[inicio:inicio + MAX_ATTACHED]
+        ultimo = inicio + MAX_ATTACHED >= len(meses)
+        faixa = dict(filtros, data_fim=fim)
+        if not ultimo:
+            faixa['data_inicio'] = max(filter(None, (filtros['data_inicio'], month_bounds(grupo[-1])[0])))
+        fim = faixa['data_inicio']
+
+        consulta = _union_fontes(grupo, lambda fonte: _build_report_query(faixa, fonte).order_by(None))
+        yield consulta.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+def _union_fontes(meses, construir, principal=True):
+    """UNION ALL de `construir(fonte)` no banco principal e nos arquivos de `meses`.
+
+    Anexa os arquivos (no máximo MAX_ATTACHED) à conexão da sessão; a
+    consulta deve ser executada antes de anexar o próximo grupo.
+    """
+    attach(db.session.connection(), meses)
+    partes = ([construir(None)] if principal else []) + [construir(archived_entities(mes)) for mes in meses]
+    return partes[0].union_all(*partes[1:]) if len(partes) > 1 else partes[0]
+
+def _linhas_em_todas_as_fontes(construir):
+    """Linhas de `construir(fonte)` no banco principal e em todos os meses arquivados.
+
+    Os meses são lidos de MAX_ATTACHED em MAX_ATTACHED, como em
+    `_report_queries`; o banco principal entra só no primeiro grupo.
+    """
+    meses = archived_months()
+    if not meses:
+        return construir(None).all()
+    linhas = []
+    for inicio in range(0, len(meses), MAX_ATTACHED):
+        linhas += _union_fontes(meses[inicio:inicio + MAX_ATTACHED], construir, principal=inicio == 0).all()
+    return linhas
+
+def _report_rows(filtros, limite=None):
+    """Linhas do relatório (banco principal e arquivos), até `limite` linhas.
+
+    Sem limite, cada faixa é lida em lotes com `yield_per`, de modo que o
+    uso de memória não depende do tamanho do período.
+    """
+    for query in _report_queries(filtros):
+        if limite is None:
+            yield from query.yield_per(RELATORIO_LOTE_STREAM)
+            continue
+        linhas = query.limit(limite).all()
+        yield from linhas
+        limite -= len(linhas)
+        if limite <= 0:
+            return
+
+def _iter_report_rows(filtros):
+    """Itera as linhas formatadas do relatório, lidas do banco em lotes."""
+    for t in _report_rows(filtros):
+        yield _report_row(t)
+
+def _stream_report(filtros):
+    """Gera o JSON do relatório incrementalmente, linha a linha"""
+    import json
+
+    yield '{"dados": ['
+    primeira = True
+    for linha in _iter_report_rows(filtros):
+        yield ('' if primeira else ',') + json.dumps(linha)
+        primeira = False
+    yield '], "resumo": ' + json.dumps(_report_summary(filtros)) + '}'
+
+def _export_csv(filtros):
+    """Gera o CSV do relatório linha a linha (mesmas colunas da tela)"""
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def _flush():
+        valor = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return valor
+
+    writer.writerow(['Data', 'Cliente', 'Produto', 'Valor', 'Observações'])
+    yield _flush()
+    for linha in _iter_report_rows(filtros):
+        writer.writerow([
+            linha['data'], linha['cliente'], linha['produto'],
+            f"{linha['valor']:.2f}", linha['observacoes']
+        ])
+        yield _flush()
+
+def _export_ndjson(filtros, compactar=False):
+    """Gera NDJSON (uma transação por linha), opcionalmente compactado em gzip"""
+    import json
+    import zlib
+
+    # wbits=31: formato gzip, compactado incrementalmente sem acumular o arquivo
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+    pendente = []
+    for linha in _iter_report_rows(filtros):
+        dados = (json.dumps(linha, ensure_ascii=False) + '\n').encode('utf-8')
+        if not compressor:
+            yield dados
+            continue
+        pendente.append(compressor.compress(dados))
+        if len(pendente) >= RELATORIO_LOTE_STREAM:
+            yield b''.join(pendente)
+            pendente = []
+    if compressor:
+        pendente.append(compressor.flush())
+        yield b''.join(pendente)
+
 @main_bp.route('/api/relatorios', methods=['GET', 'POST'])
 def api_relatorios():
-    """API para gerar relatórios"""
+    """API para gerar relatórios.
+
+    Parâmetros opcionais além dos filtros:
+    - limite/cursor: paginação por cursor sobre (data, id); a resposta traz
+      `next_cursor` enquanto houver mais linhas;
+    - stream: emite as linhas conforme são lidas do banco.
+    """
     try:
-        # Forçar refresh dos dados para evitar cache
-        db.session.expire_all()
-        
-        # Obter parâmetros - suporta GET (query string) e POST (JSON)
-        if request.method == 'POST':
-            data = request.get_json() or {}
-            data_inicio = data.get('data_inicio')
-            data_fim = data.get('data_fim')
-            cliente = data.get('cliente')
-            produtos_ids = data.get('produtos', [])  # Array de IDs
+        try:
+            filtros = _parse_report_filters()
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Parâmetros de relatório inválidos'}), 400
+        
+        chave = _chave_relatorio(filtros)
+        # Lida antes da consulta: um commit durante o cálculo impede guardar o resultado
+        versao = cache_relatorios.version
+        codificacao = None if filtros['stream'] else accepted_encoding()
+        corpo, codificado = (None, None) if filtros['stream'] else _relatorio_em_cache(chave, codificacao)
+        if filtros['stream']:
+            response = Response(stream_with_context(_stream_report(filtros)), mimetype='application/json')
+        elif corpo is not None:
+            if codificado is None:
+                corpo, codificado = _compactar_relatorio(chave, filtros, corpo, codificacao, versao)
+            response = current_app.response_class(corpo, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            set_encoding(response, codificado)
         else:
-            data_inicio = request.args.get('data_inicio')
-            data_fim = request.args.get('data_fim')
-            cliente = request.args.get('cliente')
-            produtos_ids = request.args.getlist('produto')  # GET: múltiplos valores
-        
-        # Construir query - MODIFICADO para incluir todas as transações
-        query = Transaction.query.outerjoin(TransactionItem).outerjoin(Product).outerjoin(Client)
-        
-        if data_inicio:
-            data_inicio_dt = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(Transaction.date >= data_inicio_dt)
-        
-        if data_fim:
-            data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d')
-            # Adicionar 1 dia para incluir até o final do dia_fim
-            from datetime import timedelta
-            data_fim_dt = data_fim_dt + timedelta(days=1)
-            query = query.filter(Transaction.date < data_fim_dt)
-        
-        if cliente:
-            query = query.filter(Client.name.contains(cliente))
-        
-        # Filtrar por múltiplos produtos
-        if produtos_ids:
-            # Separar produtos cadastrados de personalizados
-            produtos_cadastrados = []
-            produtos_personalizados = []
-            
-            for pid in produtos_ids:
-                # Converter para string para verificar prefixo
-                pid_str = str(pid)
-                if pid_str.startswith('custom_'):
-                    # Produto personalizado (descrição)
-                    nome_produto = pid_str.replace('custom_', '')
-                    produtos_personalizados.append(nome_produto)
-                else:
-                    # Produto cadastrado (ID)
-                    try:
-                        produtos_cadastrados.append(int(pid))
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Construir condições OR para produtos
-            from sqlalchemy import or_
-            condicoes_produto = []
+            next_cursor = None
             
-            # Condição para produtos cadastrados por ID
-            if produtos_cadastrados:
-                condicoes_produto.append(Product.id.in_(produtos_cadastrados))
-            
-            # Condição para produtos personalizados por descrição
-            if produtos_personalizados:
-                condicoes_produto.append(TransactionItem.description.in_(produtos_personalizados))
-            
-            # Incluir sangrias/retiradas mesmo com filtro de produtos,
-            # pois sangrias não possuem TransactionItem/Product e seriam filtradas.
-            condicao_sangria = or_(
-                Transaction.total < 0,
-                Transaction.notes.like('SANGRIA:%'),
-                Transaction.notes.like('RETIRADA:%')
-            )
-
-            # Aplicar filtro com OR (qualquer condição de produto OU sangria)
-            if condicoes_produto:
-                query = query.filter(or_(condicao_sangria, or_(*condicoes_produto)))
-            else:
-                query = query.filter(condicao_sangria)
-        
-        # Ordenação estável: por data (mais recente primeiro) e, em caso de empate,
-        # por id (mais recente primeiro). Isso garante que sangrias apareçam na
-        # ordem em que foram executadas.
-        transactions = query.order_by(Transaction.date.desc(), Transaction.id.desc()).all()
-        
-        # Formatar dados - MODIFICADO para lidar com sangrias e todas as transações
-        dados = []
-        for t in transactions:
-            # Verificar se é uma sangria
-            if t.notes and t.notes.startswith('SANGRIA:'):
-                dados.append({
-                    'id': t.id,
-                    'cliente': 'SANGRIA',
-                    'produto': 'Retirada de Caixa',
-                    'valor': float(t.total),  # Valor negativo
-                    'data': _format_dt_br(t.date),  # Sangrias já em horário local
-                    'observacoes': t.notes.replace('SANGRIA: ', ''),
-                    'tipo': 'sangria'
-                })
-            elif t.notes and t.notes.startswith('RETIRADA:'):
-                # Para compatibilidade com dados antigos
-                dados.append({
-                    'id': t.id,
-                    'cliente': 'SANGRIA',
-                    'produto': 'Retirada de Caixa',
-                    'valor': float(t.total),  # Valor negativo
-                    'data': _format_dt_br(t.date),  # Sangrias já em horário local
-                    'observacoes': t.notes.replace('RETIRADA: ', ''),
-                    'tipo': 'sangria'
-                })
+            if filtros['limite']:
+                # Buscar uma linha a mais para saber se há próxima página
+                transactions = list(_report_rows(filtros, filtros['limite'] + 1))
+                if len(transactions) > filtros['limite']:
+                    transactions = transactions[:filtros['limite']]
+                    next_cursor = _encode_report_cursor(transactions[-1])
             else:
-                # Transações normais de vendas
-                produto_nome = 'N/A'
-                if t.items and len(t.items) > 0:
-                    if t.items[0].product:
-                        produto_nome = t.items[0].product.name
-                    elif t.items[0].description:
-                        produto_nome = t.items[0].description
-                
-                dados.append({
-                    'id': t.id,
-                    'cliente': t.client.name if t.client else 'Não informado',
-                    'produto': produto_nome,
-                    'valor': float(t.total),
-                    'data': _format_dt_local_br(t.date),  # Vendas em UTC, converter para local
-                    'observacoes': t.notes or '',
-                    'tipo': 'venda'
-                })
-        
-        response = make_response(jsonify({'dados': dados}))
+                transactions = list(_report_rows(filtros))
+            
+            dados = [_report_row(t) for t in transactions]
+            response = make_response(jsonify({
+                'dados': dados,
+                'next_cursor': next_cursor,
+                'resumo': _report_summary(filtros)
+            }))
+            corpo = response.get_data()
+            cache_relatorios.put((chave, None), corpo, filtros['data_inicio'], filtros['data_fim'], versao)
+            corpo, codificado = _compactar_relatorio(chave, filtros, corpo, codificacao, versao)
+            if codificado:
+                response.set_data(corpo)
+            set_encoding(response, codificado)
+            response.headers['X-Cache'] = 'MISS'
+        
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -584,3 +1047,40 @@ def api_relatorios():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/relatorios/export', methods=['GET', 'POST'])
+def api_relatorios_export():
+    """Exporta o relatório em streaming (mesmos filtros de /api/relatorios).
+
+    Parâmetros: formato=csv (padrão) ou ndjson; gzip=1 compacta o NDJSON.
+    As linhas são geradas conforme são lidas do banco, então memória e tempo
+    até o primeiro byte não dependem da quantidade de linhas.
+    """
+    try:
+        filtros = _parse_report_filters()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Parâmetros de relatório inválidos'}), 400
+
+    if request.method == 'POST':
+        opcoes = request.get_json() or {}
+    else:
+        opcoes = request.args
+    formato = (opcoes.get('formato') or 'csv').lower()
+    compactar = str(opcoes.get('gzip', '')).lower() in ('1', 'true', 'sim')
+    nome = f"relatorio_{datetime.now().strftime('%Y-%m-%d')}"
+
+    if formato == 'csv':
+        response = Response(stream_with_context(_export_csv(filtros)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="{nome}.csv"'
+    elif formato == 'ndjson':
+        if compactar:
+            response = Response(stream_with_context(_export_ndjson(filtros, True)), mimetype='application/gzip')
+            response.headers['Content-Disposition'] = f'attachment; filename="{nome}.ndjson.gz"'
+        else:
+            response = Response(stream_with_context(_export_ndjson(filtros)), mimetype='application/x-ndjson')
+            response.headers['Content-Disposition'] = f'attachment; filename="{nome}.ndjson"'
+    else:
+        return jsonify({'error': 'Formato inválido (use csv ou ndjson)'}), 400
+
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
@@ -0,0 +1,106 @@
+"""Client name search backed by an SQLite FTS5 index.
+
+The `clients_fts` virtual table mirrors `clients.name` (external content
+table kept in sync by triggers). The `unicode61` tokenizer with
+`remove_diacritics` folds case and accents, so "jose" matches "José", and
+prefix queries use the FTS term index instead of a `LIKE '%q%'` scan.
+
+Only the ``RANK_CANDIDATES`` most recent matches are ranked. FTS5's bm25
+(the ``rank`` column) needs the number of rows matching each term, which
+means reading the whole posting list of a common prefix such as "a" or
+"jo" (about 100 ms on 150k clients); ranking a bounded window keeps each
+autocomplete keystroke around a millisecond (see BENCHMARKS.md). Within
+the window, names starting with a matched word come first, then shorter
+names (what bm25 favours in a single-column index where every row matches
+every term), then alphabetical order. Older clients beyond the window
+show up as the query gets more specific.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from .db import db
+
+
+FTS_TABLE = "clients_fts"
+RANK_CANDIDATES = 100
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name,
+        content='clients',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE OF name ON clients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+
+def init_client_search(engine) -> bool:
+    """Create the FTS index and sync triggers (idempotent).
+
+    Existing clients are indexed when the table is first created. Returns
+    False when the SQLite build has no FTS5; searches then fall back to LIKE.
+    """
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            ).first()
+            for statement in _DDL:
+                conn.exec_driver_sql(statement)
+            if not exists:
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        return True
+    except OperationalError:
+        return False
+
+
+def _match_expression(query: str):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_clients(query: str, limit: int = 10):
+    """Return (id, name) rows of clients matching `query`, best matches first."""
+    from .models import Client
+
+    expression = _match_expression(query)
+    if expression is None:
+        return []
+
+    try:
+        return db.session.execute(
+            text(
+                # highlight() marks the matched tokens of the candidate rows
+                # only; a leading marker means the name starts with a match
+                f"SELECT c.id, c.name FROM ("
+                f"  SELECT rowid AS id,"
+                f"    substr(highlight({FTS_TABLE}, 0, char(1), ''), 1, 1) = char(1) AS first_word"
+                f"  FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expr ORDER BY rowid DESC LIMIT :candidates"
+                f") m JOIN clients c ON c.id = m.id "
+                f"ORDER BY m.first_word DESC, length(c.name), c.name LIMIT :limit"
+            ),
+            {"expr": expression, "candidates": max(limit, RANK_CANDIDATES), "limit": limit}
+        ).all()
+    except OperationalError:
+        # FTS5 unavailable: substring search (case/accent sensitive)
+        db.session.rollback()
+        return db.session.query(Client.id, Client.name).filter(
+            Client.name.contains(query)
+        ).order_by(Client.name).limit(limit).all()
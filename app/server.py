@@ -0,0 +1,160 @@
+"""WSGI server selection for the application.
+
+Two engines are supported:
+
+- ``waitress``: production server with a fixed worker thread pool, listen
+  backlog, connection limit and keep-alive timeout (optional dependency);
+- ``werkzeug``: Flask's development server, the default only with --debug.
+
+`add_server_arguments` adds the shared command line options used by
+`app.py` and `launcher.py`; `create_server` binds the socket and returns a
+handle exposing the effective port before serving starts.
+
+Readiness handshake: a parent process (the launcher) listening on a local
+port passes it as ``--notify-port``. Once the app is initialized and the
+server socket is listening, `start_server` connects back and sends one JSON
+line, ``{"status": "ready", "port": ..., "pid": ...}``; a failure to start
+is reported as ``{"status": "error", "error": ...}`` instead. The launcher
+therefore waits exactly as long as the startup takes, without probing
+ports or polling.
+"""
+import json
+import os
+import socket
+
+try:
+    import waitress
+except Exception:
+    waitress = None
+
+
+ENGINES = ('waitress', 'werkzeug')
+
+
+def add_server_arguments(parser):
+    """Add --server-engine and tuning options to an argparse parser."""
+    parser.add_argument('--server-engine', choices=ENGINES, default=None,
+                        help='servidor WSGI (padrão: waitress; werkzeug com --debug)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads de atendimento (waitress)')
+    parser.add_argument('--backlog', type=int, default=None,
+                        help='fila de conexões pendentes do socket (waitress)')
+    parser.add_argument('--connection-limit', type=int, default=None,
+                        help='máximo de conexões simultâneas (waitress)')
+    parser.add_argument('--keep-alive', type=int, default=None,
+                        help='segundos que uma conexão ociosa é mantida aberta (waitress)')
+    parser.add_argument('--any-port', action='store_true',
+                        help='se a porta pedida estiver ocupada, usar qualquer porta livre')
+    parser.add_argument('--notify-port', type=int, default=None,
+                        help='porta local do launcher que recebe o aviso de servidor pronto')
+
+
+class ServerHandle:
+    """Bound server: `port` is known before `serve_forever` is called."""
+
+    def __init__(self, engine, server, host, port, settings):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.settings = settings
+        self._server = server
+
+    def serve_forever(self):
+        if self.engine == 'waitress':
+            self._server.run()
+        else:
+            self._server.serve_forever()
+
+    def close(self):
+        if self.engine == 'waitress':
+            self._server.close()
+        else:
+            self._server.shutdown()
+
+    def describe(self) -> str:
+        options = ', '.join(f"{k}={v}" for k, v in self.settings.items())
+        return f"{self.engine} em http://{self.host}:{self.port}" + (f" ({options})" if options else '')
+
+
+def create_server(app, host, port, engine=None, debug=False, threads=None, backlog=None,
+                  connection_limit=None, keep_alive=None) -> ServerHandle:
+    """Bind `app` to host/port (0 = any free port) with the chosen engine.
+
+    Unset tuning options come from the app config (SERVER_THREADS,
+    SERVER_BACKLOG, SERVER_CONNECTION_LIMIT, SERVER_KEEP_ALIVE).
+    """
+    engine = engine or ('werkzeug' if debug else 'waitress')
+    if engine == 'waitress' and waitress is None:
+        print("Aviso: waitress nao instalado; usando o servidor de desenvolvimento (werkzeug)")
+        engine = 'werkzeug'
+
+    if engine == 'waitress':
+        settings = {
+            'threads': threads or app.config.get('SERVER_THREADS', 8),
+            'backlog': backlog or app.config.get('SERVER_BACKLOG', 1024),
+            'connection_limit': connection_limit or app.config.get('SERVER_CONNECTION_LIMIT', 100),
+            'channel_timeout': keep_alive or app.config.get('SERVER_KEEP_ALIVE', 120),
+        }
+        server = waitress.create_server(app, host=host, port=port, ident='caixa', **settings)
+        return ServerHandle(engine, server, host, int(server.effective_port), settings)
+
+    from werkzeug.serving import make_server
+
+    wsgi_app = app
+    if debug:
+        from werkzeug.debug import DebuggedApplication
+        app.debug = True
+        wsgi_app = DebuggedApplication(app, evalex=True)
+    server = make_server(host, port, wsgi_app, threaded=True)
+    return ServerHandle(engine, server, host, server.server_port, {'debug': debug})
+
+
+def notify_launcher(notify_port, **message):
+    """Send one JSON line to the launcher listening on 127.0.0.1:`notify_port`.
+
+    A no-op without a port; a launcher that went away is not an error.
+    """
+    if not notify_port:
+        return
+    message.setdefault('pid', os.getpid())
+    try:
+        with socket.create_connection(('127.0.0.1', notify_port), timeout=5) as conn:
+            conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+    except OSError:
+        pass
+
+
+def start_server(app, args) -> ServerHandle:
+    """Bind the server described by parsed command line `args`.
+
+    With ``--any-port`` a busy port falls back to one chosen by the OS. The
+    launcher (``--notify-port``) is told the effective port, or the error.
+    """
+    options = dict(
+        engine=args.server_engine,
+        debug=args.debug,
+        threads=args.threads,
+        backlog=args.backlog,
+        connection_limit=args.connection_limit,
+        keep_alive=args.keep_alive,
+    )
+    notify_port = getattr(args, 'notify_port', None)
+    try:
+        try:
+            server = create_server(app, host=args.host, port=args.port, **options)
+        except OSError:
+            if not getattr(args, 'any_port', False) or not args.port:
+                raise
+            server = create_server(app, host=args.host, port=0, **options)
+    except Exception as e:
+        notify_launcher(notify_port, status='error', error=str(e))
+        raise
+    notify_launcher(notify_port, status='ready', port=server.port)
+    return server
+
+
+def run_server(app, args):
+    """Create and run the server described by parsed command line `args`."""
+    server = start_server(app, args)
+    print(f"Servidor {server.describe()}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,162 @@
+"""Cash-register shifts (abertura/fechamento do caixa).
+
+`open_shift` records the current balance of every payment method as the
+opening snapshot together with the largest transaction and payment ids.
+While the shift is open, `shift_balances` returns opening snapshot plus
+the movements since then, reading only the payments of the shift (a
+primary key range), so its cost does not grow with the history.
+Transactions of that range dated before the opening (backdated batch
+imports) do not belong to the shift and are left out of its movements,
+counts and products.
+`close_shift` stores the closing snapshot and the shift report (JSON in
+``cash_sessions.report``) and compares the closing balances with the
+materialized ledger (`PaymentMethodBalance`); a difference means the
+ledger changed outside the shift (rebuilt, edited or given a backdated
+import) and is reported, not hidden.
+
+Like `app.transactions`, nothing here commits and the results are plain
+dicts, so the functions can run through the write-behind writer.
+"""
+import json
+from datetime import datetime
+
+from .db import db
+from .models import (CashSession, CashSessionBalance, Payment, PaymentMethod, PaymentMethodBalance, Transaction,
+                     TransactionItem)
+
+
+class ShiftError(ValueError):
+    """Shift operation not allowed in the current state; shown to the user."""
+
+
+def _max_ids():
+    return (
+        db.session.query(db.func.max(Transaction.id)).scalar() or 0,
+        db.session.query(db.func.max(Payment.id)).scalar() or 0,
+    )
+
+
+def _movements(shift, end_payment_id=None) -> dict:
+    """{payment_method_id: [sales_cents, sangrias_cents]} of the shift's payments."""
+    is_sangria = Transaction.kind == Transaction.KIND_WITHDRAWAL
+    query = db.session.query(
+        Payment.payment_method_id,
+        db.func.coalesce(db.func.sum(db.case((is_sangria, 0), else_=Payment.amount_cents)), 0),
+        db.func.coalesce(db.func.sum(db.case((is_sangria, -Payment.amount_cents), else_=0)), 0),
+    ).join(Transaction, Payment.transaction_id == Transaction.id)\
+     .filter(Payment.id > shift.start_payment_id, Transaction.date >= shift.opened_at)
+    if end_payment_id is not None:
+        query = query.filter(Payment.id <= end_payment_id)
+    return {method_id: [sales, sangrias] for method_id, sales, sangrias
+            in query.group_by(Payment.payment_method_id)}
+
+
+def _method_rows(shift, movements) -> list:
+    opening = {b.payment_method_id: b.opening_balance_cents for b in shift.balances}
+    methods = PaymentMethod.get_all_by_id()
+    rows = []
+    for method_id in sorted(set(opening) | set(movements)):
+        sales, sangrias = movements.get(method_id, (0, 0))
+        method = methods.get(method_id)
+        rows.append({
+            'payment_method_id': method_id,
+            'name': method.name if method else str(method_id),
+            'opening_cents': opening.get(method_id, 0),
+            'sales_cents': sales,
+            'sangrias_cents': sangrias,
+            'balance_cents': opening.get(method_id, 0) + sales - sangrias,
+        })
+    return rows
+
+
+def shift_summary(shift) -> dict:
+    """Shift state as a dict; open shifts are computed from snapshot plus movements."""
+    if shift.closed_at is not None:
+        return json.loads(shift.report)
+    return {
+        'id': shift.id,
+        'opened_at': shift.opened_at.isoformat(),
+        'closed_at': None,
+        'notes': shift.notes,
+        'methods': _method_rows(shift, _movements(shift)),
+    }
+
+
+def open_shift(notes=None) -> dict:
+    """Open a shift with the current balances as opening snapshot."""
+    if CashSession.current():
+        raise ShiftError('Já existe um turno aberto; feche-o antes de abrir outro')
+
+    shift = CashSession(opened_at=datetime.utcnow(), notes=notes or None)
+    db.session.add(shift)
+    # O INSERT abre a transação de escrita: ids e saldos lidos a seguir não
+    # mudam até o commit, e uma abertura simultânea já estaria visível aqui
+    db.session.flush()
+    if CashSession.query.filter(CashSession.closed_at.is_(None), CashSession.id != shift.id).first():
+        raise ShiftError('Já existe um turno aberto; feche-o antes de abrir outro')
+
+    shift.start_transaction_id, shift.start_payment_id = _max_ids()
+    for balance in PaymentMethodBalance.query.all():
+        shift.balances.append(CashSessionBalance(
+            payment_method_id=balance.payment_method_id,
+            opening_balance_cents=balance.balance_cents,
+        ))
+    db.session.flush()
+    return shift_summary(shift)
+
+
+def close_shift(notes=None) -> dict:
+    """Close the open shift, storing the closing snapshot and the shift report."""
+    shift = CashSession.current()
+    if shift is None:
+        raise ShiftError('Nenhum turno aberto')
+
+    shift.closed_at = datetime.utcnow()
+    if notes:
+        shift.notes = f"{shift.notes}\n{notes}" if shift.notes else notes
+    db.session.flush()
+    shift.end_transaction_id, shift.end_payment_id = _max_ids()
+
+    rows = _method_rows(shift, _movements(shift, shift.end_payment_id))
+    ledger = {b.payment_method_id: b.balance_cents for b in PaymentMethodBalance.query.all()}
+    balances = {b.payment_method_id: b for b in shift.balances}
+    for row in rows:
+        balance = balances.get(row['payment_method_id'])
+        if balance is None:
+            balance = CashSessionBalance(payment_method_id=row['payment_method_id'])
+            shift.balances.append(balance)
+        balance.sales_cents = row['sales_cents']
+        balance.sangrias_cents = row['sangrias_cents']
+        balance.closing_balance_cents = row['balance_cents']
+        row['ledger_difference_cents'] = ledger.get(row['payment_method_id'], 0) - row['balance_cents']
+
+    in_shift = (Transaction.id > shift.start_transaction_id, Transaction.id <= shift.end_transaction_id,
+                Transaction.date >= shift.opened_at)
+    counts = dict(db.session.query(Transaction.kind, db.func.count(Transaction.id))
+                  .filter(*in_shift).group_by(Transaction.kind).all())
+    product = db.func.coalesce(TransactionItem.description, '')
+    products = db.session.query(
+        TransactionItem.product_id, product, db.func.sum(TransactionItem.qty),
+        db.func.sum(TransactionItem.subtotal_cents)
+    ).join(Transaction, TransactionItem.transaction_id == Transaction.id)\
+     .filter(*in_shift).group_by(TransactionItem.product_id, product)\
+     .order_by(db.func.sum(TransactionItem.subtotal_cents).desc()).all()
+
+    report = {
+        'id': shift.id,
+        'opened_at': shift.opened_at.isoformat(),
+        'closed_at': shift.closed_at.isoformat(),
+        'notes': shift.notes,
+        'methods': rows,
+        'sales_count': counts.get(Transaction.KIND_SALE, 0),
+        'sangrias_count': counts.get(Transaction.KIND_WITHDRAWAL, 0),
+        'sales_cents': sum(row['sales_cents'] for row in rows),
+        'sangrias_cents': sum(row['sangrias_cents'] for row in rows),
+        'products': [
+            {'product_id': product_id, 'description': description, 'qty': qty, 'subtotal_cents': subtotal}
+            for product_id, description, qty, subtotal in products
+        ],
+    }
+    shift.report = json.dumps(report, ensure_ascii=False)
+    db.session.flush()
+    return report
@@ -0,0 +1,208 @@
+"""Validation and bulk insertion of sales.
+
+`validate_sale` applies the rules of ``POST /api/transaction`` (required
+fields, at least one payment, payments matching the total to the cent,
+known payment methods) to one JSON record and returns a normalized `Sale`
+with every amount in integer cents.
+
+`insert_sales` writes any number of validated sales with one executemany
+statement per table - the transaction ids come back from ``RETURNING`` in
+input order - and applies the aggregated balance/rollup deltas.
+`insert_withdrawal` does the same for a sangria after checking the method's
+balance. Neither commits, so callers decide the size of each atomic unit
+(one request, a batch chunk or a write-behind group).
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from .db import db
+from .models import DailyRollup, Payment, PaymentMethod, PaymentMethodBalance, Transaction, TransactionItem
+from .money import from_cents, to_cents
+
+
+# items: (product_id, description, qty, unit_price_cents, subtotal_cents)
+# payments: (payment_method_id, amount_cents)
+Sale = namedtuple('Sale', 'client_id date total_cents notes items payments')
+
+
+class SaleError(ValueError):
+    """Invalid sale record; the message is returned to the API client."""
+
+
+class InsufficientBalance(SaleError):
+    """Withdrawal larger than the payment method's current balance."""
+
+    def __init__(self, method, balance_cents):
+        self.method = method
+        self.balance_cents = balance_cents
+        super().__init__(
+            f'Saldo insuficiente no método {method.name}! Saldo disponível: R$ {from_cents(balance_cents):.2f}'
+        )
+
+
+def validate_sale(data, accept_date=False, methods=None) -> Sale:
+    """Validate one sale record (JSON dict) and convert amounts to cents.
+
+    With `accept_date` the record may carry its own ``date`` (ISO 8601; naive
+    values are taken as UTC, values with an offset are converted to UTC),
+    used when importing history; otherwise the sale is dated now. `methods`
+    is the payment method lookup (`PaymentMethod.get_all_by_id()`), fetched
+    once when many records are validated.
+    """
+    if methods is None:
+        methods = PaymentMethod.get_all_by_id()
+
+    if not isinstance(data, dict):
+        raise SaleError('Registro de transação inválido')
+
+    if not data.get('items') or not data.get('total'):
+        raise SaleError('Campos obrigatórios faltando')
+
+    payments = data.get('payments') or []
+    if not payments:
+        raise SaleError('É necessário informar pelo menos um pagamento')
+
+    if not all(isinstance(p, dict) for p in payments) or not all(isinstance(i, dict) for i in data['items']):
+        raise SaleError('Itens e pagamentos devem ser objetos')
+
+    try:
+        total_cents = to_cents(data.get('total'))
+        payment_cents = [to_cents(p.get('amount')) for p in payments]
+        items = [
+            (
+                item.get('product_id') or None,
+                item.get('description', ''),
+                int(item.get('qty', 1)),
+                to_cents(item.get('unit_price')),
+                to_cents(item.get('subtotal')),
+            )
+            for item in data['items']
+        ]
+    except (TypeError, ValueError) as e:
+        raise SaleError(str(e)) from None
+
+    # Verificar se o total dos pagamentos corresponde ao total da transação
+    if abs(sum(payment_cents) - total_cents) > 1:  # Tolerância de 1 centavo
+        raise SaleError('Total dos pagamentos não corresponde ao total da transação')
+
+    payment_rows = []
+    for payment_data, amount_cents in zip(payments, payment_cents):
+        try:
+            payment_method = methods.get(int(payment_data.get('payment_method_id')))
+        except (TypeError, ValueError):
+            payment_method = None
+        if not payment_method:
+            raise SaleError(f'Método de pagamento inválido: {payment_data.get("payment_method_id")}')
+        payment_rows.append((payment_method.id, amount_cents))
+
+    date = datetime.utcnow()
+    if accept_date and data.get('date'):
+        try:
+            date = datetime.fromisoformat(str(data['date']))
+        except ValueError:
+            raise SaleError(f'Data inválida: {data["date"]}') from None
+        if date.tzinfo is not None:
+            # Datas são gravadas em UTC sem fuso: converter antes de descartar o offset
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return Sale(
+        client_id=data.get('client_id') or None,
+        date=date,
+        total_cents=total_cents,
+        notes=data.get('notes', ''),
+        items=items,
+        payments=payment_rows,
+    )
+
+
+def insert_sales(sales) -> list:
+    """Insert validated sales in the current session; returns their ids in order.
+
+    Does not commit.
+    """
+    if not sales:
+        return []
+
+    ids = db.session.scalars(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        [
+            {
+                'client_id': sale.client_id,
+                'kind': Transaction.KIND_SALE,
+                'total_cents': sale.total_cents,
+                'notes': sale.notes,
+                'date': sale.date,
+            }
+            for sale in sales
+        ]
+    ).all()
+
+    item_rows = [
+        {
+            'transaction_id': transaction_id,
+            'product_id': product_id,
+            'description': description,
+            'qty': qty,
+            'unit_price_cents': unit_price_cents,
+            'subtotal_cents': subtotal_cents,
+        }
+        for transaction_id, sale in zip(ids, sales)
+        for product_id, description, qty, unit_price_cents, subtotal_cents in sale.items
+    ]
+    payment_rows = [
+        {'transaction_id': transaction_id, 'payment_method_id': method_id, 'amount_cents': amount_cents}
+        for transaction_id, sale in zip(ids, sales)
+        for method_id, amount_cents in sale.payments
+    ]
+    if item_rows:
+        db.session.execute(insert(TransactionItem), item_rows)
+    db.session.execute(insert(Payment), payment_rows)
+
+    PaymentMethodBalance.apply_many(
+        (method_id, amount_cents, Transaction.KIND_SALE)
+        for sale in sales
+        for method_id, amount_cents in sale.payments
+    )
+    DailyRollup.apply_transactions(
+        (
+            sale.date,
+            sale.total_cents,
+            [(product_id, qty, subtotal_cents) for product_id, _, qty, _, subtotal_cents in sale.items],
+            sale.payments,
+            Transaction.KIND_SALE,
+        )
+        for sale in sales
+    )
+    return ids
+
+
+def insert_withdrawal(method, amount_cents, reason) -> tuple:
+    """Insert a sangria of `amount_cents` (> 0) from `method`.
+
+    Raises `InsufficientBalance` when the method's balance is smaller. Does
+    not commit; returns ``(transaction_id, balance_before_cents)``.
+    """
+    balance_cents = PaymentMethodBalance.get_balance_cents(method.id)
+    if amount_cents > balance_cents:
+        raise InsufficientBalance(method, balance_cents)
+
+    date = datetime.utcnow()
+    transaction_id = db.session.scalar(
+        insert(Transaction).returning(Transaction.id),
+        {
+            'kind': Transaction.KIND_WITHDRAWAL,
+            'total_cents': -amount_cents,
+            'notes': f'{reason} [{method.name}]',
+            'date': date,
+        }
+    )
+    db.session.execute(insert(Payment), [
+        {'transaction_id': transaction_id, 'payment_method_id': method.id, 'amount_cents': -amount_cents},
+    ])
+
+    PaymentMethodBalance.apply(method.id, -amount_cents, kind=Transaction.KIND_WITHDRAWAL)
+    DailyRollup.apply_transaction(date, -amount_cents, payments=[(method.id, -amount_cents)],
+                                  kind=Transaction.KIND_WITHDRAWAL)
+    return transaction_id, balance_cents
@@ -0,0 +1,134 @@
+"""Optional write-behind mode: group commit of save requests.
+
+With ``Config.WRITE_BEHIND`` enabled, request handlers hand their write
+operations to a single `GroupCommitWriter` thread instead of committing
+themselves. The writer takes whatever operations are queued (waiting up to
+``WRITE_BEHIND_INTERVAL_MS`` for more to arrive, at most
+``WRITE_BEHIND_MAX_BATCH`` per group), runs them in one session and commits
+once, so a burst of sales from several terminals pays for a single WAL
+fsync. Each caller blocks on its `Future` and gets its result only after
+the group's commit succeeded.
+
+If any operation of a group raises, or the commit fails, the group is
+rolled back and its operations are re-run one by one, each with its own
+commit: only the failing ones get the exception. Operations must therefore
+only write through the session and be safe to run again.
+
+A caller that stops waiting (timeout) cannot take its operation back: it
+stays queued and may still commit. `wait` raises `WritePending` in that
+case so the caller can tell "not confirmed yet" apart from a failure.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from .db import db
+
+
+_STOP = object()
+
+
+class WritePending(Exception):
+    """The operation was not committed within the timeout but is still queued."""
+
+
+class GroupCommitWriter:
+    """Single writer thread committing queued operations in groups."""
+
+    def __init__(self, app, interval_ms=2, max_batch=200):
+        self.app = app
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.groups = 0
+        self.operations = 0
+        self.retried_groups = 0
+        self.largest_group = 0
+        self.pending = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='caixa-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation) -> Future:
+        """Queue `operation()` (a callable writing through `db.session`)."""
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def wait(self, future, timeout):
+        """Result of a submitted operation; `WritePending` if it is still queued after `timeout`."""
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self.pending += 1
+            raise WritePending('Gravação ainda na fila') from None
+
+    def stop(self, timeout=10):
+        """Commit what is already queued and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'groups': self.groups,
+            'operations': self.operations,
+            'retried_groups': self.retried_groups,
+            'largest_group': self.largest_group,
+            'pending': self.pending,
+            'average_group': round(self.operations / self.groups, 2) if self.groups else 0,
+        }
+
+    def _next_group(self):
+        """Block for one operation, then gather more for up to `interval`."""
+        group = [self._queue.get()]
+        if group[0] is _STOP:
+            return [], True
+        deadline = time.monotonic() + self.interval
+        while len(group) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self):
+        with self.app.app_context():
+            stopping = False
+            while not stopping:
+                group, stopping = self._next_group()
+                if group:
+                    self._commit_group(group)
+            db.session.remove()
+
+    def _commit_group(self, group):
+        self.groups += 1
+        self.operations += len(group)
+        self.largest_group = max(self.largest_group, len(group))
+
+        try:
+            results = [operation() for operation, _ in group]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(group) == 1:
+                group[0][1].set_exception(e)
+                return
+        else:
+            for (_, future), result in zip(group, results):
+                future.set_result(result)
+            return
+
+        self.retried_groups += 1
+        for operation, future in group:
+            try:
+                result = operation()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                future.set_exception(e)
+            else:
+                future.set_result(result)
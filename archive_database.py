@@ -0,0 +1,75 @@
+"""Script de arquivamento mensal das transações
+
+Uso:
+    python archive_database.py [--manter N]    arquiva os meses fechados
+    python archive_database.py --mes AAAA-MM   arquiva um mês específico
+    python archive_database.py --listar        lista os meses arquivados
+
+Os meses anteriores aos N mais recentes (padrão: ARCHIVE_KEEP_MONTHS) saem
+do banco principal para um arquivo por mês (caixa-AAAA-MM.db, na pasta
+"arquivo" ao lado do banco). Relatórios continuam consultando os meses
+arquivados; saldos e totais do resumo não mudam. Pode rodar com o sistema
+em uso (o servidor em execução é avisado para descartar seus caches) e ser
+repetido: um arquivamento interrompido é concluído na próxima execução.
+Os backups (backup_database.py) incluem os arquivos mensais.
+"""
+
+import argparse
+import os
+
+from app import create_app
+from app.archive import archive_closed_months, archive_month, archive_path, archived_months
+from instance_client import instance_path, query_instance
+from config import Config
+
+
+def _tamanho(path):
+    return f"{os.path.getsize(path) / (1024 * 1024):.1f} MB" if os.path.exists(path) else 'ausente'
+
+
+def arquivar(app, manter=None, mes=None):
+    """Move os meses fechados (ou o mês informado) para os bancos de arquivo"""
+    with app.app_context():
+        if mes:
+            movidos = [(mes, archive_month(mes))]
+        else:
+            manter = manter or app.config.get('ARCHIVE_KEEP_MONTHS', Config.ARCHIVE_KEEP_MONTHS)
+            print(f"Mantendo os últimos {manter} meses no banco principal...")
+            movidos = archive_closed_months(manter)
+
+        if not movidos:
+            print("Nenhuma transação a arquivar")
+        for mes_arquivado, quantidade in movidos:
+            print(f"✅ {mes_arquivado}: {quantidade} transações → {archive_path(mes_arquivado)}")
+
+    # Relatórios e ETags em cache no servidor aberto ainda refletem o banco anterior
+    if any(quantidade for _, quantidade in movidos) and query_instance(instance_path(), 'invalidate'):
+        print("Servidor em execução avisado para descartar os caches")
+
+
+def listar(app):
+    """Lista os meses arquivados e o tamanho de cada arquivo"""
+    with app.app_context():
+        meses = archived_months()
+        if not meses:
+            print("Nenhum mês arquivado")
+        for mes in meses:
+            print(f"{mes}  {_tamanho(archive_path(mes)):>10}  {archive_path(mes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquivamento mensal das transações')
+    parser.add_argument('--manter', type=int, help='meses mantidos no banco principal, incluindo o atual')
+    parser.add_argument('--mes', help='arquivar apenas este mês (AAAA-MM)')
+    parser.add_argument('--listar', action='store_true', help='listar os meses arquivados')
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.listar:
+        listar(app)
+    else:
+        arquivar(app, args.manter, args.mes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Script de backup e restauração do banco de dados
+
+Uso:
+    python backup_database.py [backup]        cria um backup (com o sistema em uso)
+    python backup_database.py list            lista os backups existentes
+    python backup_database.py verify [ARQ]    verifica a integridade (padrão: todos)
+    python backup_database.py restore ARQ     restaura um backup (sistema parado)
+
+Pode ser agendado (Agendador de Tarefas do Windows / cron) com o comando
+`backup`; a cópia não interrompe as vendas em andamento. Os bancos de
+arquivo mensal (archive_database.py) são copiados junto com o banco
+principal e restaurados com ele.
+"""
+
+import argparse
+import os
+import sys
+
+from app.db_backup import (BackupError, backup_settings, create_backup, database_path, list_backups,
+                           restore_backup, verify_backup)
+from instance_client import instance_path, query_instance
+from config import Config
+
+
+def _tamanho(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def fazer_backup():
+    """Cria um backup online e aplica a rotação"""
+    settings = backup_settings(Config)
+    print(f"Copiando {settings['db_path']} para {settings['dest_dir']}...")
+    result = create_backup(**settings)
+    print(f"✅ Backup criado: {result.path}")
+    if result.archives:
+        print(f"   Incluindo {len(result.archives)} arquivo(s) mensal(is) em {os.path.dirname(result.archives[0])}")
+    print(f"   Banco {_tamanho(result.db_size)} → backup {_tamanho(result.size)} em {result.seconds:.2f} s")
+    for path in result.removed:
+        print(f"   Removido pela rotação: {os.path.basename(path)}")
+
+
+def listar_backups():
+    """Lista os backups, do mais recente para o mais antigo"""
+    backups = list_backups(Config.BACKUP_DIR)
+    if not backups:
+        print(f"Nenhum backup em {Config.BACKUP_DIR}")
+    for stamp, path in backups:
+        print(f"{stamp:%d/%m/%Y %H:%M:%S}  {_tamanho(os.path.getsize(path)):>10}  {os.path.basename(path)}")
+
+
+def verificar_backups(arquivo=None):
+    """Verifica a integridade de um backup (ou de todos)"""
+    caminhos = [arquivo] if arquivo else [path for _, path in list_backups(Config.BACKUP_DIR)]
+    falhas = 0
+    for path in caminhos:
+        try:
+            verify_backup(path)
+            print(f"ok     {path}")
+        except BackupError as e:
+            falhas += 1
+            print(f"FALHA  {e}")
+    return falhas == 0
+
+
+def restaurar_backup(arquivo):
+    """Substitui o banco atual pelo backup informado"""
+    if query_instance(instance_path()):
+        raise BackupError('O sistema está em execução; feche-o antes de restaurar um backup')
+    db_path = database_path(Config.SQLALCHEMY_DATABASE_URI)
+    anterior = restore_backup(arquivo, db_path, Config.ARCHIVE_DIR)
+    print(f"✅ Backup restaurado em {db_path}")
+    print(f"   Banco anterior preservado em {anterior}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backup e restauração do banco de dados')
+    parser.add_argument('comando', nargs='?', default='backup', choices=['backup', 'list', 'verify', 'restore'])
+    parser.add_argument('arquivo', nargs='?')
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'backup':
+            fazer_backup()
+        elif args.comando == 'list':
+            listar_backups()
+        elif args.comando == 'verify':
+            if not verificar_backups(args.arquivo):
+                sys.exit(1)
+        else:
+            if not args.arquivo:
+                parser.error('informe o arquivo de backup a restaurar')
+            restaurar_backup(args.arquivo)
+    except BackupError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
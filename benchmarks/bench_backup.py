@@ -0,0 +1,111 @@
+"""Duração do backup online em função do tamanho do banco.
+
+Para cada tamanho gera um banco temporário com N vendas (10 itens, 3
+pagamentos) e mede `create_backup` com e sem gzip. Em seguida repete o
+backup com um terminal gravando vendas sem parar e compara a latência das
+gravações durante a cópia com a latência sem backup.
+
+Uso:
+    python benchmarks/bench_backup.py [--sales 10000 50000 200000]
+        [--pages 256] [--pause-ms 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.db import db  # noqa: E402
+from app.db_backup import create_backup, database_path  # noqa: E402
+from app.transactions import insert_sales, validate_sale  # noqa: E402
+from bench_save_transaction import SALE  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def _populate(app, sales):
+    with app.app_context():
+        venda = validate_sale(SALE)
+        for inicio in range(0, sales, 1000):
+            insert_sales([venda] * min(1000, sales - inicio))
+            db.session.commit()
+
+
+def _write_latencies(app, stop):
+    client = app.test_client()
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        assert client.post('/api/transaction', json=SALE).status_code == 200
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _p99(values):
+    values = sorted(values)
+    return values[max(0, int(len(values) * 0.99) - 1)] * 1000
+
+
+def run(sales, pages, pause):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            TESTING = True
+
+        app = create_app(BenchConfig)
+        _populate(app, sales)
+        db_path = database_path(BenchConfig.SQLALCHEMY_DATABASE_URI)
+        dest = os.path.join(tmp, 'backups')
+
+        row = {'sales': sales}
+        for compress in (False, True):
+            result = create_backup(db_path, dest, pages=pages, pause=pause, compress=compress,
+                                   keep_last=100)
+            row['gz' if compress else 'raw'] = result
+            os.remove(result.path)
+
+        # Latência das gravações: sem backup e durante um backup
+        for label, with_backup in (('idle', False), ('backup', True)):
+            stop = threading.Event()
+            latencies = []
+            writer = threading.Thread(target=lambda: latencies.extend(_write_latencies(app, stop)))
+            writer.start()
+            if with_backup:
+                row['concurrent'] = create_backup(db_path, dest, pages=pages, pause=pause, keep_last=100)
+            else:
+                time.sleep(1)
+            stop.set()
+            writer.join()
+            row[label] = (statistics.median(latencies) * 1000, _p99(latencies), len(latencies))
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, nargs='+', default=[10000, 50000, 200000])
+    parser.add_argument('--pages', type=int, default=256)
+    parser.add_argument('--pause-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.pages} páginas por etapa, pausa de {args.pause_ms} ms")
+    for sales in args.sales:
+        r = run(sales, args.pages, args.pause_ms / 1000)
+        mb = r['raw'].db_size / (1024 * 1024)
+        print(f"{sales:>7} vendas, banco {mb:6.1f} MB: "
+              f"backup {r['raw'].seconds:.2f} s, com gzip {r['gz'].seconds:.2f} s "
+              f"({r['gz'].size / (1024 * 1024):.1f} MB); "
+              f"durante gravações {r['concurrent'].seconds:.2f} s")
+        print(f"{'':7} gravações sem backup p50 {r['idle'][0]:.2f} ms p99 {r['idle'][1]:.2f} ms; "
+              f"durante o backup p50 {r['backup'][0]:.2f} ms p99 {r['backup'][1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
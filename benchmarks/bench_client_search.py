@@ -0,0 +1,107 @@
+"""Tempo da busca de clientes (/api/clients?q=) com muitos clientes.
+
+Gera um banco temporário com N clientes de nomes sintéticos (prenomes,
+sobrenomes e acentos variados) e mede, para cada termo, a mediana de
+`search_clients` (índice FTS5) e da busca anterior (``LIKE '%q%'`` com
+``LIMIT``), além da quantidade de clientes que casam com o termo.
+
+Uso:
+    python benchmarks/bench_client_search.py [--clients 150000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.db import db  # noqa: E402
+from app.models import Client  # noqa: E402
+from app.search import search_clients  # noqa: E402
+from config import Config  # noqa: E402
+
+FIRST = ['Ana', 'João', 'Maria', 'José', 'Joana', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Adriana',
+         'Lucas', 'Luiz', 'Márcia', 'Pedro', 'Aline', 'Rafael', 'Juliana', 'Fernando', 'Sandra', 'Bruno',
+         'Camila', 'Eduardo', 'Patrícia', 'Rodrigo', 'Letícia', 'Jorge', 'Vera', 'Sérgio', 'Beatriz', 'Igor']
+LAST = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+        'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+        'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas',
+        'Cardoso', 'Ramos', 'Gonçalves', 'Santana', 'Teixeira', 'Araújo', 'Zanetti', 'Quintela', 'Wolff', 'Yamada']
+
+QUERIES = ['a', 'jo', 'silva', 'jose', 'maria sil', 'joana prado', 'zanet', 'xyz']
+
+
+def _name(rng):
+    parts = [rng.choice(FIRST)]
+    if rng.random() < 0.4:
+        parts.append(rng.choice(FIRST))
+    parts += rng.sample(LAST, rng.randrange(1, 4))
+    return ' '.join(parts)
+
+
+def _populate(app, clients):
+    rng = random.Random(42)
+    with app.app_context():
+        for start in range(0, clients, 10000):
+            db.session.execute(Client.__table__.insert(),
+                               [{'name': _name(rng)} for _ in range(min(10000, clients - start))])
+            db.session.commit()
+        db.session.add(Client(name='Joana Prado'))
+        db.session.commit()
+
+
+def _median_ms(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run(clients, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            TESTING = True
+
+        app = create_app(BenchConfig)
+        _populate(app, clients)
+        rows = []
+        with app.app_context():
+            for query in QUERIES:
+                like = db.session.query(Client.id, Client.name).filter(
+                    Client.name.contains(query)).order_by(Client.name).limit(10)
+                matches = db.session.execute(db.text(
+                    "SELECT count(*) FROM clients_fts WHERE clients_fts MATCH :expr"),
+                    {'expr': ' '.join(f'"{word}"*' for word in query.split())}).scalar()
+                rows.append({
+                    'query': query,
+                    'matches': matches,
+                    'fts': _median_ms(lambda: search_clients(query), repeat),
+                    'like': _median_ms(lambda: like.all(), repeat),
+                    'first': [name for _, name in search_clients(query)[:3]],
+                })
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=150000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clientes; mediana em ms")
+    print(f"{'termo':<12} {'casam':>7} {'fts':>8} {'like':>8}  primeiros resultados")
+    for row in run(args.clients, args.repeat):
+        print(f"{row['query']:<12} {row['matches']:>7} {row['fts']:8.2f} {row['like']:8.2f}  "
+              + ', '.join(row['first']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Bytes trafegados por página e por /api/relatorios, com e sem compressão.
+
+Gera um banco temporário com N vendas variadas dos últimos 60 dias e pede cada
+página e o relatório (uma página de 200 linhas e o relatório completo) com
+``Accept-Encoding`` vazio, ``gzip`` e ``br`` (se o pacote brotli estiver
+instalado). Para cada caso mostra o tamanho do corpo e o tempo da primeira
+requisição (renderização/compressão) e das seguintes (servidas do cache).
+
+Uso:
+    python benchmarks/bench_compression.py [--sales 20000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.compression import available_encodings  # noqa: E402
+from app.db import db  # noqa: E402
+from app.transactions import insert_sales, validate_sale  # noqa: E402
+from config import Config  # noqa: E402
+
+URLS = [
+    ('/', 'página inicial'),
+    ('/configuracoes', 'configurações'),
+    ('/resumo', 'resumo'),
+    ('/relatorios', 'relatórios'),
+    ('/api/relatorios?limite=200', '/api/relatorios (200 linhas)'),
+    ('/api/relatorios', '/api/relatorios (completo)'),
+]
+
+
+def _sale(rng, now):
+    """Venda variada (itens, valores, formas de pagamento e datas diferentes):
+    vendas idênticas comprimiriam muito mais que dados reais."""
+    items = [
+        {'product_id': rng.choice([1, 2, 3, None]), 'description': f'Item {rng.randrange(500)}', 'qty': 1,
+         'unit_price': price, 'subtotal': price}
+        for price in (rng.randrange(500, 20000) / 100 for _ in range(rng.randrange(1, 6)))
+    ]
+    total = round(sum(item['subtotal'] for item in items), 2)
+    date = now - timedelta(minutes=rng.randrange(60 * 24 * 60))
+    return {'total': total, 'date': date.isoformat(), 'items': items,
+            'payments': [{'payment_method_id': rng.randrange(1, 5), 'amount': total}]}
+
+
+def _populate(app, sales):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with app.app_context():
+        for inicio in range(0, sales, 1000):
+            insert_sales([validate_sale(_sale(rng, now), accept_date=True)
+                          for _ in range(min(1000, sales - inicio))])
+            db.session.commit()
+
+
+def _get(client, url, encoding):
+    start = time.perf_counter()
+    resp = client.get(url, headers={'Accept-Encoding': encoding or 'identity'})
+    elapsed = (time.perf_counter() - start) * 1000
+    assert resp.status_code == 200 and resp.headers.get('Content-Encoding') == encoding, url
+    return len(resp.data), elapsed
+
+
+def run(sales, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            TESTING = True
+
+        app = create_app(BenchConfig)
+        _populate(app, sales)
+        client = app.test_client()
+
+        rows = []
+        for url, label in URLS:
+            row = {'label': label}
+            for encoding in (None,) + available_encodings():
+                size, first = _get(client, url, encoding)
+                later = [_get(client, url, encoding)[1] for _ in range(repeat)]
+                row[encoding] = (size, first, statistics.median(later))
+            rows.append(row)
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    encodings = (None,) + available_encodings()
+    print(f"{args.sales} vendas; tamanho em bytes, tempo da 1ª requisição / mediana das seguintes (ms)")
+    for row in run(args.sales, args.repeat):
+        parts = []
+        for encoding in encodings:
+            size, first, later = row[encoding]
+            parts.append(f"{encoding or 'sem':>4} {size:>9} ({first:7.2f} / {later:6.2f})")
+        print(f"{row['label']:<30} " + '  '.join(parts))
+
+
+if __name__ == '__main__':
+    main()
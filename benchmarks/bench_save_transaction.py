@@ -0,0 +1,79 @@
+"""Micro-benchmark de latência de POST /api/transaction.
+
+Grava vendas de 10 itens e 3 pagamentos via cliente de testes do Flask (sem
+rede) em um banco temporário e reporta as latências p50/p99 por venda.
+
+Uso:
+    python benchmarks/bench_save_transaction.py [--sales 2000] [--profile safe]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.db import SQLITE_PROFILES, db  # noqa: E402
+from config import Config  # noqa: E402
+
+SALE = {
+    'total': 100,
+    'items': [
+        {'product_id': 1 + i % 3, 'description': f'Item {i}', 'qty': 1, 'unit_price': 10, 'subtotal': 10}
+        for i in range(10)
+    ],
+    'payments': [
+        {'payment_method_id': 1, 'amount': 50},
+        {'payment_method_id': 2, 'amount': 30},
+        {'payment_method_id': 3, 'amount': 20},
+    ],
+}
+
+
+def run(sales, profile, warmup=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            SQLITE_PROFILE = profile
+            TESTING = True
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+
+        latencies = []
+        for i in range(warmup + sales):
+            start = time.perf_counter()
+            resp = client.post('/api/transaction', json=SALE)
+            elapsed = time.perf_counter() - start
+            assert resp.status_code == 200, resp.get_json()
+            if i >= warmup:
+                latencies.append(elapsed)
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'vendas_s': len(latencies) / sum(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--profile', choices=list(SQLITE_PROFILES), default='safe')
+    args = parser.parse_args()
+
+    r = run(args.sales, args.profile)
+    print(f"perfil {args.profile}: {args.sales} vendas (10 itens, 3 pagamentos)")
+    print(f"p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  {r['vendas_s']:.0f} vendas/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark de requisições/s por servidor WSGI (--server-engine).
+
+Sobe `app.py` em um subprocesso com banco temporário para cada engine e
+dispara requisições concorrentes (conexões keep-alive) contra
+GET /api/produtos e POST /api/transaction.
+
+Uso:
+    python benchmarks/bench_server.py [--duration 5] [--concurrency 8]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SALE = json.dumps({
+    'total': 30,
+    'items': [{'description': 'Bench', 'qty': 1, 'unit_price': 30, 'subtotal': 30}],
+    'payments': [{'payment_method_id': 1, 'amount': 30}],
+})
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('servidor não respondeu')
+
+
+def _load(port, method, path, body, duration, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        'errors': errors[0],
+    }
+
+
+def run(engine, duration, concurrency):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, LOCALAPPDATA=data_dir)
+        proc = subprocess.Popen(
+            [sys.executable, 'app.py', '--no-browser', '--port', str(port), '--server-engine', engine],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_port(port)
+            results = {
+                'GET /api/produtos': _load(port, 'GET', '/api/produtos', None, duration, concurrency),
+                'POST /api/transaction': _load(port, 'POST', '/api/transaction', SALE, duration, concurrency),
+            }
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--engines', nargs='+', default=['werkzeug', 'waitress'])
+    args = parser.parse_args()
+
+    print(f"{'engine':10} {'endpoint':24} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for engine in args.engines:
+        for endpoint, r in run(engine, args.duration, args.concurrency).items():
+            print(f"{engine:10} {endpoint:24} {r['rps']:8.0f} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['errors']:6}")
+
+
+if __name__ == '__main__':
+    main()
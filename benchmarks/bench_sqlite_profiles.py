@@ -0,0 +1,75 @@
+"""Benchmark dos perfis de PRAGMA do SQLite (Config.SQLITE_PROFILE).
+
+Para cada perfil cria um banco temporário e mede, via cliente de testes do
+Flask (sem rede):
+- gravação: vendas/s em POST /api/transaction (um commit por venda);
+- relatório: relatórios/s em /api/relatorios (primeira página de 500
+  linhas) e o tempo de um relatório completo em streaming.
+
+Uso:
+    python benchmarks/bench_sqlite_profiles.py [--sales 2000] [--reports 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.db import SQLITE_PROFILES, db  # noqa: E402
+from config import Config  # noqa: E402
+
+SALE = {
+    'total': 30,
+    'items': [{'description': 'Bench', 'qty': 1, 'unit_price': 30, 'subtotal': 30}],
+    'payments': [{'payment_method_id': 1, 'amount': 30}],
+}
+
+
+def run(profile, sales, reports):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            SQLITE_PROFILE = profile
+            TESTING = True
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for _ in range(sales):
+            assert client.post('/api/transaction', json=SALE).status_code == 200
+        insert_rate = sales / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(reports):
+            assert client.get('/api/relatorios', query_string={'limite': 500}).status_code == 200
+        report_rate = reports / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.get('/api/relatorios', query_string={'stream': 1}).get_data()
+        full_report_ms = (time.perf_counter() - start) * 1000
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return insert_rate, report_rate, full_report_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=50)
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'perfil':10} {'vendas/s':>10} {'relat. 500/s':>13} {'relat. completo ms':>19}")
+    for profile in args.profiles:
+        insert_rate, report_rate, full_ms = run(profile, args.sales, args.reports)
+        print(f"{profile:10} {insert_rate:10.0f} {report_rate:13.1f} {full_ms:19.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark do modo write-behind (commit em grupo) em POST /api/transaction.
+
+Várias threads (terminais) gravam vendas de 10 itens e 3 pagamentos ao mesmo
+tempo via cliente de testes do Flask, com WRITE_BEHIND desligado e ligado,
+em um banco temporário. Reporta latências p50/p99, vendas/s e, no modo
+ligado, o tamanho médio dos grupos.
+
+Uso:
+    python benchmarks/bench_write_behind.py [--sales 2000] [--threads 8]
+        [--interval-ms 2] [--profile safe]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.db import SQLITE_PROFILES, db  # noqa: E402
+from bench_save_transaction import SALE  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def run(sales, threads, write_behind, interval_ms, profile):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            SQLITE_PROFILE = profile
+            TESTING = True
+            WRITE_BEHIND = write_behind
+            WRITE_BEHIND_INTERVAL_MS = interval_ms
+
+        app = create_app(BenchConfig)
+        latencies = []
+        por_thread = sales // threads
+
+        def _terminal():
+            client = app.test_client()
+            proprias = []
+            for _ in range(por_thread):
+                start = time.perf_counter()
+                resp = client.post('/api/transaction', json=SALE)
+                proprias.append(time.perf_counter() - start)
+                assert resp.status_code == 200, resp.get_json()
+            latencies.extend(proprias)
+
+        workers = [threading.Thread(target=_terminal) for _ in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+
+        writer = app.extensions.get('caixa_writer')
+        stats = writer.stats() if writer else None
+        if writer:
+            writer.stop()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'vendas_s': len(latencies) / elapsed,
+        'writer': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--interval-ms', type=int, default=2)
+    parser.add_argument('--profile', choices=list(SQLITE_PROFILES), default='safe')
+    args = parser.parse_args()
+
+    print(f"perfil {args.profile}: {args.sales} vendas em {args.threads} threads")
+    for write_behind in (False, True):
+        r = run(args.sales, args.threads, write_behind, args.interval_ms, args.profile)
+        modo = 'write-behind' if write_behind else 'commit por requisição'
+        print(f"{modo:22} p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  {r['vendas_s']:.0f} vendas/s")
+        if r['writer']:
+            print(f"{'':22} grupos {r['writer']['groups']}  média {r['writer']['average_group']}"
+                  f"  maior {r['writer']['largest_group']}  regravados {r['writer']['retried_groups']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,9 +9,56 @@ class Config:
     APP_NAME = "Controle_de_caixa"
     APP_AUTHOR = None
 
+    # Criado na inicialização do banco (app/db.py), não na importação
     DATA_DIR = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), APP_NAME)
-    os.makedirs(DATA_DIR, exist_ok=True)
 
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(DATA_DIR, 'caixa.db')}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY', 'replace-me-in-prod')
+
+    # Servidor WSGI de produção (waitress); ver app/server.py
+    SERVER_THREADS = int(os.environ.get('CAIXA_SERVER_THREADS', 8))
+    SERVER_BACKLOG = int(os.environ.get('CAIXA_SERVER_BACKLOG', 1024))
+    SERVER_CONNECTION_LIMIT = int(os.environ.get('CAIXA_SERVER_CONNECTION_LIMIT', 100))
+    SERVER_KEEP_ALIVE = int(os.environ.get('CAIXA_SERVER_KEEP_ALIVE', 120))  # segundos
+
+    # Perfil de PRAGMAs do SQLite: safe, balanced ou fast (ver app/db.py)
+    SQLITE_PROFILE = os.environ.get('CAIXA_SQLITE_PROFILE', 'safe')
+
+    # Modo write-behind: gravações de vendas/sangrias enfileiradas para uma
+    # thread única que faz commit em grupo (ver app/writer.py)
+    WRITE_BEHIND = os.environ.get('CAIXA_WRITE_BEHIND', '0') == '1'
+    WRITE_BEHIND_INTERVAL_MS = int(os.environ.get('CAIXA_WRITE_BEHIND_INTERVAL_MS', 2))
+    WRITE_BEHIND_MAX_BATCH = int(os.environ.get('CAIXA_WRITE_BEHIND_MAX_BATCH', 200))
+    WRITE_BEHIND_TIMEOUT = 30  # segundos de espera por uma gravação enfileirada
+
+    # Atualizações ao vivo do resumo (/api/resumo/stream, ver app/events.py):
+    # cada painel aberto ocupa uma thread do servidor enquanto estiver conectado
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('CAIXA_SSE_MAX_SUBSCRIBERS', 4))  # abaixo de SERVER_THREADS
+    SSE_HEARTBEAT = 15  # segundos entre comentários de keep-alive
+
+    # Cache de resultados de /api/relatorios (ver app/cache.py); 0 entradas desliga
+    REPORT_CACHE_ENTRIES = int(os.environ.get('CAIXA_REPORT_CACHE_ENTRIES', 256))
+    REPORT_CACHE_MAX_MB = int(os.environ.get('CAIXA_REPORT_CACHE_MAX_MB', 32))
+    REPORT_CACHE_TTL = int(os.environ.get('CAIXA_REPORT_CACHE_TTL', 300))  # segundos
+
+    # Compressão gzip/brotli negociada pelo Accept-Encoding (ver app/compression.py);
+    # brotli só é usado se o pacote estiver instalado
+    COMPRESS_RESPONSES = os.environ.get('CAIXA_COMPRESS_RESPONSES', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('CAIXA_COMPRESS_MIN_SIZE', 1024))  # bytes; respostas menores vão sem compressão
+    COMPRESS_LEVEL = 6           # gzip das respostas dinâmicas (páginas usam o nível máximo, uma vez)
+    COMPRESS_BROTLI_QUALITY = 5  # brotli das respostas dinâmicas (páginas usam 11)
+
+    # Backups online do banco (ver app/db_backup.py e backup_database.py)
+    BACKUP_DIR = os.environ.get('CAIXA_BACKUP_DIR', os.path.join(DATA_DIR, 'backups'))
+    BACKUP_INTERVAL_HOURS = float(os.environ.get('CAIXA_BACKUP_INTERVAL_HOURS', 0))  # 0 = só manual
+    BACKUP_KEEP_LAST = int(os.environ.get('CAIXA_BACKUP_KEEP_LAST', 10))
+    BACKUP_KEEP_DAILY = int(os.environ.get('CAIXA_BACKUP_KEEP_DAILY', 30))
+    BACKUP_COMPRESS = os.environ.get('CAIXA_BACKUP_COMPRESS', '1') == '1'
+    BACKUP_PAGES = 256     # páginas copiadas por etapa
+    BACKUP_PAUSE_MS = 5    # pausa entre etapas, libera o banco para as gravações
+
+    # Arquivamento mensal: meses fechados saem do caixa.db para
+    # ARCHIVE_DIR/caixa-AAAA-MM.db (ver app/archive.py e archive_database.py)
+    ARCHIVE_DIR = os.environ.get('CAIXA_ARCHIVE_DIR')  # padrão: pasta "arquivo" ao lado do banco
+    ARCHIVE_KEEP_MONTHS = int(os.environ.get('CAIXA_ARCHIVE_KEEP_MONTHS', 12))  # meses mantidos, incluindo o atual
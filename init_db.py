@@ -12,9 +12,9 @@ def init_database():
         # Verificar se já existem produtos básicos
         if not Product.query.first():
             produtos = [
-                Product(name='Consulta', price=50.00),
-                Product(name='Serviço Básico', price=100.00),
-                Product(name='Serviço Premium', price=200.00),
+                Product(name='Consulta', price_cents=5000),
+                Product(name='Serviço Básico', price_cents=10000),
+                Product(name='Serviço Premium', price_cents=20000),
             ]
             for p in produtos:
                 db.session.add(p)
@@ -3,9 +3,9 @@
 from app import create_app
 from app.models import db, PaymentMethod
 
-def init_payment_methods():
+def init_payment_methods(app=None):
     """Inicializa métodos de pagamento padrão se não existirem"""
-    app = create_app()
+    app = app or create_app()
     
     with app.app_context():
         # Criar todas as tabelas
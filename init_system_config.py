@@ -3,9 +3,9 @@
 from app import create_app
 from app.models import db, SystemConfig
 
-def init_system_config():
+def init_system_config(app=None):
     """Inicializa a tabela system_config se não existir"""
-    app = create_app()
+    app = app or create_app()
     
     with app.app_context():
         # Criar todas as tabelas
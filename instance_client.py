@@ -0,0 +1,50 @@
+"""Client side of the server's single-instance control channel.
+
+Reads ``instance.json`` and talks to the control socket of a running
+server (see app/instance.py for the protocol). Only the standard library
+and config.py are imported, so the Tk launcher can check for a running
+server without loading Flask, SQLAlchemy or waitress; those are only
+imported by the server process.
+"""
+import json
+import os
+import socket
+
+
+INSTANCE_FILE = 'instance.json'
+APP_ID = 'caixa'
+CONNECT_TIMEOUT = 0.5  # segundos
+REPLY_TIMEOUT = 1.0
+
+
+def instance_path(config=None) -> str:
+    """Path of the instance file for the data directory of `config`."""
+    if config is None:
+        from config import Config as config
+    return os.path.join(config.DATA_DIR, INSTANCE_FILE)
+
+
+def read_instance(path):
+    """Contents of the instance file at `path`, or None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def query_instance(path, cmd='status'):
+    """Send `cmd` to the server recorded in `path`; None if none answers."""
+    info = read_instance(path)
+    if not info or not info.get('control_port'):
+        return None
+    try:
+        with socket.create_connection(('127.0.0.1', info['control_port']), timeout=CONNECT_TIMEOUT) as conn:
+            conn.settimeout(REPLY_TIMEOUT)
+            conn.sendall(json.dumps({'cmd': cmd, 'token': info.get('token')}).encode('utf-8') + b'\n')
+            reply = json.loads(conn.makefile('rb').readline())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(reply, dict) or reply.get('app') != APP_ID:
+        return None
+    return reply
@@ -5,31 +5,44 @@ import sys
 import time
 import webbrowser
 import os
-import signal
 import socket
+import json
 import threading
 from pathlib import Path
 import argparse
 
+# Só a biblioteca padrão: Flask, SQLAlchemy e waitress são carregados apenas
+# no processo do servidor (run_server)
+from instance_client import instance_path, query_instance
+
 # Tentar importar psutil, mas aceitar fallback
 try:
     import psutil
 except Exception:
     psutil = None
 
+# Quanto um segundo servidor espera o dono do lock publicar a instância
+# (segundos); menor que START_TIMEOUT para o launcher receber o erro
+INSTANCE_WAIT_TIMEOUT = 90
+
 class SistemaCaixaLauncher:
     """Launcher melhorado:
     - Inicia o servidor em subprocess (isolado)
     - Start não bloqueante (usa Thread)
-    - Tenta portas subsequentes se a inicial falhar
-    - Grava logs em 'launcher.log' e pid/porta em 'app.pid'
+    - O servidor avisa por um socket local quando está pronto e em qual porta
+      (usa outra porta livre se a inicial estiver ocupada)
+    - Grava logs em 'launcher.log'
+    - Instância única: pergunta ao servidor já em execução (socket local de
+      controle, ver instance_client.py) sua porta e saúde e apenas abre o
+      navegador; a consulta leva no máximo 1,5 s
+    - Modo "manter servidor ativo": fechar a janela não encerra o servidor,
+      e o próximo launcher o reaproveita já aquecido
     - Encerra árvore de processos via psutil quando disponível, com fallback
     """
 
-    MAX_PORT_TRIES = 50
-    START_TIMEOUT = 5  # segundos para esperar o servidor responder
+    START_TIMEOUT = 120  # limite para o servidor avisar que está pronto (segundos)
 
-    def __init__(self, root):
+    def __init__(self, root, keep_warm=False):
         self.root = root
         self.root.title("Sistema de Controle de Caixa")
         self.root.geometry("400x330")
@@ -39,7 +52,7 @@ class SistemaCaixaLauncher:
         base = Path(__file__).parent
         self.base_dir = str(base)
         self.log_path = base / "launcher.log"
-        self.pid_path = base / "app.pid"
+        self.instance_path = instance_path()
 
         # Definir ícone da janela
         self.set_window_icon()
@@ -55,6 +68,7 @@ class SistemaCaixaLauncher:
         self.starting = False
         self.log_file = None
         self._extracted_app_path = None
+        self.keep_warm = tk.BooleanVar(value=keep_warm)
 
         # Configurar estilo
         self.setup_styles()
@@ -138,6 +152,13 @@ class SistemaCaixaLauncher:
         )
         self.close_button.pack(pady=5, fill=tk.X, padx=20)
 
+        keep_warm_check = ttk.Checkbutton(
+            button_frame,
+            text="Manter servidor ativo ao fechar a janela",
+            variable=self.keep_warm
+        )
+        keep_warm_check.pack(pady=5, padx=20)
+
         info_frame = ttk.Frame(main_frame)
         info_frame.pack(pady=10, fill=tk.X)
 
@@ -154,23 +175,12 @@ class SistemaCaixaLauncher:
     def open_github(self):
         webbrowser.open("https://github.com/santos-savio")
 
-    def is_port_available(self, port):
-        """Checa rapidamente se a porta parece livre fazendo bind local.
-        Ainda assim, podem ocorrer races; é apenas um filtro rápido."""
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                s.bind(('127.0.0.1', port))
-                return True
-        except OSError:
-            return False
-
     def start_application_threaded(self):
         """Inicia o processo em uma thread para não bloquear a UI"""
         if self.is_running or self.starting:
             return
 
-        # Verifica se já existe uma instância via pid
+        # Verifica se já existe uma instância respondendo no socket de controle
         if self.check_existing_instance():
             return
 
@@ -179,10 +189,10 @@ class SistemaCaixaLauncher:
         self.open_button.config(state='disabled')
         self.close_button.config(state='disabled')
 
-        t = threading.Thread(target=self._try_ports_and_start, daemon=True)
+        t = threading.Thread(target=self._start_server, daemon=True)
         t.start()
 
-    def _try_ports_and_start(self):
+    def _start_server(self):
         base_dir = self.base_dir
 
         # Criar arquivo de log (append) quando iniciar
@@ -197,86 +207,89 @@ class SistemaCaixaLauncher:
         if os.name == 'nt':
             creationflags = subprocess.CREATE_NEW_PROCESS_GROUP
 
-        tried = 0
-        for port in range(self.port, self.port + self.MAX_PORT_TRIES):
-            tried += 1
-
-            # Se parece ocupada, pule rapido
-            if not self.is_port_available(port):
-                continue
-
-            # Single-EXE: inicia o proprio executavel (frozen) ou o proprio script (dev) em modo servidor
-            if getattr(sys, 'frozen', False):
-                cmd = [
-                    sys.executable,
-                    '--server',
-                    '--host', '127.0.0.1',
-                    '--port', str(port),
-                    '--no-browser',
-                ]
-                cwd = base_dir
-            else:
-                script_path = os.path.abspath(__file__)
-                cmd = [
-                    sys.executable,
-                    script_path,
-                    '--server',
-                    '--host', '127.0.0.1',
-                    '--port', str(port),
-                    '--no-browser',
-                ]
-                cwd = base_dir
-
-            try:
-                proc = subprocess.Popen(
-                    cmd,
-                    cwd=cwd or base_dir,
-                    stdout=logf or subprocess.DEVNULL,
-                    stderr=logf or subprocess.DEVNULL,
-                    creationflags=creationflags
-                )
-                self.app_process = proc
-
-                # Esperar servidor
-                if self.wait_for_server(host='127.0.0.1', port=port, timeout=self.START_TIMEOUT):
-                    # Sucesso
-                    self.selected_port = port
-                    self.is_running = True
-                    self.starting = False
-                    try:
-                        self._write_pid(proc.pid, port)
-                    except Exception:
-                        pass
-
-                    self.root.after(0, lambda: self._on_started(port))
-                    return
-                else:
-                    # falhou: mata e tenta proxima
-                    self._terminate_proc(proc)
+        # Socket local em que o servidor avisa que está pronto (e em qual porta)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        notify_port = listener.getsockname()[1]
+
+        # Single-EXE: inicia o proprio executavel (frozen) ou o proprio script (dev) em modo servidor
+        cmd = [sys.executable]
+        if not getattr(sys, 'frozen', False):
+            cmd.append(os.path.abspath(__file__))
+        cmd += [
+            '--server',
+            '--host', '127.0.0.1',
+            '--port', str(self.port),
+            '--any-port',  # porta preferida ocupada: o sistema escolhe outra
+            '--notify-port', str(notify_port),
+            '--no-browser',
+        ]
+
+        error = None
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                cwd=base_dir,
+                stdout=logf or subprocess.DEVNULL,
+                stderr=logf or subprocess.DEVNULL,
+                creationflags=creationflags
+            )
+            self.app_process = proc
+
+            message = self.wait_for_ready(listener, proc, timeout=self.START_TIMEOUT)
+            if message.get('status') == 'ready':
+                port = message['port']
+                if message.get('existing'):
+                    # Outro launcher iniciou o servidor nesse meio tempo: adota-o
                     self.app_process = None
-                    continue
+                self.selected_port = port
+                self.is_running = True
+                self.starting = False
 
-            except Exception as e:
-                print(f"Erro ao tentar iniciar app em porta {port}: {e}")
-                continue
+                self.root.after(0, lambda: self._on_started(port))
+                return
+
+            error = message.get('error')
+            self._terminate_proc(proc)
+            self.app_process = None
+        except Exception as e:
+            error = str(e)
+            print(f"Erro ao iniciar app: {e}")
+        finally:
+            listener.close()
 
         # Se chegou aqui, não conseguiu iniciar
         self.starting = False
-        self.root.after(0, lambda: self.show_error("Nenhuma porta livre encontrada ou o servidor falhou ao iniciar. Verifique launcher.log para detalhes."))
-
-    def wait_for_server(self, host: str, port: int, timeout: int = 5) -> bool:
-        """Espera até o servidor aceitar conexão TCP"""
-        start = time.time()
-        while time.time() - start < timeout:
-            # Se iniciamos um processo e ele morreu, falhou
-            if self.app_process and self.app_process.poll() is not None:
-                return False
+        detail = f" ({error})" if error else ""
+        self.root.after(0, lambda: self.show_error(
+            f"O servidor falhou ao iniciar{detail}. Verifique launcher.log para detalhes."))
+
+    def wait_for_ready(self, listener, proc, timeout: int = 60) -> dict:
+        """Espera o aviso do servidor (uma linha JSON) no socket `listener`.
+
+        Retorna a mensagem recebida ({"status": "ready", "port": ...} ou
+        {"status": "error", ...}). O accept retorna assim que o servidor se
+        conecta; o timeout curto do socket serve apenas para perceber se o
+        processo morreu antes de avisar.
+        """
+        listener.settimeout(0.25)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
             try:
-                with socket.create_connection((host, port), timeout=0.5):
-                    return True
-            except OSError:
-                time.sleep(0.2)
-        return False
+                conn, _ = listener.accept()
+            except socket.timeout:
+                if proc.poll() is not None:
+                    return {'status': 'error', 'error': f'processo encerrado com codigo {proc.returncode}'}
+                continue
+            with conn:
+                conn.settimeout(5)
+                line = conn.makefile('rb').readline()
+            try:
+                return json.loads(line)
+            except ValueError:
+                return {'status': 'error', 'error': 'resposta invalida do servidor'}
+        return {'status': 'error', 'error': f'sem resposta em {timeout} s'}
 
     def _on_started(self, port: int):
         self.status_label.config(text="✅ Aplicacao rodando", style='Success.TLabel')
@@ -295,69 +308,17 @@ class SistemaCaixaLauncher:
         else:
             messagebox.showwarning("Aviso", "A aplicacao nao esta rodando!")
 
-    def _write_pid(self, pid: int, port: int):
-        try:
-            with open(self.pid_path, 'w') as f:
-                f.write(f"{pid}\n{port}\n")
-        except Exception as e:
-            print(f"Aviso: nao foi possivel gravar pid: {e}")
-
-    def _read_pid(self):
-        try:
-            with open(self.pid_path, 'r') as f:
-                parts = f.read().splitlines()
-                if not parts:
-                    return None, None
-                pid = int(parts[0])
-                port = int(parts[1]) if len(parts) > 1 else None
-                return pid, port
-        except Exception:
-            return None, None
-
-    def _remove_pid(self):
-        try:
-            if self.pid_path.exists():
-                self.pid_path.unlink()
-        except Exception:
-            pass
-
     def check_existing_instance(self) -> bool:
-        """Checa se ja existe instancia via arquivo PID. Se existir e estiver viva, adota-a."""
-        pid, port = self._read_pid()
-        if pid is None:
+        """Adota um servidor já em execução, se algum responder no socket de controle."""
+        info = query_instance(self.instance_path)
+        if not info:
             return False
 
-        # Se psutil disponível, verifica existência do processo
-        if psutil:
-            try:
-                if psutil.pid_exists(pid):
-                    p = psutil.Process(pid)
-                    if p.is_running():
-                        # Assume que é a mesma app; adota
-                        self.is_running = True
-                        self.selected_port = port
-                        self.root.after(0, lambda: self._on_started(port))
-                        return True
-            except Exception:
-                pass
-
-        # Fallback: tenta conectar na porta armazenada
-        if port:
-            try:
-                with socket.create_connection(('127.0.0.1', port), timeout=0.5):
-                    self.is_running = True
-                    self.selected_port = port
-                    self.root.after(0, lambda: self._on_started(port))
-                    return True
-            except Exception:
-                pass
-
-        # Se chegou aqui, o PID/porta não representam uma instância viva
-        try:
-            self._remove_pid()
-        except Exception:
-            pass
-        return False
+        port = info['port']
+        self.is_running = True
+        self.selected_port = port
+        self.root.after(0, lambda: self._on_started(port))
+        return True
 
     def _terminate_proc(self, proc: subprocess.Popen):
         """Tenta encerrar o processo e seus filhos; usa psutil se disponível."""
@@ -395,42 +356,14 @@ class SistemaCaixaLauncher:
             pass
 
     def stop_application(self, force: bool = False):
-        """Para a aplicação Flask (subprocess) usando PID se possível"""
-        # Se houver pid file, prioriza usar ele
-        pid, port = self._read_pid()
-        if pid:
-            # tenta encerrar processo externo
-            try:
-                if psutil and psutil.pid_exists(pid):
-                    p = psutil.Process(pid)
-                    try:
-                        children = p.children(recursive=True)
-                        for c in children:
-                            c.terminate()
-                        _, alive = psutil.wait_procs(children, timeout=3)
-                        for c in alive:
-                            c.kill()
-                        p.terminate()
-                        try:
-                            p.wait(timeout=3)
-                        except psutil.TimeoutExpired:
-                            p.kill()
-                    except psutil.NoSuchProcess:
-                        pass
-                else:
-                    # fallback: tenta sinalizar pelo pid
-                    try:
-                        os.kill(pid, signal.SIGTERM)
-                    except Exception:
-                        pass
-            except Exception as e:
-                print(f"Erro ao encerrar por pid: {e}")
-            finally:
-                self._remove_pid()
+        """Para a aplicação Flask pedindo o encerramento pelo socket de controle"""
+        query_instance(self.instance_path, 'shutdown')
 
-        # Se temos um processo criado por nós, tenta encerrar também
+        # Se temos um processo criado por nós, espera sair e, se preciso, força
         if self.app_process:
             try:
+                self.app_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
                 self._terminate_proc(self.app_process)
             except Exception:
                 pass
@@ -465,6 +398,13 @@ class SistemaCaixaLauncher:
 
     def on_closing(self):
         """Evento de fechamento da janela"""
+        if self.keep_warm.get() and self.is_running:
+            # Servidor continua ativo; o próximo launcher o reaproveita
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+            self.root.quit()
+            return
         if self.is_running or self.app_process:
             if messagebox.askyesno("Confirmar", "Deseja encerrar a aplicacao web?"):
                 self.stop_application(force=True)
@@ -485,27 +425,50 @@ class SistemaCaixaLauncher:
 
 def run_server(args):
     from app import create_app
+    from app.instance import ControlServer, InstanceLock, wait_for_instance
+    from app.server import notify_launcher, start_server
     import webbrowser as _webbrowser
 
-    app = create_app()
+    # Instância única: o lock fica com o primeiro servidor; os demais
+    # aguardam o arquivo da instância dele e informam a porta
+    lock = InstanceLock(instance_path())
+    if not lock.acquire():
+        existing = wait_for_instance(instance_path(), INSTANCE_WAIT_TIMEOUT)
+        if existing:
+            print(f"Servidor já em execução na porta {existing['port']} (pid {existing['pid']})", flush=True)
+            notify_launcher(args.notify_port, status='ready', port=existing['port'], pid=existing['pid'],
+                            existing=True)
+        else:
+            error = f'outro servidor detém {lock.path} mas não respondeu em {INSTANCE_WAIT_TIMEOUT} s'
+            print(f"Erro: {error}", flush=True)
+            notify_launcher(args.notify_port, status='error', error=error)
+        return
+
+    try:
+        try:
+            app = create_app()
+        except Exception as e:
+            notify_launcher(args.notify_port, status='error', error=str(e))
+            raise
 
-    if not args.no_browser:
-        def _open_browser():
-            time.sleep(1.0)
-            _webbrowser.open(f'http://{args.host}:{args.port}')
-        threading.Thread(target=_open_browser, daemon=True).start()
+        server = start_server(app, args)
+        control = ControlServer(app, server, instance_path()).start()
+        if not args.no_browser:
+            # O socket já está escutando: a conexão do navegador aguarda na fila
+            _webbrowser.open(f'http://{args.host}:{server.port}')
 
-    app.run(
-        debug=args.debug,
-        host=args.host,
-        port=args.port,
-        use_reloader=False,
-    )
+        print(f"Servidor {server.describe()}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            control.close()
+    finally:
+        lock.release()
 
 
-def run_gui():
+def run_gui(keep_warm=False):
     root = tk.Tk()
-    app = SistemaCaixaLauncher(root)
+    app = SistemaCaixaLauncher(root, keep_warm=keep_warm)
 
     try:
         root.mainloop()
@@ -514,8 +477,9 @@ def run_gui():
     except Exception as e:
         print(f"Erro na interface: {e}")
     finally:
-        # Garantir que todos os processos sejam encerrados
-        if 'app' in locals() and app.is_running:
+        # Garantir que todos os processos sejam encerrados (exceto no modo
+        # "manter servidor ativo")
+        if 'app' in locals() and app.is_running and not app.keep_warm.get():
             app.stop_application()
 
 
@@ -526,13 +490,18 @@ def main():
     parser.add_argument('--port', type=int, default=5001)
     parser.add_argument('--debug', action='store_true')
     parser.add_argument('--no-browser', action='store_true')
+    parser.add_argument('--keep-warm', action='store_true',
+                        default=os.environ.get('CAIXA_KEEP_WARM') == '1')
 
     args, _ = parser.parse_known_args()
 
     if args.server:
+        from app.server import add_server_arguments
+        add_server_arguments(parser)
+        args, _ = parser.parse_known_args()
         run_server(args)
     else:
-        run_gui()
+        run_gui(keep_warm=args.keep_warm)
 
 if __name__ == "__main__":
     main()
@@ -40,6 +40,7 @@ hiddenimports = [
     'flask_sqlalchemy',
     'flask_migrate',
     'werkzeug',
+    'waitress',
     'jinja2',
     'markupsafe',
     'sqlalchemy',
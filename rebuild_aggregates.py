@@ -0,0 +1,29 @@
+"""Script para recalcular as tabelas materializadas a partir dos lançamentos"""
+
+from app import create_app
+from app.models import db, PaymentMethod, PaymentMethodBalance, DailyRollup
+from app.money import from_cents
+
+def rebuild_aggregates(app=None):
+    """Recalcula saldos por método e agregados diários a partir dos lançamentos"""
+    app = app or create_app()
+
+    with app.app_context():
+        print("Recalculando saldos por método de pagamento...")
+        PaymentMethodBalance.rebuild()
+
+        balances = db.session.query(PaymentMethod.name, PaymentMethodBalance.balance_cents)\
+            .join(PaymentMethodBalance).order_by(PaymentMethod.id).all()
+        for name, balance_cents in balances:
+            print(f"  - {name}: R$ {from_cents(balance_cents):.2f}")
+
+        print("\nRecalculando agregados diários...")
+        DailyRollup.rebuild()
+        totais = DailyRollup.totals()
+        print(f"  - {totais['total_transacoes']} transações, vendas R$ {totais['total_vendas']:.2f}, "
+              f"sangrias R$ {totais['total_sangrias']:.2f}")
+
+        print("\n✅ Agregados recalculados com sucesso!")
+
+if __name__ == '__main__':
+    rebuild_aggregates()
@@ -1,8 +1,8 @@
 """Script para resetar completamente o banco de dados"""
 
 import os
-import sqlite3
 from app import create_app
+from app.db import init_db
 from app.models import db
 
 def reset_database():
@@ -16,15 +16,26 @@ def reset_database():
         print(f"Resetando banco de dados: {db_path}")
         
         # Fechar todas as conexões
-        db.session.close_all()
-        
-        # Remover arquivo do banco
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            print("Banco de dados removido")
-        
-        # Criar todas as tabelas novas
-        db.create_all()
+        db.session.remove()
+        db.engine.dispose()
+        
+        # Remover arquivo do banco (e os arquivos do WAL)
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        print("Banco de dados removido")
+        
+        # Os bancos de arquivo mensais pertencem ao banco removido
+        from app.archive import archive_dir
+        pasta_arquivo = archive_dir()
+        if os.path.isdir(pasta_arquivo):
+            for nome in os.listdir(pasta_arquivo):
+                if nome.startswith('caixa-') and nome.endswith(('.db', '.db-wal', '.db-shm')):
+                    os.remove(os.path.join(pasta_arquivo, nome))
+            print(f"Arquivos mensais removidos de {pasta_arquivo}")
+        
+        # Criar todas as tabelas novas (marcadas com a versão atual do esquema)
+        init_db(app)
         print("Novo banco de dados criado")
         
         # Importar e executar scripts de inicialização
@@ -32,10 +43,10 @@ def reset_database():
         from init_payment_methods import init_payment_methods
         
         print("\nInicializando configurações do sistema...")
-        init_system_config()
+        init_system_config(app)
         
         print("\nInicializando métodos de pagamento...")
-        init_payment_methods()
+        init_payment_methods(app)
         
         print("\n✅ Banco de dados resetado com sucesso!")
         print("📋 Configurações iniciais:")
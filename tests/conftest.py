@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.db import db
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Flask app bound to an isolated sqlite file inside tmp_path."""
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        TESTING = True
+
+    app = create_app(TestConfig)
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def consultas(app):
+    """Comandos SQL executados no banco de `app` durante ``fn()``: ``consultas(fn)``."""
+    with app.app_context():
+        engine = db.engine
+
+    def _consultas(fn):
+        statements = []
+
+        def _before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        try:
+            fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+        return statements
+    return _consultas
+
+
+def _venda(total, method_id=None, payments=None, descricao='Avulso', product_id=None, **extra):
+    venda = {
+        'total': total,
+        'items': [{'product_id': product_id, 'description': descricao, 'qty': 1,
+                   'unit_price': total, 'subtotal': total}],
+        'payments': payments or [{'payment_method_id': method_id, 'amount': total}],
+    }
+    venda.update(extra)
+    return venda
+
+
+@pytest.fixture
+def venda():
+    """JSON de uma venda de um item, paga com um só método (ou com `payments`).
+
+    ``venda(10, dinheiro)``; `descricao` e `product_id` vão para o item e os
+    demais argumentos (``date``, ``items``...) entram direto no JSON.
+    """
+    return _venda
+
+
+@pytest.fixture
+def vender():
+    """Registra uma venda montada por `venda` em POST /api/transaction.
+
+    ``vender(client, 10, dinheiro)``: confere o status 200 e devolve a resposta.
+    """
+    def _vender(client, *args, **kwargs):
+        resp = client.post('/api/transaction', json=_venda(*args, **kwargs))
+        assert resp.status_code == 200, resp.get_json()
+        return resp
+    return _vender
@@ -0,0 +1,127 @@
+import os
+from datetime import date
+
+from sqlalchemy import event
+
+from app.archive import MAX_ATTACHED, archive_closed_months, archive_path, archived_months
+from app.db import db
+from app.models import DailyRollup, PaymentMethod, PaymentMethodBalance, Transaction
+
+
+def _vendas(client, venda, method_id, datas):
+    resp = client.post('/api/transactions/batch', json=[
+        venda(10 + i, method_id, descricao=f'Item {i}', date=data) for i, data in enumerate(datas)
+    ])
+    assert resp.get_json()['inserted'] == len(datas)
+
+
+def _paginas(client, **filtros):
+    ids, cursor = [], None
+    while True:
+        params = dict(filtros, limite=4, **({'cursor': cursor} if cursor else {}))
+        pagina = client.get('/api/relatorios', query_string=params).get_json()
+        ids += [linha['id'] for linha in pagina['dados']]
+        cursor = pagina['next_cursor']
+        if not cursor:
+            return ids
+
+
+def _totais(app):
+    with app.app_context():
+        saldos = sorted((b.payment_method_id, b.total_sales_cents, b.balance_cents)
+                        for b in PaymentMethodBalance.query.all())
+        agregados = sorted((r.day, r.payment_method_id, r.product_id, r.sales_count, r.sales_total_cents,
+                            r.items_qty) for r in DailyRollup.query.all())
+        return saldos, agregados
+
+
+def test_archived_months_stay_in_reports(app, client, venda):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+    # 11 meses fechados (mais que MAX_ATTACHED) e os dois meses mantidos
+    meses = [f'2025-{mes:02d}' for mes in range(1, 13)] + ['2026-01']
+    _vendas(client, venda, dinheiro, [f'{mes}-{dia:02d}T12:00:00' for mes in meses for dia in (5, 20)])
+
+    periodo = {'data_inicio': '2025-03-15', 'data_fim': '2025-04-30'}
+    antes = {
+        'tudo': client.get('/api/relatorios').get_json(),
+        'periodo': client.get('/api/relatorios', query_string=periodo).get_json()['dados'],
+        'paginas': _paginas(client),
+        'produto': client.post('/api/relatorios', json={'produtos': ['custom_Item 3']}).get_json()['dados'],
+        'csv': client.get('/api/relatorios/export', query_string={'formato': 'csv'}).get_data(as_text=True),
+        'totais': _totais(app),
+        'produtos': client.get('/api/produtos-unicos').get_json(),
+    }
+
+    with app.app_context():
+        movidos = archive_closed_months(2, today=date(2026, 1, 15))
+        assert [mes for mes, _ in movidos] == meses[:11]
+        assert all(quantidade == 2 for _, quantidade in movidos)
+        assert Transaction.query.count() == 4
+        assert archived_months() == sorted(meses[:11], reverse=True)
+        assert all(os.path.exists(archive_path(mes)) for mes in meses[:11])
+        # Repetir não move nada
+        assert archive_closed_months(2, today=date(2026, 1, 15)) == []
+        db.session.remove()
+        db.engine.dispose()
+        engine = db.engine
+
+    # Período só com meses recentes: nenhum arquivo é anexado
+    anexos = []
+    listener = lambda conn, cursor, statement, *args: anexos.append(statement) if 'ATTACH' in statement else None
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        recentes = client.get('/api/relatorios', query_string={'data_inicio': '2025-12-01'}).get_json()['dados']
+        assert len(recentes) == 4 and not anexos
+        assert client.get('/api/relatorios', query_string=periodo).get_json()['dados'] == antes['periodo']
+        assert len(anexos) == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len(antes['tudo']['dados']) == 26 > 2 * MAX_ATTACHED
+    assert client.get('/api/relatorios').get_json() == antes['tudo']
+    assert _paginas(client) == antes['paginas']
+    produto = client.post('/api/relatorios', json={'produtos': ['custom_Item 3']}).get_json()['dados']
+    assert len(produto) == 1 and produto == antes['produto']
+    assert client.get('/api/relatorios', query_string={'stream': 1}).get_json()['dados'] == antes['tudo']['dados']
+    assert client.get('/api/relatorios/export', query_string={'formato': 'csv'}).get_data(as_text=True) == antes['csv']
+    # Filtro de produtos do relatório continua listando os itens dos meses arquivados
+    assert client.get('/api/produtos-unicos').get_json() == antes['produtos']
+    assert sum(p['type'] == 'personalizado' for p in antes['produtos']) == 26
+
+    # Saldos e agregados recalculados incluem os meses arquivados
+    with app.app_context():
+        PaymentMethodBalance.rebuild()
+        DailyRollup.rebuild()
+    assert _totais(app) == antes['totais']
+
+
+def test_month_archived_by_another_process_is_seen_by_the_server(app, client, venda):
+    import subprocess
+    import sys
+
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        banco = db.engine.url.database
+    _vendas(client, venda, dinheiro, ['2024-01-05T12:00:00', '2024-01-20T12:00:00', '2024-03-01T12:00:00'])
+    janeiro = {'data_inicio': '2024-01-01', 'data_fim': '2024-01-31'}
+    # Registro de meses e relatório ficam em cache no servidor
+    antes = client.get('/api/relatorios', query_string=janeiro).get_json()
+    assert len(antes['dados']) == 2
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    codigo = (
+        "from app import create_app; from app.archive import archive_month; from config import Config\n"
+        f"class C(Config): SQLALCHEMY_DATABASE_URI = 'sqlite:///{banco}'\n"
+        "app = create_app(C)\n"
+        "with app.app_context(): print(archive_month('2024-01'))\n"
+    )
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip().splitlines()[-1] == '2'
+
+    with app.app_context():
+        assert archived_months() == ['2024-01']
+        assert Transaction.query.count() == 1
+    # Consulta ainda fora do cache de relatórios lê o mês no arquivo
+    depois = client.get('/api/relatorios', query_string=dict(janeiro, tipo='venda')).get_json()
+    assert depois['dados'] == antes['dados']
@@ -0,0 +1,111 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import db
+from app.db_backup import (BackupError, create_backup, database_path, list_backups, restore_backup,
+                           rotate_backups, verify_backup)
+from app.models import PaymentMethod, Transaction
+
+
+def test_backup_while_writing_and_restore(app, client, tmp_path, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        db_path = database_path(app.config['SQLALCHEMY_DATABASE_URI'])
+    for _ in range(20):
+        vender(client, 10, dinheiro)
+
+    # Vendas continuam sendo gravadas durante a cópia (uma página por etapa)
+    gravadas = []
+    parar = threading.Event()
+
+    def _caixa():
+        cliente = app.test_client()
+        while not parar.is_set():
+            vender(cliente, 10, dinheiro)
+            gravadas.append(1)
+
+    caixa = threading.Thread(target=_caixa)
+    caixa.start()
+    try:
+        result = create_backup(db_path, str(tmp_path / 'backups'), pages=1, pause=0.001)
+    finally:
+        parar.set()
+        caixa.join()
+
+    assert gravadas
+    assert result.path.endswith('.db.gz')
+    verify_backup(result.path)
+
+    with app.app_context():
+        copiadas = Transaction.query.count()
+        db.session.remove()
+        db.engine.dispose()
+
+    anterior = restore_backup(result.path, db_path)
+    assert os.path.exists(anterior)
+    with app.app_context():
+        assert 20 <= Transaction.query.count() <= copiadas
+
+
+def test_rotation_keeps_last_and_one_per_day(tmp_path):
+    agora = datetime(2026, 3, 10, 18, 0, 0)
+    for horas in range(0, 24 * 5, 6):  # 4 backups por dia, 5 dias
+        nome = f"caixa-{(agora - timedelta(hours=horas)):%Y%m%d-%H%M%S}.db.gz"
+        (tmp_path / nome).write_bytes(b'')
+    (tmp_path / 'outro-arquivo.txt').write_text('x')
+
+    removidos = rotate_backups(str(tmp_path), keep_last=3, keep_daily=4)
+
+    restantes = [stamp for stamp, _ in list_backups(str(tmp_path))]
+    assert len(removidos) == 20 - len(restantes)
+    assert restantes[:3] == [agora, agora - timedelta(hours=6), agora - timedelta(hours=12)]
+    assert len({stamp.date() for stamp in restantes}) == 4
+    assert (tmp_path / 'outro-arquivo.txt').exists()
+
+
+def test_corrupted_backup_is_rejected(tmp_path):
+    ruim = tmp_path / 'caixa-20260101-000000.db'
+    ruim.write_bytes(b'isto nao e um banco sqlite' * 100)
+    with pytest.raises(BackupError):
+        verify_backup(str(ruim))
+    with pytest.raises(BackupError):
+        restore_backup(str(ruim), str(tmp_path / 'caixa.db'))
+    assert not (tmp_path / 'caixa.db').exists()
+
+
+def test_backup_includes_archive_databases(app, client, tmp_path, venda):
+    from datetime import date
+
+    from app.archive import archive_closed_months, archive_dir, archive_path
+
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        db_path = database_path(app.config['SQLALCHEMY_DATABASE_URI'])
+    client.post('/api/transactions/batch', json=[
+        venda(10, dinheiro, date=data) for data in ('2025-01-10T12:00:00', '2025-02-10T12:00:00', '2025-03-10T12:00:00')
+    ])
+    with app.app_context():
+        assert [mes for mes, _ in archive_closed_months(1, today=date(2025, 3, 15))] == ['2025-01', '2025-02']
+        arquivos = [archive_path('2025-01'), archive_path('2025-02')]
+        pasta = archive_dir()
+    antes = client.get('/api/relatorios').get_json()['dados']
+
+    result = create_backup(db_path, str(tmp_path / 'backups'))
+    assert [os.path.basename(p) for p in result.archives] == ['caixa-2025-01.db.gz', 'caixa-2025-02.db.gz']
+    verify_backup(result.path)
+
+    # Arquivo mensal perdido: a restauração o traz de volta junto com o banco
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(arquivos[0])
+    restore_backup(result.path, db_path, pasta)
+    assert all(os.path.exists(p) for p in arquivos)
+    assert client.get('/api/relatorios').get_json()['dados'] == antes
+
+    # A rotação remove as cópias dos arquivos junto com o backup
+    rotate_backups(str(tmp_path / 'backups'), keep_last=0, keep_daily=0)
+    assert os.listdir(tmp_path / 'backups') == []
@@ -0,0 +1,42 @@
+from app.db import db
+from app.models import PaymentMethod, PaymentMethodBalance
+
+
+def test_ledger_tracks_sales_and_sangrias(app, client, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        pix = PaymentMethod.get_by_code('pix').id
+
+    vender(client, 150, payments=[
+        {'payment_method_id': dinheiro, 'amount': 100},
+        {'payment_method_id': pix, 'amount': 50},
+    ])
+
+    resp = client.post('/api/retirada', json={'valor': 30, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+    assert resp.status_code == 200
+    assert resp.get_json()['saldo_anterior'] == 100
+    assert resp.get_json()['saldo_novo'] == 70
+
+    resp = client.post('/api/retirada', json={'valor': 80, 'motivo': 'Excesso', 'payment_method_id': dinheiro})
+    assert resp.status_code == 400
+
+    balances = {b['code']: b for b in client.get('/api/balances').get_json()['balances']}
+    assert balances['dinheiro']['total_sales'] == 100
+    assert balances['dinheiro']['total_sangrias'] == 30
+    assert balances['dinheiro']['balance'] == 70
+    assert balances['pix']['balance'] == 50
+
+
+def test_rebuild_matches_incremental_ledger(app, client, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    vender(client, 10.1, dinheiro)
+    vender(client, 20.2, dinheiro)
+    client.post('/api/retirada', json={'valor': 5.05, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+
+    with app.app_context():
+        incremental = PaymentMethodBalance.get_balance_cents(dinheiro)
+        PaymentMethodBalance.rebuild()
+        db.session.expire_all()
+        assert PaymentMethodBalance.get_balance_cents(dinheiro) == incremental == 2525
@@ -0,0 +1,108 @@
+from app.db import db
+from app.models import DailyRollup, PaymentMethod, PaymentMethodBalance, Transaction, TransactionItem
+
+
+def test_batch_inserts_valid_records_and_reports_errors(app, client, monkeypatch, venda):
+    monkeypatch.setattr('app.routes.TRANSACOES_LOTE_COMMIT', 2)
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    produto_inexistente = venda(5, dinheiro, product_id=9999)
+
+    resp = client.post('/api/transactions/batch', json={'transactions': [
+        venda(10.1, dinheiro, date='2024-03-01T10:00:00'),
+        venda(20, dinheiro, payments=[{'payment_method_id': dinheiro, 'amount': 19}]),  # total divergente
+        venda('3,30', dinheiro),
+        produto_inexistente,  # rejeitado pelo banco (chave estrangeira)
+        venda(7, 999),  # método inexistente
+        venda(4, dinheiro),
+    ]})
+    data = resp.get_json()
+
+    assert resp.status_code == 200
+    assert (data['inserted'], data['failed']) == (3, 3)
+    assert [erro['index'] for erro in data['errors']] == [1, 3, 4]
+    assert data['errors'][0]['error'] == 'Total dos pagamentos não corresponde ao total da transação'
+    assert [i for i, tid in enumerate(data['transaction_ids']) if tid] == [0, 2, 5]
+
+    with app.app_context():
+        primeira = db.session.get(Transaction, data['transaction_ids'][0])
+        assert primeira.date.isoformat() == '2024-03-01T10:00:00'
+        assert primeira.total_cents == 1010
+        assert TransactionItem.query.count() == 3
+
+        assert PaymentMethodBalance.get_balance_cents(dinheiro) == 1010 + 330 + 400
+        incremental = DailyRollup.totals()
+        DailyRollup.rebuild()
+        assert DailyRollup.totals() == incremental
+
+
+def test_batch_rejects_non_list_body(client):
+    assert client.post('/api/transactions/batch', json={'transactions': 'x'}).status_code == 400
+
+
+def test_single_sale_statement_count_does_not_grow_with_lines(app, client, consultas):
+    with app.app_context():
+        methods = [m.id for m in PaymentMethod.get_active_methods()][:3]
+
+    def _venda_com(linhas):
+        return {
+            'total': 30 * linhas,
+            'items': [{'description': f'Item {i}', 'qty': 1, 'unit_price': 30, 'subtotal': 30}
+                      for i in range(linhas)],
+            'payments': [{'payment_method_id': m, 'amount': 10 * linhas} for m in methods],
+        }
+
+    def _count(dados):
+        return len(consultas(lambda: client.post('/api/transaction', json=dados)))
+
+    _count(_venda_com(1))  # aquece caches
+    assert _count(_venda_com(1)) == _count(_venda_com(10))
+
+
+def test_batch_converts_dates_with_offset_to_utc(app, client, venda):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    resp = client.post('/api/transactions/batch', json=[
+        venda(10, dinheiro, date='2025-03-01T10:00:00+02:00'),
+        venda(10, dinheiro, date='2025-03-31T23:30:00-03:00'),  # já é abril em UTC
+    ])
+    ids = resp.get_json()['transaction_ids']
+
+    with app.app_context():
+        datas = [db.session.get(Transaction, i).date.isoformat() for i in ids]
+        assert datas == ['2025-03-01T08:00:00', '2025-04-01T02:30:00']
+        assert {r.day.isoformat() for r in DailyRollup.query.filter(DailyRollup.sales_count > 0)} \
+            == {'2025-03-01', '2025-04-01'}
+
+
+def test_batch_fallback_ids_stay_aligned_when_a_commit_fails(app, client, monkeypatch, venda):
+    from sqlalchemy.exc import OperationalError
+
+    monkeypatch.setattr('app.routes.TRANSACOES_LOTE_COMMIT', 4)
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+    produto_inexistente = venda(5, dinheiro, product_id=9999)
+
+    # O bloco e o registro 0 falham no insert; o segundo commit (registro 2) falha
+    commit = db.session.commit
+    chamadas = []
+
+    def _commit():
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise OperationalError('COMMIT', {}, Exception('disk I/O error'))
+        return commit()
+
+    monkeypatch.setattr(db.session, 'commit', _commit)
+    resp = client.post('/api/transactions/batch', json=[
+        produto_inexistente, venda(1, dinheiro), venda(2, dinheiro), venda(3, dinheiro),
+    ])
+    data = resp.get_json()
+
+    assert [erro['index'] for erro in data['errors']] == [0, 2]
+    ids = data['transaction_ids']
+    assert ids[0] is None and ids[2] is None
+    with app.app_context():
+        assert [db.session.get(Transaction, ids[i]).total_cents for i in (1, 3)] == [100, 300]
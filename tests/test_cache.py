@@ -0,0 +1,90 @@
+from app.db import db
+from app.models import PaymentMethod, SystemConfig
+
+
+def test_pin_lookups_are_cached_and_invalidated_on_write(app, client, consultas):
+    client.get('/api/pin')
+    hits = client.get('/api/cache/stats').get_json()['caches']['system_config']['hits']
+
+    statements = consultas(lambda: client.post('/api/pin/verify', json={'pin': '1234'}))
+    assert not any('system_config' in s for s in statements)
+    assert client.get('/api/cache/stats').get_json()['caches']['system_config']['hits'] == hits + 1
+
+    assert client.post('/api/pin', json={'pin': '4321'}).status_code == 200
+    assert client.get('/api/pin').get_json()['pin'] == '4321'
+    assert client.post('/api/pin/verify', json={'pin': '1234'}).status_code == 401
+
+
+def test_payment_methods_cache_follows_commits(app, client, consultas):
+    client.get('/api/payment-methods')
+    statements = consultas(lambda: client.get('/api/payment-methods'))
+    assert not any('payment_methods' in s for s in statements)
+
+    client.post('/api/payment-methods', json={'name': 'Vale', 'code': 'vale'})
+    assert 'vale' in [m['code'] for m in client.get('/api/payment-methods').get_json()]
+
+    # Alterações feitas por qualquer commit da sessão também invalidam o cache
+    with app.app_context():
+        method = PaymentMethod.query.filter_by(code='vale').first()
+        method.active = False
+        db.session.commit()
+        assert PaymentMethod.get_by_code('vale') is None
+        assert SystemConfig.get_value('inexistente', 'padrao') == 'padrao'
+
+
+def test_lookup_loaded_during_invalidation_is_not_kept():
+    from app.cache import LookupCache
+
+    cache = LookupCache('teste-geracao')
+    valores = iter(['antigo', 'novo'])
+
+    def _carregar_com_commit_concorrente():
+        valor = next(valores)
+        cache.clear()  # outra requisição grava e invalida durante a leitura
+        return valor
+
+    assert cache.get('chave', _carregar_com_commit_concorrente) == 'antigo'
+    assert cache.get('chave', lambda: next(valores)) == 'novo'
+    assert cache.get('chave', lambda: 'nao chamado') == 'novo'
+
+
+def test_report_cache_invalidates_only_affected_ranges(app, client, venda):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    def _vendas(*datas):
+        client.post('/api/transactions/batch', json=[venda(10, dinheiro, date=data) for data in datas])
+
+    def _relatorio(**params):
+        resp = client.get('/api/relatorios', query_string=params)
+        return resp.headers['X-Cache'], len(resp.get_json()['dados'])
+
+    inicial = client.get('/api/cache/stats').get_json()['caches']['relatorios']
+    janeiro = {'data_inicio': '2025-01-01', 'data_fim': '2025-01-31'}
+    fevereiro = {'data_inicio': '2025-02-01', 'data_fim': '2025-02-28'}
+    _vendas('2025-01-10T12:00:00', '2025-02-10T12:00:00')
+
+    assert _relatorio(**janeiro) == ('MISS', 1)
+    assert _relatorio(**janeiro) == ('HIT', 1)
+    assert _relatorio(**fevereiro) == ('MISS', 1)
+    assert _relatorio() == ('MISS', 2)
+
+    # Venda em fevereiro: só os relatórios que incluem a data são descartados
+    _vendas('2025-02-15T12:00:00')
+    assert _relatorio(**janeiro) == ('HIT', 1)
+    assert _relatorio(**fevereiro) == ('MISS', 2)
+    assert _relatorio() == ('MISS', 3)
+
+    # Sangria (data atual) descarta o relatório sem período
+    client.post('/api/retirada', json={'valor': 5, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+    assert _relatorio(**fevereiro) == ('HIT', 2)
+    assert _relatorio() == ('MISS', 4)
+
+    # Mesmos produtos em outra ordem usam a mesma entrada
+    client.get('/api/relatorios', query_string={'produto': ['custom_A', 'custom_B']})
+    assert client.get('/api/relatorios', query_string={'produto': ['custom_B', 'custom_A']}).headers['X-Cache'] == 'HIT'
+
+    stats = client.get('/api/cache/stats').get_json()['caches']['relatorios']
+    assert stats['entries'] == 4 and stats['bytes'] > 0
+    assert stats['hits'] - inicial['hits'] == 4
+    assert stats['invalidations'] - inicial['invalidations'] == 3
@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from app.compression import page_cache
+from app.models import PaymentMethod
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_pages_precompressed_once_per_product_version(app, client):
+    normal = client.get('/relatorios')
+    assert normal.headers.get('Content-Encoding') is None
+
+    resp = client.get('/relatorios', headers=GZIP)
+    assert resp.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in resp.headers['Vary']
+    assert gzip.decompress(resp.data) == normal.data
+    assert len(resp.data) < len(normal.data) / 3
+    assert client.get('/relatorios', headers=dict(GZIP, **{'If-None-Match': resp.headers['ETag']})).status_code == 304
+
+    # Página inicial: mesma página até um produto mudar
+    antes = page_cache.stats()
+    client.get('/', headers=GZIP)
+    client.get('/', headers=GZIP)
+    assert page_cache.stats()['misses'] - antes['misses'] == 1
+    client.post('/api/produtos', json={'name': 'Produto Novo', 'price': 12})
+    assert 'Produto Novo' in gzip.decompress(client.get('/', headers=GZIP).data).decode()
+
+
+def test_json_compressed_above_threshold(app, client, venda):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+    client.post('/api/transactions/batch', json=[venda(10, dinheiro, descricao=f'Item {i}') for i in range(30)])
+
+    normal = client.get('/api/relatorios')
+    assert normal.headers.get('Content-Encoding') is None
+    miss = client.get('/api/relatorios', headers=GZIP)
+    hit = client.get('/api/relatorios', headers=GZIP)
+    assert (miss.headers['X-Cache'], hit.headers['X-Cache']) == ('HIT', 'HIT')
+    assert miss.headers['Content-Encoding'] == hit.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(miss.data) == gzip.decompress(hit.data) == normal.data
+    primeira = client.get('/api/relatorios', query_string={'tipo': 'venda'}, headers=GZIP)
+    assert (primeira.headers['X-Cache'], primeira.headers['Content-Encoding']) == ('MISS', 'gzip')
+    assert len(json.loads(gzip.decompress(primeira.data))['dados']) == 30
+
+    # Resposta com ETag: fica fraca, e o 304 continua funcionando
+    resp = client.get('/api/produtos-unicos', headers=GZIP)
+    assert resp.headers['Content-Encoding'] == 'gzip' and resp.headers['ETag'].startswith('W/')
+    assert sum(p['type'] == 'personalizado' for p in json.loads(gzip.decompress(resp.data))) == 30
+    assert client.get('/api/produtos-unicos',
+                      headers=dict(GZIP, **{'If-None-Match': resp.headers['ETag']})).status_code == 304
+
+    # Pequenas e em streaming: sem compressão
+    assert client.get('/api/saldo-caixa', headers=GZIP).headers.get('Content-Encoding') is None
+    stream = client.get('/api/relatorios', query_string={'stream': 1}, headers=GZIP)
+    assert stream.headers.get('Content-Encoding') is None
+    assert len(json.loads(stream.data)['dados']) == 30
@@ -0,0 +1,24 @@
+def test_catalog_endpoints_answer_304_until_a_write(app, client):
+    first = client.get('/api/produtos')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+
+    again = client.get('/api/produtos', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    client.post('/api/produtos', json={'name': 'Retorno', 'price': 30})
+    changed = client.get('/api/produtos', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert 'Retorno' in [p['name'] for p in changed.get_json()]
+
+
+def test_balances_etag_changes_after_sale(app, client, vender):
+    etag = client.get('/api/balances').headers['ETag']
+    assert client.get('/api/balances', headers={'If-None-Match': etag}).status_code == 304
+
+    vender(client, 10, 1)
+    resp = client.get('/api/balances', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['balances'][0]['balance'] == 10
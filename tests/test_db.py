@@ -6,6 +6,7 @@ import pytest
 from app import create_app
 from app.db import db, init_db
 from app.models import Client, Product, Transaction, TransactionItem
+from config import Config
 
 
 @pytest.fixture
@@ -15,16 +16,20 @@ def app_tmp_dir(tmp_path, monkeypatch):
     instance_path.mkdir()
     # configure app to use a sqlite db in tmp instance
     monkeypatch.setenv("FLASK_ENV", "testing")
-    app = create_app()
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{instance_path / 'test.db'}"
-    app.config["TESTING"] = True
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{instance_path / 'test.db'}"
+        TESTING = True
+
+    app = create_app(TestConfig)
 
     # initialize DB
     init_db(app)
     yield app
 
     # cleanup
-    db.session.remove()
+    with app.app_context():
+        db.session.remove()
 
 
 def test_create_and_query_client(app_tmp_dir):
@@ -40,17 +45,50 @@ def test_create_and_query_client(app_tmp_dir):
 def test_transaction_with_item(app_tmp_dir):
     app = app_tmp_dir
     with app.app_context():
-        product = Product(name="Service A", price=100)
+        product = Product(name="Service A", price_cents=10000)
         db.session.add(product)
         db.session.commit()
 
-        tx = Transaction(total=100)
+        tx = Transaction(total_cents=10000)
         db.session.add(tx)
         db.session.commit()
 
-        item = TransactionItem(transaction_id=tx.id, product_id=product.id, qty=1, unit_price=100, subtotal=100)
+        item = TransactionItem(transaction_id=tx.id, product_id=product.id, qty=1, unit_price_cents=10000, subtotal_cents=10000)
         db.session.add(item)
         db.session.commit()
 
         tx_db = Transaction.query.get(tx.id)
         assert len(tx_db.items) == 1
+
+
+@pytest.mark.parametrize('profile, synchronous', [('safe', 2), ('balanced', 1), ('fast', 0)])
+def test_sqlite_profile_pragmas_are_applied(tmp_path, profile, synchronous):
+    from app.db import SQLITE_PROFILES, sqlite_pragmas
+
+    class ProfileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'perfil.db'}"
+        SQLITE_PROFILE = profile
+        TESTING = True
+
+    app = create_app(ProfileConfig)
+    with app.app_context():
+        pragmas = sqlite_pragmas(db.engine)
+        esperado = SQLITE_PROFILES[profile]
+        assert pragmas['journal_mode'] == 'wal'
+        assert pragmas['synchronous'] == synchronous
+        assert pragmas['cache_size'] == esperado['cache_size']
+        assert pragmas['busy_timeout'] == esperado['busy_timeout']
+        assert pragmas['wal_autocheckpoint'] == esperado['wal_autocheckpoint']
+        assert pragmas['foreign_keys'] == 1
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_unknown_sqlite_profile_is_rejected(tmp_path):
+    class ProfileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'perfil.db'}"
+        SQLITE_PROFILE = 'turbo'
+        TESTING = True
+
+    with pytest.raises(ValueError):
+        create_app(ProfileConfig)
@@ -0,0 +1,40 @@
+import json
+
+from app.models import PaymentMethod
+from app.routes import eventos_resumo
+
+
+def _evento(chunk):
+    campos = dict(linha.split(': ', 1) for linha in chunk.decode().strip().splitlines())
+    return campos['event'], json.loads(campos['data'])
+
+
+def test_resumo_stream_pushes_sales_and_sangrias(app, client, vender):
+    eventos_resumo.configure(max_subscribers=1, heartbeat=0.05)
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    resp = client.get('/api/resumo/stream', buffered=False)
+    assert resp.status_code == 200 and resp.mimetype == 'text/event-stream'
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b'retry:')
+
+    # Limite de painéis conectados
+    assert client.get('/api/resumo/stream').status_code == 503
+
+    vender(client, 25, dinheiro, descricao='Taxa')
+    client.post('/api/retirada', json={'valor': 5, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+
+    evento, venda = _evento(next(chunks))
+    assert (evento, venda['produto'], venda['valor']) == ('venda', 'Taxa', 25)
+    evento, sangria = _evento(next(chunks))
+    assert (evento, sangria['cliente'], sangria['valor']) == ('sangria', 'SANGRIA', -5)
+
+    # Sem eventos: heartbeat
+    assert next(chunks) == b': ping\n\n'
+
+    resp.close()
+    assert eventos_resumo.subscribers == 0
+    segunda = client.get('/api/resumo/stream', buffered=False)
+    assert segunda.status_code == 200
+    segunda.close()
@@ -0,0 +1,136 @@
+import json
+import os
+import socket
+import threading
+
+from app.instance import ControlServer, query_instance
+from app.models import PaymentMethod
+
+
+class _FakeServer:
+    port = 5123
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def test_status_and_shutdown(app, tmp_path):
+    path = str(tmp_path / 'instance.json')
+    server = _FakeServer()
+    control = ControlServer(app, server, path).start()
+    try:
+        status = query_instance(path)
+        assert status['port'] == 5123 and status['database'] == 'ok'
+
+        assert query_instance(path, 'shutdown')['ok'] is True
+        assert server.closed.wait(2)
+        # O arquivo da instância sai junto com o servidor
+        assert query_instance(path) is None
+    finally:
+        control.close()
+
+
+def test_invalidate_drops_caches_and_changes_etags(app, client, tmp_path):
+    path = str(tmp_path / 'instance.json')
+    control = ControlServer(app, _FakeServer(), path).start()
+    try:
+        etag = client.get('/api/produtos-unicos').headers['ETag']
+        with app.app_context():
+            PaymentMethod.get_active_methods()
+        assert PaymentMethod._cache.stats()['entries']
+
+        assert query_instance(path, 'invalidate')['ok'] is True
+        assert not PaymentMethod._cache.stats()['entries']
+        assert client.get('/api/produtos-unicos', headers={'If-None-Match': etag}).status_code == 200
+    finally:
+        control.close()
+
+
+def test_stale_file_and_wrong_token_are_not_an_instance(app, tmp_path):
+    path = tmp_path / 'instance.json'
+
+    livre = socket.socket()
+    livre.bind(('127.0.0.1', 0))
+    porta_livre = livre.getsockname()[1]
+    livre.close()
+    path.write_text(json.dumps({'pid': 1, 'port': 5001, 'control_port': porta_livre, 'token': 'x'}))
+    assert query_instance(str(path)) is None
+
+    control = ControlServer(app, _FakeServer(), str(path)).start()
+    try:
+        info = json.loads(path.read_text())
+        path.write_text(json.dumps(dict(info, token='outro')))
+        assert query_instance(str(path)) is None
+    finally:
+        control.close()
+
+
+def test_launcher_gui_path_does_not_import_the_app_package():
+    import subprocess
+    import sys
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    codigo = ("import sys, launcher; "
+              "print(sorted(m for m in ('app', 'flask', 'sqlalchemy', 'waitress') if m in sys.modules))")
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == '[]'
+
+
+def test_instance_lock_is_exclusive(tmp_path):
+    from app.instance import InstanceLock
+
+    path = str(tmp_path / 'dados' / 'instance.json')
+    primeiro, segundo = InstanceLock(path), InstanceLock(path)
+    assert primeiro.acquire()
+    try:
+        assert not segundo.acquire()
+    finally:
+        primeiro.release()
+    assert segundo.acquire()
+    segundo.release()
+
+
+def test_second_server_waits_for_the_lock_holder(app, tmp_path, monkeypatch):
+    import argparse
+
+    import config
+    import launcher
+    from app.instance import InstanceLock
+    from app.server import add_server_arguments
+
+    monkeypatch.setattr(config.Config, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(launcher, 'INSTANCE_WAIT_TIMEOUT', 5)
+    path = launcher.instance_path()
+
+    avisos = socket.socket()
+    avisos.bind(('127.0.0.1', 0))
+    avisos.listen(1)
+    avisos.settimeout(10)
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser)
+    args = parser.parse_args(['--notify-port', str(avisos.getsockname()[1])])
+
+    # O primeiro servidor pegou o lock e ainda está criando o app
+    dono = InstanceLock(path)
+    assert dono.acquire()
+    control = None
+
+    def _publicar():
+        nonlocal control
+        control = ControlServer(app, _FakeServer(), path).start()
+
+    threading.Timer(0.5, _publicar).start()
+    try:
+        launcher.run_server(args)
+        conn, _ = avisos.accept()
+        with conn:
+            aviso = json.loads(conn.makefile('rb').readline())
+        assert aviso['status'] == 'ready' and aviso['existing'] is True and aviso['port'] == 5123
+    finally:
+        avisos.close()
+        if control:
+            control.close()
+        dono.release()
@@ -0,0 +1,148 @@
+import sqlite3
+
+from app import create_app
+from app.db import db
+from app.migrations import SCHEMA_VERSION, get_schema_version
+from app.models import DailyRollup, PaymentMethodBalance, Product, Transaction
+from config import Config
+
+# Esquema da primeira versão publicada (valores em reais, sem `kind` e sem
+# índices em chaves estrangeiras)
+BASELINE_SCHEMA = """
+CREATE TABLE clients (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, phone VARCHAR(50),
+    email VARCHAR(255), notes TEXT, created_at DATETIME);
+CREATE INDEX ix_clients_name ON clients (name);
+CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, price NUMERIC(10, 2) NOT NULL,
+    type VARCHAR(50), active BOOLEAN);
+CREATE INDEX ix_products_name ON products (name);
+CREATE TABLE transactions (id INTEGER PRIMARY KEY, date DATETIME, client_id INTEGER REFERENCES clients (id),
+    total NUMERIC(12, 2) NOT NULL, notes TEXT);
+CREATE INDEX ix_transactions_date ON transactions (date);
+CREATE TABLE transaction_items (id INTEGER PRIMARY KEY,
+    transaction_id INTEGER NOT NULL REFERENCES transactions (id), product_id INTEGER REFERENCES products (id),
+    description VARCHAR(255), qty INTEGER NOT NULL, unit_price NUMERIC(10, 2) NOT NULL,
+    subtotal NUMERIC(12, 2) NOT NULL);
+CREATE TABLE system_config (id INTEGER PRIMARY KEY, key VARCHAR(100) NOT NULL UNIQUE, value TEXT,
+    description TEXT, created_at DATETIME, updated_at DATETIME);
+CREATE UNIQUE INDEX ix_system_config_key ON system_config (key);
+CREATE TABLE payment_methods (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE,
+    code VARCHAR(20) NOT NULL UNIQUE, description VARCHAR(100), active BOOLEAN, color VARCHAR(7),
+    created_at DATETIME);
+CREATE TABLE payments (id INTEGER PRIMARY KEY, transaction_id INTEGER NOT NULL REFERENCES transactions (id),
+    payment_method_id INTEGER NOT NULL REFERENCES payment_methods (id), amount NUMERIC(10, 2) NOT NULL,
+    created_at DATETIME);
+
+INSERT INTO products (id, name, price, active) VALUES (1, 'Consulta', 50.1, 1);
+INSERT INTO payment_methods (id, name, code, active) VALUES (1, 'Dinheiro', 'dinheiro', 1);
+INSERT INTO transactions (id, date, total, notes) VALUES
+    (1, '2025-01-01 10:00:00', 100.2, ''),
+    (2, '2025-01-01 11:00:00', -10.1, 'SANGRIA: Troco [Dinheiro]'),
+    (3, '2025-01-02 09:00:00', -5, 'RETIRADA: Antiga');
+INSERT INTO transaction_items (transaction_id, product_id, description, qty, unit_price, subtotal) VALUES
+    (1, 1, 'Consulta', 2, 50.1, 100.2);
+INSERT INTO payments (transaction_id, payment_method_id, amount) VALUES (1, 1, 100.2), (2, 1, -10.1), (3, 1, -5);
+"""
+
+
+def test_baseline_database_is_upgraded_on_startup(tmp_path):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+
+    class LegacyConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        TESTING = True
+
+    app = create_app(LegacyConfig)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION
+            indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list('payments')")}
+            assert {'ix_payments_transaction_id', 'ix_payments_method_amount'} <= indexes
+
+        assert db.session.get(Product, 1).price_cents == 5010
+        assert [(t.kind, t.total_cents) for t in Transaction.query.order_by(Transaction.id)] == [
+            ('venda', 10020), ('sangria', -1010), ('sangria', -500)]
+
+        # Derivadas recalculadas a partir dos valores convertidos
+        assert PaymentMethodBalance.get_balance_cents(1) == 10020 - 1010 - 500
+        totais = DailyRollup.totals()
+        assert (totais['qtd_vendas'], totais['total_vendas']) == (1, 100.2)
+        assert (totais['qtd_sangrias'], totais['total_sangrias']) == (2, 15.1)
+
+        # Página inicial lista os produtos com o preço em reais
+        assert 'Consulta - R$ 50.10' in app.test_client().get('/').get_data(as_text=True)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    # Um segundo startup não reaplica nada
+    app = create_app(LegacyConfig)
+    with app.app_context():
+        assert db.session.get(Product, 1).price_cents == 5010
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _esquema(path):
+    """Colunas e índices de cada tabela.
+
+    A ordem das colunas e o tipo declarado podem variar: colunas adicionadas
+    por ALTER TABLE vão para o fim e as renomeadas para `*_cents` mantêm o
+    tipo NUMERIC (o SQLite guarda os centavos como inteiros do mesmo jeito).
+    """
+    with sqlite3.connect(path) as conn:
+        tabelas = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT LIKE 'clients_fts%'")]
+        return {
+            tabela: (
+                {(c[1], bool(c[3] or c[5]), c[5]) for c in conn.execute(f"PRAGMA table_info({tabela})")},
+                {(i[1], tuple(c[2] for c in conn.execute(f"PRAGMA index_info({i[1]})")))
+                 for i in conn.execute(f"PRAGMA index_list({tabela})") if i[3] == 'c'},
+            )
+            for tabela in tabelas
+        }
+
+
+def test_upgraded_database_matches_a_new_one(tmp_path):
+    antigo, novo = tmp_path / 'legacy.db', tmp_path / 'novo.db'
+    with sqlite3.connect(antigo) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+
+    for path in (antigo, novo):
+        class PathConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+            TESTING = True
+
+        app = create_app(PathConfig)
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    assert _esquema(antigo) == _esquema(novo)
+
+
+def test_cash_session_step_creates_the_version_4_tables(tmp_path):
+    from sqlalchemy import create_engine
+
+    from app.migrations import MIGRATIONS
+
+    passo, novo = tmp_path / 'passo.db', tmp_path / 'novo.db'
+    engine = create_engine(f"sqlite:///{passo}")
+    with engine.begin() as conn:
+        dict(MIGRATIONS)[4](conn)
+    engine.dispose()
+
+    class NovoConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{novo}"
+        TESTING = True
+
+    app = create_app(NovoConfig)
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+    criadas = _esquema(passo)
+    assert set(criadas) == {'cash_sessions', 'cash_session_balances'}
+    assert criadas == {tabela: _esquema(novo)[tabela] for tabela in criadas}
@@ -0,0 +1,74 @@
+"""Regressão de planos de consulta: as consultas quentes não podem varrer tabelas.
+
+Cada consulta passa por EXPLAIN QUERY PLAN; uma linha "SCAN <tabela>" sem
+índice (ou, no relatório, uma ordenação em B-tree temporária) reprova o teste.
+"""
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy.dialects import sqlite
+
+from app.db import db
+from app.models import DailyRollup, Payment, Transaction, TransactionItem
+from app.routes import _build_report_query, _parse_report_filters
+
+TABLE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+HOT_QUERIES = {
+    'itens da transação': lambda: db.select(TransactionItem).where(TransactionItem.transaction_id == 1),
+    'pagamentos da transação': lambda: db.select(Payment).where(Payment.transaction_id == 1),
+    'transações do cliente': lambda: db.select(Transaction).where(Transaction.client_id == 1),
+    'uso do produto (remoção)': lambda: db.select(TransactionItem.id).where(
+        TransactionItem.product_id == 1).limit(1),
+    'saldo de um método': lambda: db.select(db.func.sum(Payment.amount_cents)).where(
+        Payment.payment_method_id == 1, Payment.amount_cents > 0),
+    'descrições personalizadas': lambda: db.select(TransactionItem.description).where(
+        TransactionItem.product_id.is_(None), TransactionItem.description.isnot(None)
+    ).distinct().order_by(TransactionItem.description),
+    'total de sangrias no período': lambda: db.select(db.func.sum(Transaction.total_cents)).where(
+        Transaction.kind == Transaction.KIND_WITHDRAWAL,
+        Transaction.date >= date(2025, 1, 1), Transaction.date < date(2025, 2, 1)),
+    'resumo por período': lambda: db.select(db.func.sum(DailyRollup.sales_total_cents)).where(
+        DailyRollup.day >= date(2025, 1, 1), DailyRollup.day < date(2025, 2, 1)),
+}
+
+
+def query_plan(statement):
+    compiled = statement.compile(dialect=sqlite.dialect(), compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    params = tuple(str(p) if isinstance(p, date) else p for p in params)
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+    return [row[3] for row in rows]
+
+
+def table_scans(plan):
+    return [detail for detail in plan if TABLE_SCAN.match(detail)]
+
+
+@pytest.mark.parametrize('name', list(HOT_QUERIES))
+def test_hot_query_uses_index(app, name):
+    with app.app_context():
+        plan = query_plan(HOT_QUERIES[name]())
+        assert not table_scans(plan), plan
+
+
+@pytest.mark.parametrize('query_string', [
+    'data_inicio=2025-01-01&data_fim=2025-01-31&limite=500',
+    'limite=500&cursor=2025-01-15T12:00:00_42',
+    'produto=1&produto=custom_Corte&limite=500',
+    'tipo=sangria&data_inicio=2025-01-01&limite=500',
+])
+def test_report_page_walks_date_index(app, query_string):
+    with app.test_request_context('/api/relatorios?' + query_string):
+        plan = query_plan(_build_report_query(_parse_report_filters()).limit(500).statement)
+        assert not table_scans(plan), plan
+        assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_type_filter_is_an_index_range_scan(app):
+    with app.test_request_context('/api/relatorios?tipo=sangria&limite=500'):
+        plan = query_plan(_build_report_query(_parse_report_filters()).limit(500).statement)
+        assert any(detail.startswith('SEARCH transactions USING INDEX ix_transactions_kind_date (kind=?')
+                   for detail in plan), plan
+
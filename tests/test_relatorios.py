@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from app.db import db
+from app.models import Transaction, TransactionItem
+
+
+def _seed(app, n):
+    with app.app_context():
+        for i in range(n):
+            # datas repetidas em pares para exercitar o desempate por id
+            tx = Transaction(total_cents=(10 + i) * 100, date=datetime(2025, 1, 1 + i // 2, 12, 0))
+            tx.items.append(TransactionItem(description=f'Item {i}', qty=1, unit_price_cents=(10 + i) * 100, subtotal_cents=(10 + i) * 100))
+            tx.items.append(TransactionItem(description='Extra', qty=1, unit_price_cents=0, subtotal_cents=0))
+            db.session.add(tx)
+        db.session.commit()
+
+
+def test_keyset_pages_cover_all_rows_once(app, client):
+    _seed(app, 7)
+    full = client.get('/api/relatorios').get_json()['dados']
+    assert len(full) == 7
+
+    ids, cursor = [], None
+    while True:
+        params = {'limite': 3}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/api/relatorios', query_string=params).get_json()
+        ids += [row['id'] for row in page['dados']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert ids == [row['id'] for row in full]
+
+
+def test_product_filter_does_not_duplicate_transactions(app, client):
+    _seed(app, 3)
+    resp = client.post('/api/relatorios', json={'produtos': ['custom_Extra', 'custom_Item 1']})
+    assert len(resp.get_json()['dados']) == 3
+
+
+def test_stream_mode_returns_same_rows(app, client):
+    _seed(app, 5)
+    full = client.get('/api/relatorios').get_json()
+    streamed = client.get('/api/relatorios', query_string={'stream': 1}).get_json()
+    assert streamed['dados'] == full['dados']
+    assert streamed['resumo'] == full['resumo']
+
+
+def test_report_and_dashboard_query_count_is_constant(app, client, consultas):
+    from app.models import Client, Product
+    from app.routes import cache_relatorios
+
+    # Mede as consultas de verdade, sem o cache de resultados
+    cache_relatorios.configure(max_entries=0)
+
+    def _add_sales(n):
+        with app.app_context():
+            cliente = Client(name='Maria')
+            produto = Product.query.first()
+            for i in range(n):
+                tx = Transaction(total_cents=1000, client=cliente, date=datetime(2025, 2, 1, 12, i))
+                tx.items.append(TransactionItem(product_id=produto.id, qty=1, unit_price_cents=1000, subtotal_cents=1000))
+                tx.items.append(TransactionItem(description='Extra', qty=1, unit_price_cents=0, subtotal_cents=0))
+                db.session.add(tx)
+            db.session.commit()
+
+    def _requests():
+        assert client.get('/api/relatorios').status_code == 200
+        assert client.get('/api/relatorios', query_string={'limite': 50, 'cliente': 'Mar'}).status_code == 200
+        assert client.get('/api/resumo').status_code == 200
+
+    _add_sales(2)
+    _requests()  # carrega os caches de consulta (ex.: formas de pagamento)
+    few = len(consultas(_requests))
+    _add_sales(40)
+    many = len(consultas(_requests))
+
+    assert many == few
+    # relatorios: meses arquivados + linhas + resumo; paginado com cliente: meses arquivados + linhas;
+    # resumo: totais + 2 contagens + recentes
+    assert few <= 9
+
+
+def test_export_streams_csv_and_gzip_ndjson(app, client):
+    import csv
+    import gzip
+    import io
+    import json
+
+    _seed(app, 4)
+    full = client.get('/api/relatorios').get_json()['dados']
+
+    resp = client.get('/api/relatorios/export', query_string={'formato': 'csv'})
+    assert resp.is_streamed
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0] == ['Data', 'Cliente', 'Produto', 'Valor', 'Observações']
+    assert [r[3] for r in rows[1:]] == [f"{row['valor']:.2f}" for row in full]
+
+    resp = client.get('/api/relatorios/export', query_string={'formato': 'ndjson', 'gzip': 1})
+    linhas = gzip.decompress(resp.get_data()).decode('utf-8').splitlines()
+    assert [json.loads(linha) for linha in linhas] == full
@@ -0,0 +1,37 @@
+from app.db import db
+from app.models import DailyRollup, PaymentMethod, Product
+
+
+def test_resumo_uses_incremental_rollup_and_matches_backfill(app, client, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        consulta = Product.query.filter_by(name='Consulta').first().id
+
+    vender(client, 120, dinheiro, items=[
+        {'product_id': consulta, 'qty': 2, 'unit_price': 50, 'subtotal': 100},
+        {'description': 'Taxa', 'qty': 1, 'unit_price': 20, 'subtotal': 20},
+    ])
+    client.post('/api/retirada', json={'valor': 15.5, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+
+    data = client.get('/api/resumo').get_json()
+    assert data['total_transacoes'] == 2
+    assert data['total_vendas'] == 120
+    assert data['total_sangrias'] == 15.5
+    assert client.get('/api/saldo-caixa').get_json()['saldo'] == 120
+
+    with app.app_context():
+        def snapshot():
+            return sorted(
+                (r.day, r.payment_method_id, r.product_id, r.sales_count, r.sales_total_cents,
+                 r.sangrias_count, r.sangrias_total_cents, r.items_qty)
+                for r in DailyRollup.query.all()
+            )
+
+        incremental = snapshot()
+        DailyRollup.rebuild()
+        db.session.expire_all()
+        assert snapshot() == incremental
+
+        product_row = db.session.get(DailyRollup, (incremental[0][0], DailyRollup.ALL, consulta))
+        assert product_row.items_qty == 2
+        assert product_row.sales_total_cents == 10000
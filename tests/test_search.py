@@ -0,0 +1,60 @@
+from app.db import db
+from app.models import Client
+
+
+def _names(client, q):
+    return [c['name'] for c in client.get('/api/clients', query_string={'q': q}).get_json()]
+
+
+def test_client_search_is_accent_insensitive_prefix_search(app, client):
+    with app.app_context():
+        for name in ['José da Silva', 'Joana Prado', 'Maria José', 'Ângela Souza']:
+            db.session.add(Client(name=name))
+        db.session.commit()
+
+    assert sorted(_names(client, 'jose')) == ['José da Silva', 'Maria José']
+    assert sorted(_names(client, 'JO')) == ['Joana Prado', 'José da Silva', 'Maria José']
+    assert _names(client, 'silva jo') == ['José da Silva']
+    assert _names(client, 'angela') == ['Ângela Souza']
+    assert _names(client, '"') == []
+
+
+def test_client_search_index_follows_updates_and_deletes(app, client):
+    with app.app_context():
+        cliente = Client(name='Carlos')
+        db.session.add(cliente)
+        db.session.commit()
+        cliente.name = 'Cássio'
+        db.session.commit()
+        assert _names(client, 'carlos') == []
+        assert _names(client, 'cassio') == ['Cássio']
+
+        db.session.delete(cliente)
+        db.session.commit()
+        assert _names(client, 'cassio') == []
+
+
+def test_client_search_ranks_recent_matches(app, client):
+    from app.search import RANK_CANDIDATES
+
+    with app.app_context():
+        # Melhor resultado mais antigo, seguido de muitos nomes mais longos
+        db.session.add(Client(name='Joana'))
+        for i in range(80):
+            db.session.add(Client(name=f'Joana Maria Pereira Santos {i}'))
+        db.session.add(Client(name='Ana Joana'))
+        db.session.commit()
+
+    nomes = _names(client, 'joana')
+    assert len(nomes) == 10 and nomes[0] == 'Joana'
+    # Nomes que começam pelo termo vêm antes, mesmo mais longos
+    assert 'Ana Joana' not in nomes
+
+    # Fora da janela de candidatos, o cliente antigo aparece com um termo mais específico
+    with app.app_context():
+        for i in range(RANK_CANDIDATES):
+            db.session.add(Client(name=f'Joana Lima {i}'))
+        db.session.commit()
+    assert 'Joana' not in _names(client, 'joana')
+    assert _names(client, 'joana santos 7')[:2] == ['Joana Maria Pereira Santos 7',
+                                                    'Joana Maria Pereira Santos 70']
@@ -0,0 +1,101 @@
+import argparse
+import json
+import socket
+
+import pytest
+
+from app.server import add_server_arguments, start_server
+
+
+def _args(*argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--debug', action='store_true')
+    add_server_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+@pytest.fixture
+def launcher_socket():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    listener.settimeout(5)
+    yield listener
+    listener.close()
+
+
+def _mensagem(listener):
+    conn, _ = listener.accept()
+    with conn:
+        return json.loads(conn.makefile('rb').readline())
+
+
+def test_server_reports_effective_port_when_preferred_is_busy(app, launcher_socket):
+    ocupada = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    ocupada.bind(('127.0.0.1', 0))
+    ocupada.listen(1)
+    porta_ocupada = ocupada.getsockname()[1]
+
+    args = _args('--port', str(porta_ocupada), '--any-port', '--server-engine', 'waitress',
+                 '--notify-port', str(launcher_socket.getsockname()[1]))
+    server = start_server(app, args)
+    try:
+        mensagem = _mensagem(launcher_socket)
+        assert mensagem['status'] == 'ready'
+        assert mensagem['port'] == server.port != porta_ocupada
+        # O socket já está escutando quando o aviso chega
+        socket.create_connection(('127.0.0.1', mensagem['port']), timeout=1).close()
+    finally:
+        server.close()
+        ocupada.close()
+
+
+def test_server_reports_bind_failure(app, launcher_socket):
+    ocupada = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    ocupada.bind(('127.0.0.1', 0))
+    ocupada.listen(1)
+
+    args = _args('--port', str(ocupada.getsockname()[1]), '--server-engine', 'waitress',
+                 '--notify-port', str(launcher_socket.getsockname()[1]))
+    with pytest.raises(OSError):
+        start_server(app, args)
+    assert _mensagem(launcher_socket)['status'] == 'error'
+    ocupada.close()
+
+
+def _fechar(server):
+    # serve_forever não chegou a rodar: o shutdown do werkzeug esperaria por ele
+    if server.engine == 'werkzeug':
+        server._server.server_close()
+    else:
+        server.close()
+
+
+def test_engine_and_settings_come_from_options_and_config(app, monkeypatch):
+    from app.server import create_server
+
+    app.config.update(SERVER_THREADS=3, SERVER_BACKLOG=64, SERVER_CONNECTION_LIMIT=7, SERVER_KEEP_ALIVE=30)
+    casos = [
+        ({}, 'waitress'),                                     # padrão
+        ({'debug': True}, 'werkzeug'),                        # --debug
+        ({'engine': 'werkzeug'}, 'werkzeug'),                 # --server-engine
+        ({'engine': 'waitress', 'threads': 5}, 'waitress'),
+    ]
+    for opcoes, engine in casos:
+        server = create_server(app, '127.0.0.1', 0, **opcoes)
+        try:
+            assert server.engine == engine and server.port
+            if engine == 'waitress':
+                assert server.settings == {'threads': opcoes.get('threads', 3), 'backlog': 64,
+                                           'connection_limit': 7, 'channel_timeout': 30}
+        finally:
+            _fechar(server)
+            app.debug = False
+
+    # Sem waitress instalado: cai para o werkzeug
+    monkeypatch.setattr('app.server.waitress', None)
+    server = create_server(app, '127.0.0.1', 0)
+    assert server.engine == 'werkzeug'
+    _fechar(server)
@@ -0,0 +1,74 @@
+from app.models import PaymentMethod
+
+
+def _metodos(turno):
+    return {m['name']: m for m in turno['methods']}
+
+
+def test_shift_open_close_with_snapshots(app, client, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+        pix = PaymentMethod.get_by_code('pix').id
+
+    assert client.get('/api/caixa/turno').get_json() == {'aberto': False, 'turno': None}
+    assert client.post('/api/caixa/turno/fechar').status_code == 400
+
+    # Venda antes da abertura entra no saldo de abertura
+    vender(client, 100, dinheiro)
+    resp = client.post('/api/caixa/turno/abrir', json={'observacoes': 'Manhã'})
+    assert resp.status_code == 200
+    assert _metodos(resp.get_json()['turno'])['Dinheiro']['opening'] == 100
+    assert client.post('/api/caixa/turno/abrir').status_code == 400
+
+    vender(client, 50, dinheiro, descricao='Consulta')
+    vender(client, 30, pix)
+    client.post('/api/retirada', json={'valor': 20, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+
+    turno = client.get('/api/caixa/turno').get_json()['turno']
+    assert _metodos(turno)['Dinheiro'] == dict(_metodos(turno)['Dinheiro'], opening=100, sales=50,
+                                               sangrias=20, balance=130)
+    assert _metodos(turno)['PIX']['balance'] == 30
+    assert client.get('/api/saldo-caixa').get_json() == {'saldo': 180, 'saldo_turno': 80}
+    balances = {b['code']: b for b in client.get('/api/balances').get_json()['balances']}
+    assert balances['dinheiro']['balance'] == 130
+    assert (balances['dinheiro']['shift_opening'], balances['dinheiro']['shift_sales']) == (100, 50)
+
+    relatorio = client.post('/api/caixa/turno/fechar').get_json()['relatorio']
+    assert (relatorio['sales_count'], relatorio['sangrias_count']) == (2, 1)
+    assert (relatorio['sales'], relatorio['sangrias']) == (80, 20)
+    assert all(m['ledger_difference'] == 0 for m in relatorio['methods'])
+    assert {p['description']: p['subtotal'] for p in relatorio['products']} == {'Consulta': 50, 'Avulso': 30}
+
+    # Relatório gravado: o mesmo depois de novas vendas
+    vender(client, 10, dinheiro)
+    assert client.get(f"/api/caixa/turnos/{relatorio['id']}").get_json() == relatorio
+    assert [t['id'] for t in client.get('/api/caixa/turnos').get_json()['turnos']] == [relatorio['id']]
+
+    # O próximo turno abre com o saldo atual
+    turno = client.post('/api/caixa/turno/abrir').get_json()['turno']
+    assert _metodos(turno)['Dinheiro']['opening'] == 140
+    assert _metodos(turno)['Dinheiro']['sales'] == 0
+
+
+def test_backdated_import_stays_out_of_the_open_shift(app, client, venda, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    client.post('/api/caixa/turno/abrir')
+    vender(client, 50, dinheiro, descricao='Consulta')
+    # Importação em lote de uma venda antiga: ids novos, data anterior ao turno
+    resp = client.post('/api/transactions/batch', json=[
+        venda(200, dinheiro, descricao='Importada', date='2024-01-10T12:00:00'),
+    ])
+    assert resp.status_code == 200
+
+    assert _metodos(client.get('/api/caixa/turno').get_json()['turno'])['Dinheiro']['sales'] == 50
+    relatorio = client.post('/api/caixa/turno/fechar').get_json()['relatorio']
+    assert relatorio['sales_count'] == 1 and relatorio['sales'] == 50
+    assert [p['description'] for p in relatorio['products']] == ['Consulta']
+    # O saldo materializado inclui a importação: a diferença aparece no relatório
+    assert _metodos(relatorio)['Dinheiro']['ledger_difference'] == 200
+
+    # O turno seguinte abre com o saldo que já inclui a venda importada
+    turno = client.post('/api/caixa/turno/abrir').get_json()['turno']
+    assert _metodos(turno)['Dinheiro']['opening'] == 250
@@ -0,0 +1,40 @@
+from app import create_app
+from app.db import db
+from app.models import PaymentMethod
+from config import Config
+
+
+def _config(uri):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = uri
+        TESTING = True
+    return TestConfig
+
+
+def test_warm_start_skips_schema_creation_and_seeding(tmp_path, monkeypatch):
+    # O diretório do banco ainda não existe: criado na inicialização
+    config = _config(f"sqlite:///{tmp_path / 'dados' / 'caixa.db'}")
+
+    cold = create_app(config)
+    assert cold.extensions['caixa_startup']['warm_start'] is False
+    with cold.app_context():
+        db.engine.dispose()
+
+    chamadas = []
+    monkeypatch.setattr(db, 'create_all', lambda *a, **k: chamadas.append('create_all'))
+    monkeypatch.setattr('app._ensure_minimal_data', lambda: chamadas.append('seed'))
+
+    warm = create_app(config)
+    with warm.app_context():
+        assert len(PaymentMethod.get_active_methods()) == 4
+
+    assert warm.extensions['caixa_startup']['warm_start'] is True
+    assert chamadas == []
+
+    client = warm.test_client()
+    assert client.get('/api/produtos').status_code == 200
+    assert warm.extensions['caixa_startup']['first_request_ms'] is not None
+
+    with warm.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,16 @@
+from app.models import PaymentMethod
+
+
+def test_reports_filter_and_label_by_kind(app, client, vender):
+    with app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    vender(client, 50, dinheiro, descricao='Corte')
+    client.post('/api/retirada', json={'valor': 20, 'motivo': 'Troco', 'payment_method_id': dinheiro})
+
+    sangrias = client.get('/api/relatorios', query_string={'tipo': 'sangria'}).get_json()['dados']
+    assert [(r['tipo'], r['valor'], r['observacoes']) for r in sangrias] == [('sangria', -20, 'Troco [Dinheiro]')]
+
+    vendas = client.get('/api/relatorios', query_string={'tipo': 'venda'}).get_json()['dados']
+    assert [(r['tipo'], r['produto']) for r in vendas] == [('venda', 'Corte')]
+
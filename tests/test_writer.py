@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from app import create_app
+from app.db import db
+from app.models import DailyRollup, PaymentMethod, PaymentMethodBalance, Transaction
+from config import Config
+
+
+@pytest.fixture
+def writer_app(tmp_path):
+    """App com WRITE_BEHIND ativo e intervalo largo para formar grupos."""
+
+    class WriterConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        TESTING = True
+        WRITE_BEHIND = True
+        WRITE_BEHIND_INTERVAL_MS = 50
+
+    app = create_app(WriterConfig)
+    yield app
+
+    app.extensions['caixa_writer'].stop()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_concurrent_sales_share_commits_and_isolate_failures(writer_app, venda):
+    with writer_app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+
+    respostas = [None] * 12
+
+    def _enviar(i):
+        # Índice 5 referencia um produto inexistente e falha no banco
+        dados = venda(10, dinheiro, product_id=9999 if i == 5 else None)
+        respostas[i] = writer_app.test_client().post('/api/transaction', json=dados)
+
+    threads = [threading.Thread(target=_enviar, args=(i,)) for i in range(len(respostas))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    status = [r.status_code for r in respostas]
+    assert status.count(200) == 11 and status[5] == 500
+    ids = [r.get_json()['transaction_id'] for r in respostas if r.status_code == 200]
+    assert len(set(ids)) == 11
+
+    stats = writer_app.extensions['caixa_writer'].stats()
+    assert stats['operations'] == 12
+    assert stats['groups'] < 12
+
+    with writer_app.app_context():
+        assert Transaction.query.count() == 11
+        assert PaymentMethodBalance.get_balance_cents(dinheiro) == 11 * 1000
+        incremental = DailyRollup.totals()
+        DailyRollup.rebuild()
+        assert DailyRollup.totals() == incremental
+
+
+def test_withdrawals_see_balance_of_the_same_group(writer_app, vender):
+    client = writer_app.test_client()
+    with writer_app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+    vender(client, 30, dinheiro)
+
+    respostas = [None] * 4
+
+    def _retirar(i):
+        respostas[i] = writer_app.test_client().post('/api/retirada', json={
+            'valor': 10, 'motivo': f'Retirada {i}', 'payment_method_id': dinheiro,
+        })
+
+    threads = [threading.Thread(target=_retirar, args=(i,)) for i in range(len(respostas))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Saldo de R$ 30,00: só três retiradas de R$ 10,00 cabem
+    assert sorted(r.status_code for r in respostas) == [200, 200, 200, 400]
+    recusada = next(r.get_json() for r in respostas if r.status_code == 400)
+    assert recusada['saldo_disponivel'] == 0
+    with writer_app.app_context():
+        assert PaymentMethodBalance.get_balance_cents(dinheiro) == 0
+
+
+def test_timed_out_write_answers_pending_and_still_commits(writer_app, venda):
+    with writer_app.app_context():
+        dinheiro = PaymentMethod.get_by_code('dinheiro').id
+    writer = writer_app.extensions['caixa_writer']
+    writer_app.config['WRITE_BEHIND_TIMEOUT'] = 0.05
+
+    # Uma operação lenta segura a thread de gravação
+    liberar = threading.Event()
+    writer.submit(lambda: liberar.wait(5))
+
+    resp = writer_app.test_client().post('/api/transaction', json=venda(10, dinheiro))
+    assert resp.status_code == 202
+    assert resp.get_json()['pending'] is True and writer.stats()['pending'] == 1
+
+    liberar.set()
+    writer.stop()
+    with writer_app.app_context():
+        assert Transaction.query.count() == 1